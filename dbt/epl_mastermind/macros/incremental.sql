@@ -0,0 +1,45 @@
+-- Helpers for incremental models keyed on (season, gameweek)
+-- The loader stamps every (season, GW) partition it writes in load_watermarks; each
+-- incremental model stores the newest stamp it has seen in source_loaded_at, so a run
+-- only rebuilds partitions loaded since then (new gameweeks and re-loaded corrections)
+
+{% macro source_loaded_at() %}
+    (SELECT MAX(loaded_at) FROM {{ source('fpl_raw', 'load_watermarks') }})
+{% endmacro %}
+
+
+{% macro changed_gameweeks() %}
+    -- Earliest gameweek per season loaded since this model was last built; the columns are
+    -- prefixed so a caller's bare season/gameweek can never bind to them in a correlated filter
+    SELECT
+        season AS changed_season,
+        MIN("GW") AS changed_from_gameweek
+    FROM {{ source('fpl_raw', 'load_watermarks') }}
+    WHERE loaded_at > (SELECT MAX(source_loaded_at) FROM {{ this }})
+    GROUP BY season
+{% endmacro %}
+
+
+{% macro incremental_seasons_filter(season_column='season') %}
+    {#- Seasons with changed gameweeks; window inputs need the whole season for to-date sums -#}
+    {%- if is_incremental() -%}
+        {{ season_column }} IN (SELECT changed_season FROM ({{ changed_gameweeks() }}))
+    {%- else -%}
+        TRUE
+    {%- endif -%}
+{% endmacro %}
+
+
+{% macro incremental_gameweeks_filter(season_column='season', gameweek_column='gameweek') %}
+    {#- Rows at or after the earliest changed gameweek of their season; these are the rows to rebuild -#}
+    {%- if is_incremental() -%}
+        EXISTS (
+            SELECT 1
+            FROM ({{ changed_gameweeks() }}) changed
+            WHERE changed.changed_season = {{ season_column }}
+                AND {{ gameweek_column }} >= changed.changed_from_gameweek
+        )
+    {%- else -%}
+        TRUE
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,112 @@
+-- Rolling feature generator
+-- Emits mean/stddev/sum/rate features for every (stat, window) pair from one running
+-- sum per stat: a window's sum is the running sum minus the running sum `n` rows back,
+-- so each extra window only adds a LAG, not another framed aggregate
+
+{% macro rolling_feature_name(stat, agg, window) %}
+    {%- set suffix = 'season' if window == 'season' else window ~ 'gw' -%}
+    {%- if agg == 'avg' -%} avg_{{ stat }}_{{ suffix }}
+    {%- elif agg == 'std' -%} {{ stat }}_stddev_{{ suffix }}
+    {%- elif agg == 'sum' -%} sum_{{ stat }}_{{ suffix }}
+    {%- elif agg == 'rate' -%} {{ stat }}_rate_{{ suffix }}
+    {%- elif agg == 'count' -%} {{ stat }}_count_{{ suffix }}
+    {%- else -%} {{ exceptions.raise_compiler_error("Unknown rolling aggregate '" ~ agg ~ "'") }}
+    {%- endif -%}
+{% endmacro %}
+
+
+{% macro rolling_features(relation, stats, windows, partition_by='player_name, season',
+                          order_by='gameweek, kickoff_time, fixture_id') %}
+    {#-
+        relation: CTE or table to read; all its columns are passed through
+        stats:    {name: {'expr': SQL expression, 'aggs': ['avg', 'std', 'sum', 'rate', 'count'],
+                          'nullable': false}}
+                  'rate' is the mean of a 0/1 expression, 'count' its non-NULL rows.
+                  Set 'nullable' for expressions that can be NULL so they are skipped
+                  like AVG/STDDEV/SUM skip them; otherwise rows are counted directly.
+        windows:  row counts (e.g. [3, 5, 10]) and/or 'season' for season to date,
+                  matching ROWS BETWEEN n - 1 PRECEDING AND CURRENT ROW
+        order_by must be a total order within a partition so both passes see double
+        gameweeks in the same order.
+    -#}
+    {%- set running_columns = ['_rows'] %}
+    {%- set window_columns = [] %}
+    {%- set parts = {} %}
+    {%- for stat, spec in stats.items() %}
+    {%- set needs_sum = spec['aggs'] | reject('equalto', 'count') | list | length > 0 %}
+    {%- do parts.update({stat: (['s'] if needs_sum else []) + (['ss'] if 'std' in spec['aggs'] else [])
+                               + (['n'] if spec.get('nullable') else [])}) %}
+    {%- for part in parts[stat] %}
+    {%- do running_columns.append('_cum_' ~ part ~ '_' ~ stat) %}
+    {%- for window in windows %}
+    {%- do window_columns.append('_' ~ part ~ '_' ~ stat ~ '_' ~ window) %}
+    {%- endfor %}
+    {%- endfor %}
+    {%- endfor %}
+    SELECT
+        * EXCLUDE ({{ (running_columns + window_columns) | join(', ') }})
+        {%- for stat, spec in stats.items() %}
+        {%- for window in windows %}
+        {%- set s = '_s_' ~ stat ~ '_' ~ window %}
+        {%- set ss = '_ss_' ~ stat ~ '_' ~ window %}
+        {%- if spec.get('nullable') %}
+        {%- set n = '_n_' ~ stat ~ '_' ~ window %}
+        {%- elif window == 'season' %}
+        {%- set n = '_rows' %}
+        {%- else %}
+        {%- set n = 'LEAST(_rows, ' ~ window ~ ')' %}
+        {%- endif %}
+        {%- for agg in spec['aggs'] %}
+        {%- if agg in ('avg', 'rate') %}
+        , {{ s }} / NULLIF({{ n }}, 0) AS {{ rolling_feature_name(stat, agg, window) }}
+        {%- elif agg == 'sum' %}
+        , CASE WHEN {{ n }} > 0 THEN {{ s }} END AS {{ rolling_feature_name(stat, agg, window) }}
+        {%- elif agg == 'count' %}
+        , {{ n }} AS {{ rolling_feature_name(stat, agg, window) }}
+        {%- elif agg == 'std' %}
+        -- sample stddev from sums; GREATEST guards against -0.0000001 from rounding
+        , CASE WHEN {{ n }} > 1
+            THEN SQRT(GREATEST(({{ ss }} - {{ s }} * {{ s }} / {{ n }}) / ({{ n }} - 1), 0))
+          END AS {{ rolling_feature_name(stat, agg, window) }}
+        {%- endif %}
+        {%- endfor %}
+        {%- endfor %}
+        {%- endfor %}
+    FROM (
+        -- Window totals: running total minus the running total `window` rows back
+        SELECT
+            *
+            {%- for stat in stats %}
+            {%- for window in windows %}
+            {%- for part in parts[stat] %}
+            {%- set running = '_cum_' ~ part ~ '_' ~ stat %}
+            {%- if window == 'season' %}
+            , {{ running }} AS _{{ part }}_{{ stat }}_{{ window }}
+            {%- else %}
+            , {{ running }} - COALESCE(LAG({{ running }}, {{ window }}) OVER rolling_order, 0) AS _{{ part }}_{{ stat }}_{{ window }}
+            {%- endif %}
+            {%- endfor %}
+            {%- endfor %}
+            {%- endfor %}
+        FROM (
+            -- Running totals: one sorted pass for every stat
+            SELECT
+                *,
+                COUNT(*) OVER running AS _rows
+                {%- for stat, spec in stats.items() %}
+                {%- if 's' in parts[stat] %}
+                , SUM({{ spec['expr'] }}) OVER running AS _cum_s_{{ stat }}
+                {%- endif %}
+                {%- if 'std' in spec['aggs'] %}
+                , SUM(({{ spec['expr'] }}) * ({{ spec['expr'] }})) OVER running AS _cum_ss_{{ stat }}
+                {%- endif %}
+                {%- if spec.get('nullable') %}
+                , COUNT({{ spec['expr'] }}) OVER running AS _cum_n_{{ stat }}
+                {%- endif %}
+                {%- endfor %}
+            FROM {{ relation }}
+            WINDOW running AS (PARTITION BY {{ partition_by }} ORDER BY {{ order_by }} ROWS UNBOUNDED PRECEDING)
+        )
+        WINDOW rolling_order AS (PARTITION BY {{ partition_by }} ORDER BY {{ order_by }})
+    )
+{% endmacro %}
@@ -0,0 +1,140 @@
+-- Fixture index: one row per team per fixture, upcoming ones included, with both sides' form going into the match
+-- This model is designed to be used in the dbt intermediate layer
+
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['season', 'gameweek'],
+    docs={'description': 'Per-fixture team and opponent strength, keyed by season/fixture/team'}
+) }}
+
+WITH team_fixtures AS (
+    SELECT
+        season,
+        fixture_id,
+        team_name,
+        ANY_VALUE(gameweek) AS gameweek,
+        MIN(kickoff_time) AS kickoff_time,
+        ANY_VALUE(opponent_team) AS opponent_id,
+        ANY_VALUE(home_away) = 'home' AS is_home,
+        ANY_VALUE(CASE WHEN home_away = 'home' THEN team_h_score ELSE team_a_score END) AS goals_for,
+        ANY_VALUE(CASE WHEN home_away = 'home' THEN team_a_score ELSE team_h_score END) AS goals_against
+    FROM {{ ref('stg_player_gameweeks') }}
+    WHERE fixture_id IS NOT NULL
+        -- whole seasons: form looks back over the team's previous fixtures
+        AND {{ incremental_seasons_filter() }}
+    GROUP BY season, fixture_id, team_name
+),
+
+upcoming_fixtures AS (
+    -- Scheduled fixtures after the latest loaded gameweek, one row per side and no result
+    -- yet, so the latest gameweek has a next fixture just like the gameweeks before it
+    SELECT season, fixture_id, team_h AS team_name, gameweek, kickoff_time,
+        team_a_id AS opponent_id, TRUE AS is_home
+    FROM {{ source('fpl_raw', 'api_fixtures') }}
+    UNION ALL
+    SELECT season, fixture_id, team_a AS team_name, gameweek, kickoff_time,
+        team_h_id AS opponent_id, FALSE AS is_home
+    FROM {{ source('fpl_raw', 'api_fixtures') }}
+),
+
+all_fixtures AS (
+    SELECT * FROM team_fixtures
+    UNION ALL
+    SELECT
+        u.season,
+        u.fixture_id,
+        u.team_name,
+        u.gameweek,
+        u.kickoff_time,
+        u.opponent_id,
+        u.is_home,
+        NULL AS goals_for,
+        NULL AS goals_against
+    FROM upcoming_fixtures u
+    -- seasons in this build only; NULL (no loaded rows) drops the season
+    WHERE u.gameweek > (SELECT MAX(t.gameweek) FROM team_fixtures t WHERE t.season = u.season)
+),
+
+team_strength AS (
+    -- Pre-match form: the current fixture is excluded so its result never leaks in
+    SELECT
+        *,
+        AVG(goals_for) OVER previous_fixtures AS attack_strength,
+        AVG(goals_against) OVER previous_fixtures AS defence_weakness,
+        AVG(goals_for - goals_against) OVER previous_fixtures AS goal_difference_form
+    FROM all_fixtures
+    WINDOW
+        team_season AS (PARTITION BY season, team_name ORDER BY gameweek, kickoff_time, fixture_id),
+        previous_fixtures AS (
+            team_season
+            ROWS BETWEEN {{ var('opponent_strength_games') }} PRECEDING AND 1 PRECEDING
+        )
+),
+
+fixture_sides AS (
+    SELECT
+        t.season,
+        t.gameweek,
+        t.fixture_id,
+        t.kickoff_time,
+        t.team_name,
+        team_ids.team_id,
+        t.opponent_id,
+        COALESCE(o.team_name, opponent_ids.team_name) AS opponent_name,
+        t.is_home,
+        t.goals_for,
+        t.goals_against,
+
+        t.attack_strength AS team_attack_strength,
+        t.defence_weakness AS team_defence_weakness,
+        t.goal_difference_form AS team_goal_difference_form,
+        o.attack_strength AS opponent_attack_strength,
+        o.defence_weakness AS opponent_defence_weakness,
+        o.goal_difference_form AS opponent_goal_difference_form
+
+    FROM team_strength t
+    LEFT JOIN team_strength o
+        ON t.season = o.season
+        AND t.fixture_id = o.fixture_id
+        AND t.team_name != o.team_name
+    LEFT JOIN {{ ref('int_opponent_strength') }} team_ids
+        ON t.season = team_ids.season
+        AND t.team_name = team_ids.team_name
+    LEFT JOIN {{ ref('int_opponent_strength') }} opponent_ids
+        ON t.season = opponent_ids.season
+        AND t.opponent_id = opponent_ids.team_id
+),
+
+fixture_index AS (
+    -- Each team's following fixture, so a player row can look up its next opponent by key
+    SELECT
+        *,
+        LEAD(fixture_id) OVER team_season AS next_fixture_id,
+        LEAD(gameweek) OVER team_season AS next_gameweek,
+        LEAD(opponent_name) OVER team_season AS next_opponent_name,
+        LEAD(is_home) OVER team_season AS next_is_home,
+        LEAD(opponent_attack_strength) OVER team_season AS next_opponent_attack_strength,
+        LEAD(opponent_defence_weakness) OVER team_season AS next_opponent_defence_weakness,
+        LEAD(opponent_goal_difference_form) OVER team_season AS next_opponent_goal_difference_form
+    FROM fixture_sides
+    WINDOW team_season AS (PARTITION BY season, team_name ORDER BY gameweek, kickoff_time, fixture_id)
+),
+
+rebuilt_gameweeks AS (
+    -- Changed gameweeks plus any earlier gameweek whose next fixture now lands in one
+    SELECT DISTINCT season, gameweek
+    FROM fixture_index
+    WHERE {{ incremental_gameweeks_filter() }}
+        OR {{ incremental_gameweeks_filter('season', 'next_gameweek') }}
+)
+
+SELECT
+    fi.*,
+    {{ source_loaded_at() }} AS source_loaded_at
+FROM fixture_index fi
+{% if is_incremental() %}
+SEMI JOIN rebuilt_gameweeks rg
+    ON fi.season = rg.season
+    AND fi.gameweek = rg.gameweek
+{% endif %}
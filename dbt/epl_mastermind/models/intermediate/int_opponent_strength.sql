@@ -6,6 +6,39 @@
     docs={'description': 'Team ID to name mapping for each season (1-20 teams per seaason)'}
 ) }}
 
-WITH team_id_mappping AS (
-    
-)
\ No newline at end of file
+-- Every fixture has exactly two sides, and the opponent_team id recorded on one
+-- side's rows is the other side's team_id, so pairing the sides names every id
+WITH fixture_sides AS (
+    SELECT
+        season,
+        fixture_id,
+        home_away,
+        ANY_VALUE(team_name) AS team_name,
+        ANY_VALUE(opponent_team) AS opponent_id
+    FROM {{ ref('stg_player_gameweeks') }}
+    WHERE fixture_id IS NOT NULL
+        AND opponent_team IS NOT NULL
+    GROUP BY season, fixture_id, home_away
+),
+
+team_id_mappping AS (
+    SELECT
+        side.season,
+        other_side.opponent_id AS team_id,
+        side.team_name
+    FROM fixture_sides side
+    JOIN fixture_sides other_side
+        ON side.season = other_side.season
+        AND side.fixture_id = other_side.fixture_id
+        AND side.home_away != other_side.home_away
+)
+
+SELECT
+    season,
+    team_id,
+    -- A team keeps one id all season; the most frequent name guards against stray rows
+    MODE(team_name) AS team_name,
+    COUNT(*) AS fixtures_observed,
+    COUNT(DISTINCT team_name) AS names_observed
+FROM team_id_mappping
+GROUP BY season, team_id
@@ -2,49 +2,37 @@
 -- This model is designed to be used in the dbt intermediate layer
 
 {{ config(
-    materialized='view',
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['season', 'gameweek'],
     docs={'description': 'Position-specific performance benchmarks and player rankings'}
 ) }}
 
-WITH position_stats AS (
-    SELECT
-        season,
-        gameweek,
-        position,
-        AVG(total_points) AS avg_position_points,
-        PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY total_points) AS median_position_points,
-        PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY total_points) AS p75_position_points,
-        PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY total_points) AS p90_position_points,
-        MAX(total_points) AS max_position_points,
-        AVG(minutes) AS avg_position_minutes,
-        COUNT(*) AS players_in_position
-    
-    FROM {{ ref('stg_player_gameweeks') }}
-    WHERE appearance_type != 'no_appearance'
-    GROUP BY season, gameweek, position
-),
+{#- approx_position_quantiles trades exact percentiles for a t-digest estimate -#}
+{%- set quantile = 'APPROX_QUANTILE' if var('approx_position_quantiles') else 'QUANTILE_CONT' %}
 
-player_rankings AS (
-    SELECT 
-        p.*,
-        ps.*,
+-- One scan: the benchmarks are window aggregates over each player's (season, gameweek,
+-- position) group, so they land on the player row without a GROUP BY and re-join
+SELECT
+    player_name,
+    season,
+    gameweek,
+    fixture_id,
+    position,
 
-        PERCENT_RANK() OVER (
-            PARTITION BY p.season, p.gameweek, p.position
-            ORDER BY p.total_points DESC
-        ) AS points_percentile_in_position,
+    AVG(total_points) OVER position_gameweek AS avg_position_points,
+    {{ quantile }}(total_points, 0.75) OVER position_gameweek AS p75_position_points,
+    {{ quantile }}(total_points, 0.9) OVER position_gameweek AS p90_position_points,
 
-        PERCENT_RANK() OVER (
-            PARTITION BY p.season, p.gameweek, p.position
-            ORDER BY p.minutes DESC
-        ) AS minutes_percentile_in_position
-    
-    FROM {{ ref('stg_player_gameweeks') }} p
-    JOIN position_stats ps 
-        ON p.season = ps.season
-        AND p.gameweek = ps.gameweek
-        AND p.position = ps.position
-    WHERE p.appearance_type != 'no_appearance'
-)
+    PERCENT_RANK() OVER (
+        position_gameweek
+        ORDER BY total_points DESC
+    ) AS points_percentile_in_position,
 
-SELECT * FROM player_rankings
\ No newline at end of file
+    {{ source_loaded_at() }} AS source_loaded_at
+
+FROM {{ ref('stg_player_gameweeks') }}
+WHERE appearance_type != 'no_appearance'
+    -- benchmarks are per gameweek, so only the changed gameweeks are read
+    AND {{ incremental_gameweeks_filter() }}
+WINDOW position_gameweek AS (PARTITION BY season, gameweek, position)
@@ -2,7 +2,9 @@
 -- This model is designed to be used in the dbt intermediate layer
 
 {{ config(
-    materialized='view',
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['season', 'gameweek'],
     docs={'description': 'Team performance metrics and relative strength indicators'}
 ) }}
 
@@ -21,6 +23,7 @@ WITH team_gameweeks AS (
         AVG(total_points) AS avg_player_points
     FROM {{ ref('stg_player_gameweeks') }}
     WHERE appearance_type != 'no_appearance'
+        AND {{ incremental_seasons_filter() }}
     GROUP BY team_name, season, gameweek, home_away, match_result
 ),
 
@@ -64,4 +67,8 @@ team_strength AS (
     FROM team_gameweeks
 )
 
-SELECT * FROM team_strength 
\ No newline at end of file
+SELECT
+    *,
+    {{ source_loaded_at() }} AS source_loaded_at
+FROM team_strength
+WHERE {{ incremental_gameweeks_filter() }}
\ No newline at end of file
@@ -1,8 +1,12 @@
 -- Comprehensive feature set ofr machine learning model training
 -- This model is designed to be used in the dbt marts layer
 
+-- A new column has to be backfilled for every row, so schema changes stop and ask for --full-refresh
 {{ config(
-    materialized='table',
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key=['season', 'gameweek'],
+    on_schema_change='fail',
     docs={'description': 'Complete feature set for machine learning model training'}
 ) }}
 
@@ -11,16 +15,17 @@ WITH base_features_pr AS (
         player_name,
         season,
         gameweek,
+        fixture_id,
         position,
         team_name,
         home_away,
         opponent_team,
 
         -- target variable, next week's points
-        LEAD(total_points) OVER (
-            PARTITION BY player_name, season
-            ORDER BY gameweek
-        ) AS next_gw_points,
+        LEAD(total_points) OVER player_season AS next_gw_points,
+
+        -- gameweek the target comes from, so a new gameweek also rebuilds the one before it
+        LEAD(gameweek) OVER player_season AS next_appearance_gameweek,
 
         -- Current gw performance
         total_points as current_points,
@@ -35,22 +40,10 @@ WITH base_features_pr AS (
 
         match_result,
 
-        -- Fixture difficulty (place holder as we don't have this data right now)
-        1.0 AS fixture_difficulty_next, -- TODO: Implement fixture difficulty calculation
-
         CASE WHEN minutes = 0 THEN 1 ELSE 0 END AS was_benched,
-        CASE WHEN appearance_type = 'full_game' THEN 1 ELSE 0 END AS played_full_game
-    
-    FROM {{ ref('int_player_rolling_stats') }}
-),
+        CASE WHEN appearance_type = 'full_game' THEN 1 ELSE 0 END AS played_full_game,
 
-base_features_rs AS (
-    SELECT
-        player_name,
-        season,
-        gameweek,
-
-        -- Form features
+        -- Form features (read in the same scan as the target, no self-join)
         avg_points_5gw,
         avg_points_3gw,
         avg_minutes_5gw,
@@ -76,8 +69,19 @@ base_features_rs AS (
                 THEN season_minutes_to_date::FLOAT / games_played_to_date
             ELSE 0
         END AS season_avg_minutes
-
+    
     FROM {{ ref('int_player_rolling_stats') }}
+    WHERE {{ incremental_seasons_filter() }}
+    -- Same order as the rolling features, so double gameweeks resolve the same way
+    WINDOW player_season AS (PARTITION BY player_name, season ORDER BY gameweek, kickoff_time, fixture_id)
+),
+
+rebuilt_gameweeks AS (
+    -- Changed gameweeks plus any earlier gameweek whose next_gw_points now lands in one
+    SELECT DISTINCT season, gameweek
+    FROM base_features_pr
+    WHERE {{ incremental_gameweeks_filter() }}
+        OR {{ incremental_gameweeks_filter('season', 'next_appearance_gameweek') }}
 ),
 
 base_features_tp AS (
@@ -94,6 +98,22 @@ base_features_tp AS (
         away_form_10gw
 
     FROM {{ ref('int_team_performance') }}
+    WHERE {{ incremental_seasons_filter() }}
+),
+
+base_features_fx AS (
+    SELECT
+        season,
+        fixture_id,
+        team_name,
+        -- Next fixture, precomputed per team in the fixture index
+        next_opponent_goal_difference_form,
+        next_opponent_attack_strength,
+        next_opponent_defence_weakness,
+        next_is_home
+
+    FROM {{ ref('int_fixture_index') }}
+    WHERE {{ incremental_seasons_filter() }}
 ),
 
 base_features_pb AS (
@@ -101,6 +121,7 @@ base_features_pb AS (
         player_name,
         season,
         gameweek,
+        fixture_id,
         -- Position benchmarks
         points_percentile_in_position,
         avg_position_points,
@@ -108,6 +129,7 @@ base_features_pb AS (
         p90_position_points
 
     FROM {{ ref('int_position_benchmarks') }}
+    WHERE {{ incremental_seasons_filter() }}
 ),
 
 base_features AS (
@@ -119,27 +141,35 @@ base_features AS (
         bp.team_name,
 
         bp.next_gw_points,
+        bp.next_appearance_gameweek,
 
         bp.current_points,
         bp.current_minutes,
         bp.current_goals_scored,
         bp.current_assists,
 
-        rf.avg_points_5gw,
-        rf.avg_points_3gw,
-        rf.avg_minutes_5gw,
-        rf.season_avg_points,
-        rf.season_avg_minutes,
-        COALESCE(rf.points_stddev_5gw, 0) AS consistency_score,
-        COALESCE(rf.blank_rate_5gw, 0) AS blank_rate,
-        COALESCE(rf.big_haul_rate_5gw, 0) AS big_haul_rate,
-        COALESCE(rf.points_per_90min, 0) AS points_per_90,
-        rf.games_played_to_date,
+        bp.avg_points_5gw,
+        bp.avg_points_3gw,
+        bp.avg_minutes_5gw,
+        bp.season_avg_points,
+        bp.season_avg_minutes,
+        COALESCE(bp.points_stddev_5gw, 0) AS consistency_score,
+        COALESCE(bp.blank_rate_5gw, 0) AS blank_rate,
+        COALESCE(bp.big_haul_rate_5gw, 0) AS big_haul_rate,
+        COALESCE(bp.points_per_90min, 0) AS points_per_90,
+        bp.games_played_to_date,
 
         COALESCE(tf.team_form_5gw, 0) AS team_form,
         COALESCE(tf.attack_strength_5gw, 0) AS team_attack,
         COALESCE(tf.defense_weakness_5gw, 0) AS team_defense_weakness,
 
+        -- Next opponent: recent goal difference (higher = harder fixture), attack and defence
+        fx.next_opponent_goal_difference_form AS fixture_difficulty_next,
+        fx.next_opponent_attack_strength AS next_opponent_attack,
+        fx.next_opponent_defence_weakness AS next_opponent_defence_weakness,
+        -- NULL when the next fixture is unknown, rather than reading as away
+        CAST(fx.next_is_home AS INTEGER) AS next_is_home,
+
         COALESCE(pf.points_percentile_in_position, 0.5) AS position_percentile,
         COALESCE(pf.avg_position_points, 2) AS avg_position_points,
 
@@ -151,12 +181,12 @@ base_features AS (
         CASE WHEN bp.home_away = 'home' THEN 1 ELSE 0 END AS is_home,
 
         CASE 
-            WHEN rf.avg_points_3gw > rf.avg_points_5gw THEN 1
+            WHEN bp.avg_points_3gw > bp.avg_points_5gw THEN 1
             ELSE 0
         END AS improving_form,
 
         CASE 
-            WHEN rf.points_stddev_5gw < 2.0 THEN 1
+            WHEN bp.points_stddev_5gw < 2.0 THEN 1
             ELSE 0
         END AS consistent_performer,
 
@@ -180,26 +210,35 @@ base_features AS (
             WHEN position = 'MID' THEN 3
             WHEN position = 'FWD' THEN 4
             ELSE 0
-        END AS position_encoded
+        END AS position_encoded,
+
+        {{ source_loaded_at() }} AS source_loaded_at
     
     FROM base_features_pr bp 
-    LEFT JOIN base_features_rs rf 
-        ON bp.player_name = rf.player_name
-        AND bp.season = rf.season
-        AND bp.gameweek = rf.gameweek
     LEFT JOIN base_features_tp tf 
         ON bp.team_name = tf.team_name
         AND bp.season = tf.season
         AND bp.gameweek = tf.gameweek
+    LEFT JOIN base_features_fx fx
+        ON bp.season = fx.season
+        AND bp.fixture_id = fx.fixture_id
+        AND bp.team_name = fx.team_name
     LEFT JOIN base_features_pb pf 
         ON bp.player_name = pf.player_name
         AND bp.season = pf.season
         AND bp.gameweek = pf.gameweek
+        AND bp.fixture_id = pf.fixture_id
+    {% if is_incremental() %}
+    SEMI JOIN rebuilt_gameweeks rg
+        ON bp.season = rg.season
+        AND bp.gameweek = rg.gameweek
+    {% endif %}
 )
 
 SELECT *
 FROM base_features
 WHERE
     games_played_to_date >= 3 -- want three games for rolling stats
-    AND next_gw_points IS NOT NULL -- we need a valid target
+    -- next_gw_points stays NULL for the latest gameweek: those are the rows we score,
+    -- and the incremental run fills the target in once the next gameweek is loaded
     AND gameweek <= 37 -- can't predict after the last gameweek
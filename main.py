@@ -1,5 +1,4 @@
-def main():
-    print("Hello from epl-mastermind!")
+from src.flows.main_pipeline import main
 
 
 if __name__ == "__main__":
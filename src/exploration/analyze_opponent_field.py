@@ -146,96 +146,62 @@ def analyze_opponent_field():
     
     conn.close()
 
-def test_reverse_mapping():
-    """Test if we can reverse-engineer the team mapping"""
+def check_team_mapping():
+    """Validate the materialized team mapping and fixture index built by dbt"""
     print("\n" + "=" * 50)
-    print("🔄 Reverse Engineering Team Mapping")
+    print("🔄 Team Mapping Validation (int_opponent_strength)")
     print("=" * 50)
     
-    conn = duckdb.connect(DB_PATH)
+    conn = duckdb.connect(DB_PATH, read_only=True)
     
-    # Try to find the actual team mapping by looking at fixture patterns
-    print("🎯 Attempting to map opponent_team IDs to team names...")
+    # The mapping is materialized by dbt, so this reads ~100 rows instead of rescanning player_gameweeks
+    mapping_summary = conn.execute("""
+        SELECT 
+            season,
+            COUNT(*) as mapped_ids,
+            MIN(team_id) as min_id,
+            MAX(team_id) as max_id,
+            COUNT(*) FILTER (WHERE names_observed > 1) as ambiguous_ids
+        FROM int_opponent_strength
+        GROUP BY season
+        ORDER BY season
+    """).fetchall()
     
-    # Strategy: For each team, see which opponent_team values they face
-    # Then cross-reference with which teams they should be playing against
+    print("  Mapped team IDs per season:")
+    for season, mapped, min_id, max_id, ambiguous in mapping_summary:
+        status = "✅" if mapped == 20 and ambiguous == 0 else "⚠️"
+        print(f"    {status} {season}: {mapped} IDs ({min_id}-{max_id}), {ambiguous} ambiguous")
     
-    reverse_mapping = conn.execute("""
-        WITH all_fixtures AS (
-            SELECT DISTINCT
-                season,
-                team as team_name,
-                opponent_team as opponent_id,
-                was_home
-            FROM player_gameweeks
-            WHERE opponent_team IS NOT NULL
-        ),
-        team_seasons AS (
-            SELECT DISTINCT
-                season,
-                team as team_name
-            FROM player_gameweeks
-            WHERE team IS NOT NULL
-        ),
-        -- For each team, count how many times they see each opponent_id
-        opponent_frequency AS (
-            SELECT 
-                af.season,
-                af.team_name,
-                af.opponent_id,
-                COUNT(*) as times_faced
-            FROM all_fixtures af
-            GROUP BY af.season, af.team_name, af.opponent_id
-        )
+    # Each team should meet 19 distinct opponents, all resolved to a name
+    fixture_summary = conn.execute("""
         SELECT 
             season,
-            team_name,
-            COUNT(DISTINCT opponent_id) as unique_opponents_faced,
-            MIN(opponent_id) as lowest_opponent_id,
-            MAX(opponent_id) as highest_opponent_id,
-            STRING_AGG(CAST(opponent_id AS VARCHAR), ', ' ORDER BY opponent_id) as opponent_ids
-        FROM opponent_frequency
-        GROUP BY season, team_name
-        ORDER BY season, team_name
-        LIMIT 10
+            COUNT(DISTINCT team_name) as teams,
+            COUNT(DISTINCT fixture_id) as fixtures,
+            COUNT(*) FILTER (WHERE opponent_name IS NULL) as unresolved_opponents,
+            MIN(opponents_faced) as min_opponents_faced
+        FROM (
+            SELECT 
+                *,
+                COUNT(DISTINCT opponent_name) OVER (PARTITION BY season, team_name) as opponents_faced
+            FROM int_fixture_index
+        )
+        GROUP BY season
+        ORDER BY season
     """).fetchall()
     
-    print("  Teams and the opponent IDs they face:")
-    for season, team, unique_ops, min_id, max_id, opp_ids in reverse_mapping:
-        opp_ids_short = opp_ids[:50] + "..." if len(opp_ids) > 50 else opp_ids
-        print(f"    {season} {team}: faces {unique_ops} opponents (IDs: {opp_ids_short})")
+    print("\n  Fixture index coverage:")
+    for season, teams, fixtures, unresolved, min_faced in fixture_summary:
+        status = "✅" if unresolved == 0 and min_faced == 19 else "⚠️"
+        print(f"    {status} {season}: {teams} teams, {fixtures} fixtures, "
+              f"{unresolved} unresolved opponents, min {min_faced} opponents faced")
     
     conn.close()
 
-def suggest_mapping_strategy():
-    """Suggest the best strategy for creating team mapping"""
-    print("\n" + "=" * 50)
-    print("💡 Recommended Mapping Strategy")
-    print("=" * 50)
-    
-    print("Based on the analysis, here's the recommended approach:")
-    print()
-    print("1. **Create alphabetical team mapping per season**:")
-    print("   - Sort teams alphabetically within each season")
-    print("   - Assign IDs 1-20 based on alphabetical order")
-    print("   - This gives consistent, predictable team IDs")
-    print()
-    print("2. **Build reverse lookup for opponent_team field**:")
-    print("   - Map the actual opponent_team values to our clean team names") 
-    print("   - Handle any inconsistencies in the source data")
-    print()
-    print("3. **Validate the mapping**:")
-    print("   - Ensure each team plays against exactly 19 others")
-    print("   - Check home/away balance")
-    print("   - Verify fixture count consistency")
-    print()
-    print("🚀 Ready to implement the corrected opponent strength model?")
-
 def main():
     """Run complete opponent field analysis"""
     analyze_opponent_field()
-    test_reverse_mapping()
-    suggest_mapping_strategy()
+    check_team_mapping()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
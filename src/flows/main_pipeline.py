@@ -0,0 +1,190 @@
+"""
+End-to-End FPL Pipeline Flow
+Prefect flow from raw downloads through dbt, training and scoring, skipping stages whose inputs are unchanged
+
+Usage: python -m src.flows.main_pipeline [--backend hist_gradient_boosting] [--per-position] [--refresh]
+"""
+
+import argparse
+import hashlib
+import json
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+import duckdb
+import requests
+from prefect import flow, task
+from prefect.cache_policies import INPUTS, NO_CACHE
+from prefect.task_runners import ThreadPoolTaskRunner
+
+from src.ingestion.data_exploration import BASE_URL, COMPLETE_SEASONS, PARTIAL_SEASONS, FPLDataLoader
+from src.ml.features import DB_PATH, MART_TABLE, FeatureStore
+from src.ml.models import BACKENDS, DEFAULT_BACKEND
+from src.ml.predictions import FPLScorer
+from src.ml.registry import ModelRegistry
+from src.ml.train_baseline import load_model_params, run_training
+
+# Configuration
+DBT_PROJECT_DIR = Path("dbt/epl_mastermind")
+# Only what the model needs; the rest of the dbt project is not on the weekly path
+DBT_SELECT = f"+{MART_TABLE}"
+DBT_SOURCE_DIRS = ["models", "macros"]
+SEASONS = COMPLETE_SEASONS + PARTIAL_SEASONS
+DOWNLOAD_RETRIES = 2
+
+
+@lru_cache(maxsize=None)
+def get_loader(base_url: str = BASE_URL) -> FPLDataLoader:
+    """One loader per flow process, so every task shares its connection pool and raw cache
+
+    Always lands data in the Parquet lake, which is where the dbt sources read it.
+    """
+    return FPLDataLoader(base_url=base_url)
+
+
+def table_exists(table: str) -> bool:
+    """Whether the warehouse has `table` yet"""
+    if not Path(DB_PATH).exists():
+        return False
+    conn = duckdb.connect(DB_PATH, read_only=True)
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table]
+        ).fetchone()[0] > 0
+    finally:
+        conn.close()
+
+
+def dbt_project_hash() -> str:
+    """Hash of the dbt project's SQL and config, so model edits rebuild the marts"""
+    digest = hashlib.sha256((DBT_PROJECT_DIR / "dbt_project.yml").read_bytes())
+    for directory in DBT_SOURCE_DIRS:
+        for path in sorted((DBT_PROJECT_DIR / directory).rglob('*')):
+            if path.is_file():
+                digest.update(str(path.relative_to(DBT_PROJECT_DIR)).encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+@task(cache_policy=NO_CACHE, retries=DOWNLOAD_RETRIES, retry_delay_seconds=10)
+def download_season(season: str, base_url: str = BASE_URL) -> str:
+    """Fetch one season's raw files into the raw cache; returns a hash of their contents
+
+    Always runs: closed seasons come straight from the cache and in-season files
+    are revalidated with conditional GETs, so an unchanged week moves no data.
+    """
+    loader = get_loader(base_url)
+    urls = [f"{loader.base_url}/{season}/gws/merged_gw.csv"]
+    if season in PARTIAL_SEASONS:
+        urls += [f"{loader.base_url}/{season}/gws/gw{gw}.csv" for gw in loader.check_available_gameweeks(season)]
+
+    def file_hash(url: str) -> str:
+        try:
+            content = loader.fetcher.get_bytes(url, immutable=season in COMPLETE_SEASONS)
+        except requests.HTTPError:
+            # In-season merged files may not exist yet; the loader skips them the same way
+            return "missing"
+        return hashlib.sha256(content).hexdigest()
+
+    digest = hashlib.sha256()
+    for url, file_digest in loader.fetcher.map(file_hash, urls).items():
+        digest.update(f"{url}={file_digest}\n".encode())
+    print(f"📥 {season}: {len(urls)} files")
+    return digest.hexdigest()[:16]
+
+
+@task(cache_policy=INPUTS)
+def load_raw_data(season_hashes: Dict[str, str], base_url: str = BASE_URL) -> str:
+    """Land the seasons in DuckDB; skipped while the raw files hash the same
+
+    The incremental load falls back to a complete one when there is no data yet,
+    and otherwise rewrites only the in-season gameweeks that changed.
+    """
+    get_loader(base_url).run_incremental_load()
+    return hashlib.sha256(json.dumps(season_hashes, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@task(cache_policy=INPUTS)
+def build_marts(raw_fingerprint: str, project_hash: str) -> str:
+    """dbt run up to the ML mart; returns the mart's content fingerprint"""
+    subprocess.run(["dbt", "run", "--select", DBT_SELECT, "--profiles-dir", "."],
+                   cwd=DBT_PROJECT_DIR, check=True)
+    conn = duckdb.connect(DB_PATH, read_only=True)
+    try:
+        return FeatureStore(DB_PATH).mart_fingerprint(conn)
+    finally:
+        conn.close()
+
+
+@task(cache_policy=INPUTS)
+def train_model(mart_fingerprint: str, backend: str, per_position: bool, params: dict) -> str:
+    """Train, evaluate and register a model; skipped while the mart and params are unchanged"""
+    test_metrics, version = run_training(backend, per_position)
+    print(f"✅ Test MAE {test_metrics['test_mae']:.3f}, registered as {version.version}")
+    return version.version
+
+
+@task(cache_policy=INPUTS)
+def score_gameweek(version: str, mart_fingerprint: str) -> dict:
+    """Score the latest gameweek with a registered version into the predictions table"""
+    scored = FPLScorer(version=version).score()
+    if scored.num_rows == 0:
+        return {'season': None, 'gameweek': None, 'players': 0, 'model': version}
+    return {'season': scored['season'][0].as_py(), 'gameweek': scored['gameweek'][0].as_py(),
+            'players': scored.num_rows, 'model': scored['model'][0].as_py()}
+
+
+@flow(name="fpl-main-pipeline", log_prints=True, task_runner=ThreadPoolTaskRunner(max_workers=len(SEASONS)))
+def main_pipeline(backend: str = DEFAULT_BACKEND, per_position: bool = False, base_url: str = BASE_URL,
+                  refresh: bool = False) -> dict:
+    """Download -> load -> dbt -> train -> score, each stage cached on a hash of its inputs
+
+    A stage whose output has gone missing (no raw table, no mart, a pruned model
+    version) runs again even when its inputs match; refresh=True reruns everything.
+    """
+    # Seasons are independent, so their downloads run side by side
+    downloads = {season: download_season.submit(season, base_url) for season in SEASONS}
+    season_hashes = {season: future.result() for season, future in downloads.items()}
+
+    raw_fingerprint = load_raw_data.with_options(
+        refresh_cache=refresh or not table_exists('player_gameweeks')
+    )(season_hashes, base_url)
+
+    mart_fingerprint = build_marts.with_options(
+        refresh_cache=refresh or not table_exists(MART_TABLE)
+    )(raw_fingerprint, dbt_project_hash())
+
+    train_args = (mart_fingerprint, backend, per_position, load_model_params(backend))
+    version = train_model.with_options(refresh_cache=refresh)(*train_args)
+    if version not in ModelRegistry().versions():
+        print(f"♻️ Cached model version {version} is no longer registered, retraining")
+        version = train_model.with_options(refresh_cache=True)(*train_args)
+
+    scored = score_gameweek.with_options(refresh_cache=refresh)(version, mart_fingerprint)
+    return {'mart_fingerprint': mart_fingerprint, 'version': version, **scored}
+
+
+def main():
+    """Run the whole pipeline locally"""
+    parser = argparse.ArgumentParser(description="Run the FPL pipeline end to end")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--per-position", action="store_true")
+    parser.add_argument("--base-url", default=BASE_URL, help="Root of the FPL data repository")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached stage results and rerun everything")
+    args = parser.parse_args()
+
+    print("🔁 FPL Main Pipeline")
+    print("=" * 50)
+    summary = main_pipeline(backend=args.backend, per_position=args.per_position, base_url=args.base_url,
+                            refresh=args.refresh)
+    if summary['players'] == 0:
+        print(f"\n⚠️ {summary['model']} scored no players")
+        return
+    print(f"\n✅ {summary['model']} scored {summary['players']} players "
+          f"from {summary['season']} GW{summary['gameweek']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Live FPL API Loader
+Pulls bootstrap-static, fixtures and per-player element-summary endpoints for the
+current season and upserts them into player_gameweeks in the historical schema
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb
+import pandas as pd
+
+from src.ingestion.data_exploration import DATABASE_PATH, STORAGE, FPLDataLoader, quote_identifier
+from src.ingestion.http_client import DEFAULT_TIMEOUT, create_session
+from src.ingestion.parquet_lake import LAKE_DIR, write_fixtures
+from src.ingestion.schemas import FIXTURE_COLUMNS, conform_frame
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+API_BASE_URL = "https://fantasy.premierleague.com/api"
+CHECKPOINT_DIR = "data/api_checkpoints"
+CHECKPOINT_MAX_AGE = 6 * 3600  # seconds a checkpoint is reused while its gameweek is not yet final
+MAX_CONCURRENCY = 16  # element-summary requests in flight at once
+REQUESTS_PER_SECOND = 40.0  # token bucket refill rate across all requests
+FIXTURES_TABLE = "api_fixtures"
+
+# element_types.singular_name_short -> position labels used by the historical data
+POSITION_CODES = {'GKP': 'GK', 'DEF': 'DEF', 'MID': 'MID', 'FWD': 'FWD'}
+
+
+class AsyncRateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available, then take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FPLAPILoader:
+    """Fetch the live season from the FPL API and normalise it into player_gameweeks rows"""
+
+    def __init__(self, base_url: str = API_BASE_URL, database_path: str = DATABASE_PATH,
+                 checkpoint_dir: str = CHECKPOINT_DIR, max_concurrency: int = MAX_CONCURRENCY,
+                 requests_per_second: float = REQUESTS_PER_SECOND, timeout: int = DEFAULT_TIMEOUT,
+                 storage: str = STORAGE, lake_dir: str = LAKE_DIR):
+        self.base_url = base_url.rstrip("/")
+        self.database_path = database_path
+        self.lake_dir = lake_dir
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.storage = storage
+        # One pooled keep-alive session shared by every worker thread
+        self.session = create_session(pool_size=max_concurrency)
+
+    def fetch_json(self, path: str) -> dict:
+        """GET one API endpoint and decode its JSON body"""
+        response = self.session.get(f"{self.base_url}/{path}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def load_bootstrap(self) -> dict:
+        """Players, teams, positions and gameweek (event) metadata"""
+        return self.fetch_json("bootstrap-static/")
+
+    def load_fixtures(self) -> List[dict]:
+        """Every fixture of the season, played or not"""
+        return self.fetch_json("fixtures/")
+
+    def season_label(self, bootstrap: dict) -> str:
+        """Derive the season label (e.g. 2025-26) from the first gameweek's deadline"""
+        start_year = pd.Timestamp(bootstrap['events'][0]['deadline_time']).year
+        return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+    def latest_finished_gameweek(self, bootstrap: dict) -> int:
+        """Most recent gameweek whose fixtures have all been played (0 before the season starts)"""
+        finished = [event['id'] for event in bootstrap['events'] if event.get('finished')]
+        return max(finished, default=0)
+
+    def gameweek_is_final(self, bootstrap: dict, gameweek: int) -> bool:
+        """Whether FPL has signed off a gameweek's data, after which bonus and corrections stop changing"""
+        return any(event['id'] == gameweek and event.get('data_checked') for event in bootstrap['events'])
+
+    def checkpoint_path(self, season: str, gameweek: int) -> Path:
+        """Checkpoint directory for one refresh; a new finished gameweek starts a fresh one"""
+        return self.checkpoint_dir / season / f"gw{gameweek}"
+
+    def prune_checkpoints(self, keep: Path):
+        """Remove every checkpoint directory except `keep`; older gameweeks' responses are superseded"""
+        for path in self.checkpoint_dir.glob("*/gw*"):
+            if path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+        for season_dir in self.checkpoint_dir.glob("*"):
+            if season_dir.is_dir() and not any(season_dir.iterdir()):
+                season_dir.rmdir()
+
+    async def _fetch_element_summaries(self, element_ids: List[int], checkpoint: Path,
+                                       max_age: Optional[float] = None) -> Dict[int, dict]:
+        """Fetch element-summary for each player concurrently, reusing checkpointed responses
+
+        Checkpoints older than `max_age` seconds are fetched again, so corrections
+        to a gameweek that is not final yet are picked up.
+        """
+        checkpoint.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        # Sized to max_concurrency; the default executor is capped by CPU count
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        limiter = AsyncRateLimiter(self.requests_per_second)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        stats = {'fetched': 0, 'resumed': 0, 'expired': 0}
+
+        async def fetch_one(element_id: int) -> dict:
+            path = checkpoint / f"element_{element_id}.json"
+            if path.exists():
+                if max_age is None or time.time() - path.stat().st_mtime < max_age:
+                    stats['resumed'] += 1
+                    return json.loads(path.read_text())
+                stats['expired'] += 1
+
+            async with semaphore:
+                await limiter.acquire()
+                summary = await loop.run_in_executor(executor, self.fetch_json, f"element-summary/{element_id}/")
+
+            # Write-then-rename so an interrupted run never leaves a truncated checkpoint
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(summary))
+            os.replace(tmp_path, path)
+            stats['fetched'] += 1
+            return summary
+
+        try:
+            results = await asyncio.gather(*(fetch_one(i) for i in element_ids), return_exceptions=True)
+        finally:
+            executor.shutdown(wait=False)
+
+        summaries = {}
+        failures = []
+        for element_id, result in zip(element_ids, results):
+            if isinstance(result, Exception):
+                failures.append(element_id)
+                logger.warning(f"⚠️  element-summary {element_id} failed: {result}")
+            else:
+                summaries[element_id] = result
+
+        logger.info(f"📡 element-summary: {stats['fetched']} fetched ({stats['expired']} expired checkpoints), "
+                    f"{stats['resumed']} resumed from checkpoint")
+        if failures:
+            raise RuntimeError(f"{len(failures)} of {len(element_ids)} element-summary requests failed; "
+                               f"rerun to resume from {checkpoint}")
+        return summaries
+
+    def fetch_element_summaries(self, element_ids: List[int], checkpoint: Path,
+                                max_age: Optional[float] = None) -> Dict[int, dict]:
+        """Synchronous entry point for the async element-summary fetch"""
+        return asyncio.run(self._fetch_element_summaries(element_ids, checkpoint, max_age))
+
+    def normalise_history(self, bootstrap: dict, summaries: Dict[int, dict], season: str,
+                          gameweek: int) -> pd.DataFrame:
+        """Flatten element-summary histories up to `gameweek` into the player_gameweeks schema
+
+        Rows from later rounds belong to a gameweek still in progress; loading them
+        would store partial scores that the checkpoint keeps serving until it finishes.
+        """
+        players = pd.DataFrame(bootstrap['elements'])[['id', 'first_name', 'second_name', 'element_type', 'team']]
+        team_names = {team['id']: team['name'] for team in bootstrap['teams']}
+        positions = {t['id']: POSITION_CODES.get(t['singular_name_short'], t['singular_name_short'])
+                     for t in bootstrap['element_types']}
+
+        history = pd.DataFrame([row for summary in summaries.values() for row in summary.get('history', [])])
+        if not history.empty:
+            history = history[history['round'] <= gameweek]
+        if history.empty:
+            return conform_frame(history, season)
+
+        # History rows carry their own element id; identity comes from bootstrap
+        df = history.merge(players.rename(columns={'id': 'element', 'team': 'team_id'}), on='element', how='left')
+        df['name'] = df['first_name'] + ' ' + df['second_name']
+        df['position'] = df['element_type'].map(positions)
+        df['team'] = df['team_id'].map(team_names)
+        df['GW'] = df['round']
+
+        return conform_frame(df, season)
+
+    def normalise_fixtures(self, bootstrap: dict, fixtures: List[dict], season: str) -> pd.DataFrame:
+        """Fixture list with team names, one row per match"""
+        team_names = {team['id']: team['name'] for team in bootstrap['teams']}
+        df = pd.DataFrame(fixtures)
+        return pd.DataFrame({
+            'season': season,
+            'fixture_id': df['id'],
+            'gameweek': df['event'].astype('Int16'),
+            'kickoff_time': pd.to_datetime(df['kickoff_time'], utc=True, errors='coerce', format='ISO8601'),
+            'team_h_id': df['team_h'],
+            'team_a_id': df['team_a'],
+            'team_h': df['team_h'].map(team_names),
+            'team_a': df['team_a'].map(team_names),
+            'team_h_difficulty': df['team_h_difficulty'],
+            'team_a_difficulty': df['team_a_difficulty'],
+            'team_h_score': df['team_h_score'].astype('Int16'),
+            'team_a_score': df['team_a_score'].astype('Int16'),
+            'finished': df['finished'].astype(bool),
+        })
+
+    def save_fixtures(self, fixtures: pd.DataFrame):
+        """Replace this season's rows in the fixtures table and re-export it beside the lake
+
+        dbt reads the export for upcoming fixtures, which have no player rows yet.
+        """
+        conn = duckdb.connect(self.database_path)
+        try:
+            conn.register('fixtures_df', fixtures)
+            columns = ", ".join(f"{quote_identifier(name)} {dtype}" for name, dtype in FIXTURE_COLUMNS.items())
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {FIXTURES_TABLE} ({columns})")
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute(f"DELETE FROM {FIXTURES_TABLE} WHERE season IN (SELECT DISTINCT season FROM fixtures_df)")
+            conn.execute(f"INSERT INTO {FIXTURES_TABLE} BY NAME SELECT * FROM fixtures_df")
+            conn.execute("COMMIT")
+            write_fixtures(conn, FIXTURES_TABLE, self.lake_dir)
+            logger.info(f"📅 Saved {len(fixtures)} fixtures to {FIXTURES_TABLE}")
+        finally:
+            conn.close()
+
+    def run_gameweek_refresh(self) -> int:
+        """Fetch the live season and upsert any new or changed gameweeks
+
+        Returns the number of player_gameweeks rows written.
+        """
+        start = time.perf_counter()
+        bootstrap = self.load_bootstrap()
+        season = self.season_label(bootstrap)
+        gameweek = self.latest_finished_gameweek(bootstrap)
+        logger.info(f"🌐 FPL API: {season}, latest finished gameweek {gameweek}, "
+                    f"{len(bootstrap['elements'])} players")
+
+        self.save_fixtures(self.normalise_fixtures(bootstrap, self.load_fixtures(), season))
+        if gameweek == 0:
+            logger.info("Season has not started, no gameweek data to load")
+            return 0
+
+        checkpoint = self.checkpoint_path(season, gameweek)
+        self.prune_checkpoints(keep=checkpoint)
+        # Until FPL signs the gameweek off its scores can still change, so checkpoints expire
+        max_age = None if self.gameweek_is_final(bootstrap, gameweek) else CHECKPOINT_MAX_AGE
+        element_ids = [element['id'] for element in bootstrap['elements']]
+        summaries = self.fetch_element_summaries(element_ids, checkpoint, max_age)
+        df = self.normalise_history(bootstrap, summaries, season, gameweek)
+        logger.info(f"📊 Normalised {len(df):,} player gameweek rows in {time.perf_counter() - start:.1f}s")
+
+        # Nothing is downloaded from the data repo here, so the loader needs no raw cache
+        loader = FPLDataLoader(database_path=self.database_path, cache_dir=None, storage=self.storage,
+                               lake_dir=self.lake_dir)
+        if not loader.table_exists('player_gameweeks'):
+            raise RuntimeError("player_gameweeks does not exist yet; run the historical loader first")
+        n_rows = loader.upsert_changed_partitions(df)
+
+        logger.info(f"🎉 Gameweek refresh finished in {time.perf_counter() - start:.1f}s")
+        return n_rows
+
+    def close(self):
+        self.session.close()
+
+
+def main():
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Refresh the live season from the FPL API")
+    parser.add_argument("--base-url", default=API_BASE_URL)
+    parser.add_argument("--max-concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--requests-per-second", type=float, default=REQUESTS_PER_SECOND)
+    args = parser.parse_args()
+
+    print("🌐 FPL Live API Loader")
+    print("=" * 50)
+
+    loader = FPLAPILoader(base_url=args.base_url, max_concurrency=args.max_concurrency,
+                          requests_per_second=args.requests_per_second)
+    try:
+        loader.run_gameweek_refresh()
+    finally:
+        loader.close()
+
+
+if __name__ == "__main__":
+    main()
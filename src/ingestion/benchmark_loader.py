@@ -0,0 +1,86 @@
+"""
+Peak-memory benchmark for the historical loader
+Runs the concatenated-DataFrame path and the streaming Arrow path in fresh
+processes and compares wall time and peak RSS
+
+Usage: python -m src.ingestion.benchmark_loader [--base-url URL]
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.ingestion.data_exploration import BASE_URL, FPLDataLoader
+
+MODES = ["concat", "stream"]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(mode: str, base_url: str, database_path: str):
+    """Run one load in this process and print its measurements as JSON
+
+    Each mode lands in its own throwaway lake and raw cache, so the benchmark
+    never touches the production lake or its watermarks and neither mode
+    reads downloads cached by the other.
+    """
+    with tempfile.TemporaryDirectory(prefix=f"benchmark_loader_{mode}_") as scratch:
+        loader = FPLDataLoader(database_path=database_path, base_url=base_url,
+                               cache_dir=str(Path(scratch) / "raw_cache"),
+                               lake_dir=str(Path(scratch) / "lake"))
+        baseline_mb = peak_rss_mb()
+
+        start = time.perf_counter()
+        loader.run_complete_load(streaming=(mode == "stream"))
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "mode": mode,
+        "seconds": round(elapsed, 2),
+        "baseline_rss_mb": round(baseline_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main():
+    """Benchmark each load mode in its own subprocess"""
+    parser = argparse.ArgumentParser(description="Compare peak RSS of the loader's concat and streaming paths")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--database-path", default="data/benchmark_loader.db")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.base_url, args.database_path)
+        return
+
+    print("📏 Loader Peak Memory Benchmark")
+    print("=" * 50)
+
+    results = []
+    for mode in MODES:
+        Path(args.database_path).unlink(missing_ok=True)
+        completed = subprocess.run(
+            [sys.executable, "-m", "src.ingestion.benchmark_loader", "--mode", mode,
+             "--base-url", args.base_url, "--database-path", args.database_path],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    Path(args.database_path).unlink(missing_ok=True)
+
+    for r in results:
+        print(f"  {r['mode']:>7}: {r['seconds']:6.2f}s, peak RSS {r['peak_rss_mb']:7.1f} MB "
+              f"(+{r['peak_rss_mb'] - r['baseline_rss_mb']:.1f} MB over startup)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,37 @@ Complete Historical FPL Data Loader
 Handles both merged files and individual gameweek files to create complete dataset
 """
 
+import argparse
+import io
+import shutil
 import pandas as pd
+import pyarrow as pa
 import duckdb
 from pathlib import Path
-import requests
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 import logging
 
+from src.ingestion.http_client import ConcurrentFetcher, DEFAULT_MAX_WORKERS
+from src.ingestion.raw_cache import RawFileCache, RAW_CACHE_DIR, DEFAULT_MAX_CACHE_BYTES
+from src.ingestion.parquet_lake import (
+    LAKE_DIR,
+    create_lake_view,
+    fixtures_path,
+    replace_partitions,
+    swap_directory,
+    watermark_path,
+    write_fixtures,
+    write_partitions,
+    write_watermarks,
+)
+from src.ingestion.schemas import (
+    CATEGORICAL_COLUMNS,
+    FIXTURE_COLUMNS,
+    GAMEWEEK_FILE_OPTIONAL,
+    concat_frames,
+    read_gameweek_csv,
+)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,13 +43,33 @@ BASE_URL = "https://raw.githubusercontent.com/vaastav/Fantasy-Premier-League/mas
 COMPLETE_SEASONS = ["2020-21", "2021-22", "2022-23", "2023-24"]  # These have complete merged files
 PARTIAL_SEASONS = ["2024-25"]  # These need reconstruction
 DATABASE_PATH = "data/fpl_complete.db"
+MAX_WORKERS = DEFAULT_MAX_WORKERS  # Concurrent downloads/probes against the data repo
+MAX_CACHE_BYTES = DEFAULT_MAX_CACHE_BYTES  # Raw CSV cache size before LRU eviction
+WATERMARK_TABLE = "load_watermarks"  # Row count and content hash per loaded (season, GW)
+STORAGE = "lake"  # "lake": Parquet files + view, "table": native DuckDB table (not read by dbt)
+
+def quote_identifier(name: str) -> str:
+    """Quote a column name for use in DuckDB SQL"""
+    return '"' + name.replace('"', '""') + '"'
 
 class FPLDataLoader:
     """Handles loading and combining FPL historical data"""
     
-    def __init__(self, database_path: str = DATABASE_PATH):
+    def __init__(self, database_path: str = DATABASE_PATH, base_url: str = BASE_URL,
+                 max_workers: int = MAX_WORKERS, cache_dir: Optional[str] = RAW_CACHE_DIR,
+                 max_cache_bytes: int = MAX_CACHE_BYTES, storage: str = STORAGE,
+                 lake_dir: str = LAKE_DIR):
+        if storage not in ("lake", "table"):
+            raise ValueError(f"Unknown storage {storage!r}, expected 'lake' or 'table'")
         self.database_path = database_path
+        self.base_url = base_url.rstrip('/')
+        self.storage = storage
+        self.lake_dir = lake_dir
         self.ensure_data_directory()
+
+        # Pass cache_dir=None to always hit the network
+        cache = RawFileCache(cache_dir, max_cache_bytes) if cache_dir else None
+        self.fetcher = ConcurrentFetcher(max_workers=max_workers, cache=cache)
         
     def ensure_data_directory(self):
         """Create data directory if it doesn't exist"""
@@ -33,12 +77,15 @@ class FPLDataLoader:
         
     def load_merged_season(self, season: str) -> Optional[pd.DataFrame]:
         """Load a complete season from merged_gw.csv"""
-        url = f"{BASE_URL}/{season}/gws/merged_gw.csv"
+        url = f"{self.base_url}/{season}/gws/merged_gw.csv"
         logger.info(f"Loading merged data for {season}")
         
+        # Closed seasons never change, so their cached copy is served without revalidation
+        immutable = season in COMPLETE_SEASONS
+        
         try:
-            df = pd.read_csv(url, on_bad_lines='skip')
-            df['season'] = season
+            content = self.fetcher.get_bytes(url, immutable=immutable)
+            df = read_gameweek_csv(io.BytesIO(content), season)
             logger.info(f"✅ Loaded {len(df)} rows for {season}")
             return df
         except Exception as e:
@@ -47,30 +94,23 @@ class FPLDataLoader:
     
     def check_available_gameweeks(self, season: str) -> List[int]:
         """Check which individual gameweek files are available for a season"""
-        available_gws = []
-        
-        # Check GW 1-38 (full season)
-        for gw in range(1, 39):
-            url = f"{BASE_URL}/{season}/gws/gw{gw}.csv"
-            try:
-                response = requests.head(url, timeout=10)
-                if response.status_code == 200:
-                    available_gws.append(gw)
-            except:
-                continue
+        # Probe GW 1-38 (full season) concurrently
+        urls = {gw: f"{self.base_url}/{season}/gws/gw{gw}.csv" for gw in range(1, 39)}
+        found = self.fetcher.map(lambda gw: self.fetcher.exists(urls[gw]), urls)
+        available_gws = [gw for gw, exists in found.items() if exists]
                 
         logger.info(f"Available individual GW files for {season}: {len(available_gws)} gameweeks")
         return available_gws
     
     def load_individual_gameweek(self, season: str, gameweek: int) -> Optional[pd.DataFrame]:
         """Load an individual gameweek file"""
-        url = f"{BASE_URL}/{season}/gws/gw{gameweek}.csv"
+        url = f"{self.base_url}/{season}/gws/gw{gameweek}.csv"
         
         try:
-            df = pd.read_csv(url, on_bad_lines='skip')
-            df['season'] = season
-            df['GW'] = gameweek  # Ensure GW column exists
-            return df
+            content = self.fetcher.get_bytes(url)
+            # GW comes from the file name, so it is allowed to be absent from the file
+            return read_gameweek_csv(io.BytesIO(content), season, gameweek=gameweek,
+                                     optional=GAMEWEEK_FILE_OPTIONAL)
         except Exception as e:
             logger.warning(f"Failed to load {season} GW{gameweek}: {e}")
             return None
@@ -98,12 +138,9 @@ class FPLDataLoader:
             missing_gws = available_gws
             logger.info(f"No merged file, loading all {len(missing_gws)} individual GWs")
         
-        # Load missing gameweeks
-        individual_dfs = []
-        for gw in missing_gws:
-            gw_df = self.load_individual_gameweek(season, gw)
-            if gw_df is not None:
-                individual_dfs.append(gw_df)
+        # Load missing gameweeks in parallel
+        loaded = self.fetcher.map(lambda gw: self.load_individual_gameweek(season, gw), missing_gws)
+        individual_dfs = [gw_df for gw_df in loaded.values() if gw_df is not None]
         
         # Combine everything
         all_dfs = []
@@ -112,12 +149,8 @@ class FPLDataLoader:
         all_dfs.extend(individual_dfs)
         
         if all_dfs:
-            # Find common columns across all dataframes
-            common_columns = set.intersection(*[set(df.columns) for df in all_dfs])
-            logger.info(f"Common columns across all data: {len(common_columns)}")
-            
-            # Combine using only common columns
-            combined_df = pd.concat([df[list(common_columns)] for df in all_dfs], ignore_index=True)
+            # Every frame already matches the schema registry, so no column intersection is needed
+            combined_df = concat_frames(all_dfs)
             
             # Remove duplicates (in case of overlap between merged and individual files)
             combined_df = combined_df.drop_duplicates(subset=['name', 'GW', 'season'], keep='first')
@@ -133,11 +166,9 @@ class FPLDataLoader:
         
         all_season_data = []
         
-        # Load complete seasons from merged files
-        for season in COMPLETE_SEASONS:
-            df = self.load_merged_season(season)
-            if df is not None:
-                all_season_data.append(df)
+        # Load complete seasons from merged files in parallel
+        merged = self.fetcher.map(self.load_merged_season, COMPLETE_SEASONS)
+        all_season_data.extend(df for df in merged.values() if df is not None)
         
         # Reconstruct partial seasons
         for season in PARTIAL_SEASONS:
@@ -148,12 +179,13 @@ class FPLDataLoader:
         if not all_season_data:
             raise ValueError("No data loaded successfully")
         
-        # Find common columns across all seasons
-        common_columns = set.intersection(*[set(df.columns) for df in all_season_data])
-        logger.info(f"Final common columns: {len(common_columns)}")
+        stats = self.fetcher.stats
+        logger.info(f"🌐 Network: {stats['downloads']} downloads ({stats['network_bytes']:,} bytes), "
+                    f"{stats['cache_hits']} cache hits, {stats['revalidated']} revalidated")
         
-        # Combine all seasons
-        final_df = pd.concat([df[list(common_columns)] for df in all_season_data], ignore_index=True)
+        # Combine all seasons (schema drift was already reported per file by the registry)
+        final_df = concat_frames(all_season_data)
+        logger.info(f"Final columns: {len(final_df.columns)} ({final_df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory)")
         
         # Data quality summary
         logger.info(f"📊 Complete Dataset Summary:")
@@ -163,7 +195,7 @@ class FPLDataLoader:
         logger.info(f"   Gameweek range: {final_df['GW'].min()}-{final_df['GW'].max()}")
         
         # Check season completeness
-        for season in final_df['season'].unique():
+        for season in final_df['season'].cat.categories:
             season_data = final_df[final_df['season'] == season]
             gw_range = f"{season_data['GW'].min()}-{season_data['GW'].max()}"
             gw_count = season_data['GW'].nunique()
@@ -181,31 +213,327 @@ class FPLDataLoader:
             # Register the dataframe and create table
             conn.register('complete_data', df)
             
-            conn.execute("""
+            self._drop_player_gameweeks(conn)
+            conn.execute(f"""
             CREATE OR REPLACE TABLE player_gameweeks AS 
-            SELECT * FROM complete_data
+            {self._select_as_stored('complete_data', df.columns)}
             """)
             
-            # Create indexes for better query performance
+            self._finalize_player_gameweeks(conn)
+            
+        except Exception as e:
+            logger.error(f"❌ Database error: {e}")
+            raise
+        finally:
+            conn.close()
+    
+    def iter_season_batches(self) -> Iterator[pa.Table]:
+        """Yield one Arrow table per season without ever concatenating seasons
+
+        Closed seasons are downloaded into the raw cache in parallel first, then
+        parsed one at a time so only a single season is held in memory.
+        """
+        if self.fetcher.cache is not None:
+            urls = [f"{self.base_url}/{season}/gws/merged_gw.csv" for season in COMPLETE_SEASONS]
+            self.fetcher.map(lambda url: self.fetcher.prefetch(url, immutable=True), urls)
+        
+        for season in COMPLETE_SEASONS:
+            df = self.load_merged_season(season)
+            if df is not None:
+                yield pa.Table.from_pandas(df, preserve_index=False)
+        
+        for season in PARTIAL_SEASONS:
+            df = self.reconstruct_complete_season(season)
+            if df is not None:
+                yield pa.Table.from_pandas(df, preserve_index=False)
+    
+    def stream_to_database(self, batches: Iterator[pa.Table]):
+        """Append Arrow batches straight into DuckDB, then swap them in as player_gameweeks
+
+        DuckDB scans each registered Arrow table in place, so the only copy made is
+        the one written into the database. Batches are committed one by one into a
+        loading table rather than held in one long transaction, and the finished
+        table replaces player_gameweeks in a single rename.
+        """
+        logger.info(f"💾 Streaming batches to database: {self.database_path}")
+        
+        conn = duckdb.connect(self.database_path)
+        loading_table = "player_gameweeks__loading"
+        
+        try:
+            n_batches = 0
+            for batch in batches:
+                conn.register('season_batch', batch)
+                select = self._select_as_stored('season_batch', batch.column_names)
+                if n_batches == 0:
+                    conn.execute(f"CREATE OR REPLACE TABLE {loading_table} AS {select}")
+                else:
+                    conn.execute(f"INSERT INTO {loading_table} BY NAME {select}")
+                conn.unregister('season_batch')
+                n_batches += 1
+                logger.info(f"   Batch {n_batches}: {batch.num_rows:,} rows ({batch.nbytes / 1e6:.1f} MB)")
+            
+            if n_batches == 0:
+                raise ValueError("No data loaded successfully")
+            
+            conn.execute("BEGIN TRANSACTION")
+            self._drop_player_gameweeks(conn)
+            conn.execute(f"ALTER TABLE {loading_table} RENAME TO player_gameweeks")
+            conn.execute("COMMIT")
+            
+            self._finalize_player_gameweeks(conn)
+            
+            stats = self.fetcher.stats
+            logger.info(f"🌐 Network: {stats['downloads']} downloads ({stats['network_bytes']:,} bytes), "
+                        f"{stats['cache_hits']} cache hits, {stats['revalidated']} revalidated")
+            
+        except Exception as e:
+            logger.error(f"❌ Database error: {e}")
+            raise
+        finally:
+            conn.close()
+    
+    def write_to_lake(self, batches: Iterator[pa.Table]):
+        """Write Arrow batches to the partitioned Parquet lake and point player_gameweeks at it
+
+        The lake is rebuilt in a staging directory and swapped in once every
+        batch has been written, so readers never see a half-written lake.
+        """
+        logger.info(f"🗂️  Writing batches to Parquet lake: {self.lake_dir}")
+        
+        staging_dir = f"{self.lake_dir}__loading"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        conn = duckdb.connect(self.database_path)
+        
+        try:
+            n_batches = 0
+            for batch in batches:
+                conn.register('season_batch', batch)
+                write_partitions(conn, self._select_as_stored('season_batch', batch.column_names), staging_dir)
+                conn.unregister('season_batch')
+                n_batches += 1
+                logger.info(f"   Batch {n_batches}: {batch.num_rows:,} rows ({batch.nbytes / 1e6:.1f} MB)")
+            
+            if n_batches == 0:
+                raise ValueError("No data loaded successfully")
+            
+            swap_directory(staging_dir, self.lake_dir)
+            self._drop_player_gameweeks(conn)
+            create_lake_view(conn, lake_dir=self.lake_dir)
+            self._finalize_player_gameweeks(conn, create_indexes=False)
+            
+        except Exception as e:
+            logger.error(f"❌ Lake write error: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        finally:
+            conn.close()
+    
+    def _drop_player_gameweeks(self, conn):
+        """Drop player_gameweeks whether it is currently a table or a lake view"""
+        kind = conn.execute(
+            "SELECT table_type FROM information_schema.tables WHERE table_name = 'player_gameweeks'"
+        ).fetchone()
+        if kind is not None:
+            conn.execute(f"DROP {'VIEW' if kind[0] == 'VIEW' else 'TABLE'} player_gameweeks")
+    
+    def _select_as_stored(self, relation: str, columns) -> str:
+        """SELECT over a registered frame/batch with categoricals cast to VARCHAR
+
+        Categoricals would otherwise become DuckDB ENUMs, which later upserts could
+        not extend with new player or team names.
+        """
+        categoricals = [col for col in CATEGORICAL_COLUMNS if col in columns]
+        replace = ", ".join(f"CAST({quote_identifier(col)} AS VARCHAR) AS {quote_identifier(col)}" for col in categoricals)
+        return f"SELECT * {f'REPLACE ({replace})' if replace else ''} FROM {relation}"
+    
+    def _finalize_player_gameweeks(self, conn, create_indexes: bool = True):
+        """Index a freshly built player_gameweeks table, reset watermarks and log a summary"""
+        # Create indexes for better query performance (the lake view relies on partition pruning instead)
+        if create_indexes:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_player_season_gw ON player_gameweeks(name, season, GW)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_season_gw ON player_gameweeks(season, GW)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_team_season ON player_gameweeks(team, season)")
+        
+        # Reset the watermarks so later incremental loads diff against this snapshot
+        self._create_watermark_table(conn, replace=True)
+        conn.execute(f"CREATE TEMP TABLE loaded_partitions AS {self._partition_fingerprint_sql(conn, 'player_gameweeks')}")
+        self._record_watermarks(conn, 'loaded_partitions')
+        
+        # Verify the data
+        stats = conn.execute("""
+        SELECT 
+            COUNT(*) as total_rows,
+            COUNT(DISTINCT name) as unique_players,
+            COUNT(DISTINCT season) as seasons,
+            COUNT(DISTINCT CONCAT(season, '-', GW)) as unique_gameweeks
+        FROM player_gameweeks
+        """).fetchone()
+        
+        logger.info(f"✅ Database created successfully:")
+        logger.info(f"   Total rows: {stats[0]:,}")
+        logger.info(f"   Unique players: {stats[1]:,}")
+        logger.info(f"   Seasons: {stats[2]}")
+        logger.info(f"   Unique gameweeks: {stats[3]:,}")
+    
+    def _create_watermark_table(self, conn, replace: bool = False):
+        """Create the per-partition load watermark table"""
+        create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+        conn.execute(f"""
+        {create} {WATERMARK_TABLE} (
+            season VARCHAR,
+            GW INTEGER,
+            row_count BIGINT,
+            content_hash VARCHAR,
+            loaded_at TIMESTAMP,
+            PRIMARY KEY (season, GW)
+        )
+        """)
+    
+    def _table_columns(self, conn, table: str) -> List[Tuple[str, str]]:
+        """Column names and types of a table, in table order"""
+        return conn.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = ?
+        ORDER BY ordinal_position
+        """, [table]).fetchall()
+    
+    def _partition_fingerprint_sql(self, conn, relation: str) -> str:
+        """SQL computing row count and an order-independent content hash per (season, GW)
+
+        Values are cast to the stored player_gameweeks types first, so a partition
+        hashes the same whether it comes from a fresh download or from the table.
+        """
+        hashed = ", ".join(f'CAST({quote_identifier(name)} AS {dtype})' for name, dtype in self._table_columns(conn, 'player_gameweeks'))
+        return f"""
+        SELECT
+            season,
+            GW,
+            COUNT(*) AS row_count,
+            CAST(SUM(hash({hashed})) AS VARCHAR) AS content_hash
+        FROM {relation}
+        GROUP BY season, GW
+        """
+    
+    def _record_watermarks(self, conn, partitions: str):
+        """Upsert watermark rows for the given partitions relation
+
+        With lake storage the table is also exported beside the lake, where dbt
+        reads it whichever database the project builds into.
+        """
+        conn.execute(f"""
+        INSERT OR REPLACE INTO {WATERMARK_TABLE}
+        SELECT season, GW, row_count, content_hash, current_timestamp
+        FROM {partitions}
+        """)
+        if self.storage == "lake":
+            write_watermarks(conn, WATERMARK_TABLE, self.lake_dir)
+            self._ensure_fixture_export(conn)
+    
+    def _ensure_fixture_export(self, conn):
+        """Export an empty fixture list beside the lake until the API loader writes a real one
+
+        dbt reads it as the api_fixtures source, which has to exist even when only
+        historical data has been loaded.
+        """
+        if fixtures_path(self.lake_dir).exists():
+            return
+        columns = ", ".join(f"{quote_identifier(name)} {dtype}" for name, dtype in FIXTURE_COLUMNS.items())
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE empty_fixtures ({columns})")
+        write_fixtures(conn, 'empty_fixtures', self.lake_dir)
+    
+    def upsert_changed_partitions(self, df: pd.DataFrame) -> int:
+        """Replace only the (season, GW) partitions that are new or whose content changed
+
+        Returns the number of rows written.
+        """
+        conn = duckdb.connect(self.database_path)
+        
+        try:
+            columns = self._table_columns(conn, 'player_gameweeks')
+            self._create_watermark_table(conn)
             
-            # Verify the data
-            stats = conn.execute("""
-            SELECT 
-                COUNT(*) as total_rows,
-                COUNT(DISTINCT name) as unique_players,
-                COUNT(DISTINCT season) as seasons,
-                COUNT(DISTINCT CONCAT(season, '-', GW)) as unique_gameweeks
-            FROM player_gameweeks
-            """).fetchone()
-            
-            logger.info(f"✅ Database created successfully:")
-            logger.info(f"   Total rows: {stats[0]:,}")
-            logger.info(f"   Unique players: {stats[1]:,}")
-            logger.info(f"   Seasons: {stats[2]}")
-            logger.info(f"   Unique gameweeks: {stats[3]:,}")
+            # Conform incoming data to the stored schema (extra columns dropped, missing ones NULL)
+            conn.register('incoming_raw', df)
+            select_list = ",\n".join(
+                f'CAST({quote_identifier(name) if name in df.columns else "NULL"} AS {dtype}) AS {quote_identifier(name)}'
+                for name, dtype in columns
+            )
+            conn.execute(f"CREATE TEMP TABLE incoming_data AS SELECT {select_list} FROM incoming_raw")
+            conn.unregister('incoming_raw')
+            
+            conn.execute(f"CREATE TEMP TABLE incoming_partitions AS {self._partition_fingerprint_sql(conn, 'incoming_data')}")
+            conn.execute(f"""
+            CREATE TEMP TABLE changed_partitions AS
+            SELECT i.*
+            FROM incoming_partitions i
+            LEFT JOIN {WATERMARK_TABLE} w
+                ON i.season = w.season
+                AND i.GW = w.GW
+            WHERE w.content_hash IS DISTINCT FROM i.content_hash
+            """)
+            
+            n_partitions, n_rows = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM changed_partitions"
+            ).fetchone()
+            if n_partitions == 0:
+                if self.storage == "lake":
+                    if not watermark_path(self.lake_dir).exists():
+                        write_watermarks(conn, WATERMARK_TABLE, self.lake_dir)
+                    self._ensure_fixture_export(conn)
+                logger.info("✅ All incoming gameweeks already loaded, nothing to do")
+                return 0
+            
+            changed = conn.execute(
+                "SELECT season, GW FROM changed_partitions ORDER BY season, GW"
+            ).fetchall()
+            logger.info(f"🔄 Upserting {n_rows:,} rows across {n_partitions} gameweek partitions: "
+                        + ", ".join(f"{season} GW{gw}" for season, gw in changed))
+            
+            if self.storage == "lake":
+                # Write the affected partitions beside the lake and rename them in, so a failed
+                # write leaves the old files in place; watermarks only move once the swap is done
+                staging_dir = f"{self.lake_dir}__upsert"
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                try:
+                    write_partitions(conn, """
+                    SELECT i.*
+                    FROM incoming_data i
+                    SEMI JOIN changed_partitions c
+                        ON i.season = c.season
+                        AND i.GW = c.GW
+                    """, staging_dir)
+                    replace_partitions(staging_dir, self.lake_dir, changed)
+                finally:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                # If the watermark export fails the table rolls back too, so the next run retries
+                conn.execute("BEGIN TRANSACTION")
+                self._record_watermarks(conn, 'changed_partitions')
+                conn.execute("COMMIT")
+                logger.info(f"✅ Incremental load complete: {n_rows:,} rows written")
+                return n_rows
+            
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute("""
+            DELETE FROM player_gameweeks
+            USING changed_partitions c
+            WHERE player_gameweeks.season = c.season
+                AND player_gameweeks.GW = c.GW
+            """)
+            conn.execute("""
+            INSERT INTO player_gameweeks
+            SELECT i.*
+            FROM incoming_data i
+            SEMI JOIN changed_partitions c
+                ON i.season = c.season
+                AND i.GW = c.GW
+            """)
+            self._record_watermarks(conn, 'changed_partitions')
+            conn.execute("COMMIT")
+            
+            logger.info(f"✅ Incremental load complete: {n_rows:,} rows written")
+            return n_rows
             
         except Exception as e:
             logger.error(f"❌ Database error: {e}")
@@ -213,14 +541,63 @@ class FPLDataLoader:
         finally:
             conn.close()
     
-    def run_complete_load(self):
-        """Execute the complete historical data loading process"""
+    def table_exists(self, table: str) -> bool:
+        """Check whether a table exists in the database"""
+        if not Path(self.database_path).exists():
+            return False
+        conn = duckdb.connect(self.database_path, read_only=True)
         try:
-            # Load all data
-            complete_df = self.load_all_historical_data()
+            return bool(self._table_columns(conn, table))
+        finally:
+            conn.close()
+    
+    def run_incremental_load(self):
+        """Refresh in-season data, writing only new or changed gameweeks"""
+        lake_missing = self.storage == "lake" and not Path(self.lake_dir).exists()
+        if lake_missing or not self.table_exists('player_gameweeks'):
+            logger.info("No player_gameweeks data yet, falling back to a complete load")
+            return self.run_complete_load()
+        
+        try:
+            season_dfs = [self.reconstruct_complete_season(season) for season in PARTIAL_SEASONS]
+            season_dfs = [df for df in season_dfs if df is not None]
+            if not season_dfs:
+                raise ValueError("No in-season data loaded successfully")
+            
+            self.upsert_changed_partitions(concat_frames(season_dfs))
+            logger.info("🎉 Incremental data load finished successfully!")
             
-            # Save to database
-            self.save_to_database(complete_df)
+        except Exception as e:
+            logger.error(f"💥 Incremental load failed: {e}")
+            raise
+        finally:
+            # Cache hits only touch access times in memory; write them once per load
+            if self.fetcher.cache is not None:
+                self.fetcher.cache.flush()
+    
+    def run_complete_load(self, streaming: bool = True):
+        """Execute the complete historical data loading process
+
+        By default seasons are streamed one Arrow batch at a time; streaming=False
+        builds the full concatenated DataFrame first. Data lands in the Parquet
+        lake or a DuckDB table depending on storage.
+        """
+        try:
+            if streaming:
+                batches = self.iter_season_batches()
+                if self.storage == "lake":
+                    self.write_to_lake(batches)
+                else:
+                    self.stream_to_database(batches)
+            else:
+                # Load all data
+                complete_df = self.load_all_historical_data()
+                
+                # Save to database
+                if self.storage == "lake":
+                    self.write_to_lake(iter([pa.Table.from_pandas(complete_df, preserve_index=False)]))
+                else:
+                    self.save_to_database(complete_df)
             
             logger.info("🎉 Complete historical data load finished successfully!")
             logger.info(f"📁 Database saved to: {self.database_path}")
@@ -229,14 +606,27 @@ class FPLDataLoader:
         except Exception as e:
             logger.error(f"💥 Load failed: {e}")
             raise
+        finally:
+            # Cache hits only touch access times in memory; write them once per load
+            if self.fetcher.cache is not None:
+                self.fetcher.cache.flush()
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Load FPL historical data into DuckDB")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only upsert new or changed in-season gameweeks")
+    args = parser.parse_args()
+    
     print("🚀 FPL Complete Historical Data Loader")
     print("=" * 50)
     
+    # dbt's sources read the Parquet lake, so the CLI always lands data there
     loader = FPLDataLoader()
-    loader.run_complete_load()
+    if args.incremental:
+        loader.run_incremental_load()
+    else:
+        loader.run_complete_load()
     
     print("\n" + "=" * 50)
     print("✅ Ready for next steps:")
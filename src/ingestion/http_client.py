@@ -0,0 +1,144 @@
+"""
+Concurrent HTTP fetching for FPL data files
+Pooled keep-alive connections, per-request retry/backoff and a bounded worker pool
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.ingestion.raw_cache import RawFileCache
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+def create_session(pool_size: int = DEFAULT_MAX_WORKERS,
+                   retries: int = DEFAULT_RETRIES,
+                   backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> requests.Session:
+    """Create a session whose connection pool and retry policy are shared by all workers"""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["HEAD", "GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ConcurrentFetcher:
+    """Fetches many URLs in parallel over one pool of keep-alive connections"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES, backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 cache: Optional[RawFileCache] = None):
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.cache = cache
+        self.session = create_session(self.max_workers, retries, backoff_factor)
+
+        # Transfer accounting, shared by all worker threads
+        self._stats_lock = threading.Lock()
+        self.stats = {"network_bytes": 0, "cache_hits": 0, "revalidated": 0, "downloads": 0}
+
+    def exists(self, url: str) -> bool:
+        """Return True if a HEAD request for the URL succeeds"""
+        try:
+            response = self.session.head(url, timeout=self.timeout)
+            return response.status_code == 200
+        except requests.RequestException as e:
+            logger.debug(f"HEAD {url} failed: {e}")
+            return False
+
+    def _count(self, **increments: int):
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def get_bytes(self, url: str, immutable: bool = False) -> bytes:
+        """Download a URL, raising on HTTP errors once retries are exhausted
+
+        With a cache attached, immutable URLs are served straight from disk and
+        everything else is revalidated with a conditional GET.
+        """
+        if self.cache is None:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            self._count(network_bytes=len(response.content), downloads=1)
+            return response.content
+
+        entry = self.cache.lookup(url)
+        if entry and (immutable or entry["immutable"]):
+            content = self.cache.read(url)
+            if content is not None:
+                self._count(cache_hits=1)
+                return content
+
+        response = self.session.get(url, timeout=self.timeout, headers=self.cache.conditional_headers(url))
+        if response.status_code == 304:
+            content = self.cache.read(url)
+            if content is not None:
+                self._count(revalidated=1)
+                return content
+            # Blob vanished between lookup and read, fetch unconditionally
+            response = self.session.get(url, timeout=self.timeout)
+
+        response.raise_for_status()
+        self._count(network_bytes=len(response.content), downloads=1)
+        self.cache.store(
+            url,
+            response.content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            immutable=immutable,
+        )
+        return response.content
+
+    def prefetch(self, url: str, immutable: bool = False) -> int:
+        """Make sure a URL is in the cache without keeping its content in memory"""
+        if self.cache is None:
+            raise ValueError("prefetch requires a cache")
+        return len(self.get_bytes(url, immutable=immutable))
+
+    def map(self, func: Callable[[K], V], items: Iterable[K]) -> Dict[K, V]:
+        """Apply func to every item using at most max_workers threads, keeping input order"""
+        items = list(items)
+        if self.max_workers == 1 or len(items) <= 1:
+            return {item: func(item) for item in items}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            results = executor.map(func, items)
+            return dict(zip(items, results))
+
+    def close(self):
+        """Release pooled connections and persist cache access times"""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,116 @@
+"""
+Partitioned Parquet landing zone for raw player gameweeks
+Data is written as season=<season>/GW=<gw>/data_0.parquet (zstd) so DuckDB can
+prune files on season/GW predicates, and exposed to databases as a view
+"""
+
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+LAKE_DIR = "data/lake/player_gameweeks"
+ROW_GROUP_SIZE = 122_880  # DuckDB's default vector-aligned row group; a gameweek fits in one
+COMPRESSION = "zstd"
+PARTITION_COLUMNS = ("season", "GW")
+WATERMARK_FILE = "load_watermarks.parquet"  # beside the lake, for dbt builds against other databases
+FIXTURES_FILE = "api_fixtures.parquet"  # the API fixture list, exported beside the lake the same way
+
+
+def lake_glob(lake_dir: str = LAKE_DIR) -> str:
+    """Absolute glob matching every partition file, usable from any working directory"""
+    return str(Path(lake_dir).resolve() / "*" / "*" / "*.parquet")
+
+
+def partition_path(lake_dir: str, season: str, gameweek: int = None) -> Path:
+    """Directory holding one season, or one season/gameweek partition"""
+    path = Path(lake_dir) / f"season={season}"
+    return path if gameweek is None else path / f"GW={gameweek}"
+
+
+def replace_partitions(staging_dir: str, lake_dir: str, partitions: Iterable[Tuple[str, int]]):
+    """Move partitions written to a staging directory into the lake, then drop the staging directory
+
+    Each file is renamed over its old copy, so a reader sees either the old or the
+    new version of a partition, never a missing one. Staging must sit on the same
+    filesystem as the lake for the renames to be atomic.
+    """
+    for season, gameweek in partitions:
+        source = partition_path(staging_dir, season, gameweek)
+        target = partition_path(lake_dir, season, gameweek)
+        target.mkdir(parents=True, exist_ok=True)
+        new_files = sorted(path.name for path in source.glob("*.parquet"))
+        for name in new_files:
+            os.replace(source / name, target / name)
+        for stale in target.glob("*.parquet"):
+            if stale.name not in new_files:
+                stale.unlink()
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def write_partitions(conn, select_sql: str, lake_dir: str = LAKE_DIR):
+    """COPY a query result into the lake, one file per (season, GW) partition"""
+    Path(lake_dir).mkdir(parents=True, exist_ok=True)
+    conn.execute(f"""
+    COPY ({select_sql})
+    TO '{Path(lake_dir).as_posix()}' (
+        FORMAT PARQUET,
+        PARTITION_BY ({', '.join(PARTITION_COLUMNS)}),
+        COMPRESSION {COMPRESSION},
+        ROW_GROUP_SIZE {ROW_GROUP_SIZE},
+        OVERWRITE_OR_IGNORE
+    )
+    """)
+
+
+def swap_directory(staging_dir: str, lake_dir: str = LAKE_DIR):
+    """Replace the lake with a freshly written staging directory"""
+    lake_path = Path(lake_dir)
+    retired = lake_path.with_name(lake_path.name + "__retired")
+    shutil.rmtree(retired, ignore_errors=True)
+    if lake_path.exists():
+        os.replace(lake_path, retired)
+    os.replace(staging_dir, lake_path)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def watermark_path(lake_dir: str = LAKE_DIR) -> Path:
+    """Parquet copy of the load watermarks, kept next to the lake directory"""
+    return Path(lake_dir).parent / WATERMARK_FILE
+
+
+def fixtures_path(lake_dir: str = LAKE_DIR) -> Path:
+    """Parquet copy of the API fixture list, kept next to the lake directory"""
+    return Path(lake_dir).parent / FIXTURES_FILE
+
+
+def export_table(conn, table: str, path: Path):
+    """COPY a table to one Parquet file, replacing the previous copy atomically"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    conn.execute(f"COPY {table} TO '{tmp_path.as_posix()}' (FORMAT PARQUET, COMPRESSION {COMPRESSION})")
+    os.replace(tmp_path, path)
+
+
+def write_watermarks(conn, table: str, lake_dir: str = LAKE_DIR):
+    """Export the watermark table beside the lake"""
+    export_table(conn, table, watermark_path(lake_dir))
+
+
+def write_fixtures(conn, table: str, lake_dir: str = LAKE_DIR):
+    """Export the fixture list beside the lake"""
+    export_table(conn, table, fixtures_path(lake_dir))
+
+
+def create_lake_view(conn, view_name: str = "player_gameweeks", lake_dir: str = LAKE_DIR):
+    """(Re)create a view over the lake so SQL consumers keep querying player_gameweeks"""
+    conn.execute(f"DROP TABLE IF EXISTS {view_name}")
+    conn.execute(f"""
+    CREATE OR REPLACE VIEW {view_name} AS
+    SELECT * FROM read_parquet('{lake_glob(lake_dir)}', hive_partitioning = true)
+    """)
+    logger.info(f"🗂️  View {view_name} now reads {lake_glob(lake_dir)}")
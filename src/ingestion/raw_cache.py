@@ -0,0 +1,145 @@
+"""
+Content-addressed on-disk cache for raw FPL files
+Blobs are stored by SHA-256 of their content; an index maps each URL to its blob
+plus the ETag/Last-Modified validators needed for conditional GET revalidation
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+RAW_CACHE_DIR = "data/raw_cache"
+DEFAULT_MAX_CACHE_BYTES = 1024 ** 3  # 1 GiB
+
+
+class RawFileCache:
+    """Size-bounded store of downloaded files, keyed by URL and addressed by content hash"""
+
+    def __init__(self, cache_dir: str = RAW_CACHE_DIR, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.blob_dir = self.cache_dir / "blobs"
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dirty = False  # access times changed since the index was last written
+
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.index: Dict[str, dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, dict]:
+        """Read the URL index, starting fresh if it is missing or unreadable"""
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache index {self.index_path}: {e}")
+            return {}
+
+    def _save_index(self):
+        """Atomically persist the URL index"""
+        tmp_path = self.index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.index, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """Return the index entry for a URL if its blob is still on disk"""
+        with self._lock:
+            entry = self.index.get(url)
+        if entry and self._blob_path(entry["sha256"]).exists():
+            return entry
+        return None
+
+    def read(self, url: str) -> Optional[bytes]:
+        """Return cached content for a URL and mark it as recently used
+
+        The new access time is only held in memory; it reaches disk with the next
+        store() or flush(), so cache hits never rewrite the index.
+        """
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+
+        content = self._blob_path(entry["sha256"]).read_bytes()
+        with self._lock:
+            entry["last_access"] = time.time()
+            self._dirty = True
+        return content
+
+    def flush(self):
+        """Persist access times recorded by read(), if there are any"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Build If-None-Match/If-Modified-Since headers from a cached entry"""
+        entry = self.lookup(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, content: bytes, etag: Optional[str] = None,
+              last_modified: Optional[str] = None, immutable: bool = False) -> dict:
+        """Write content to the blob store and point the URL at it"""
+        digest = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not blob_path.exists():
+            blob_path.parent.mkdir(exist_ok=True)
+            tmp_path = blob_path.with_name(f"{digest}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, blob_path)
+
+        now = time.time()
+        entry = {
+            "sha256": digest,
+            "size": len(content),
+            "etag": etag,
+            "last_modified": last_modified,
+            "immutable": immutable,
+            "fetched_at": now,
+            "last_access": now,
+        }
+        with self._lock:
+            self.index[url] = entry
+            self._evict()
+            self._save_index()
+        return entry
+
+    def _evict(self):
+        """Drop least recently used entries until the unique blobs fit in max_bytes"""
+        blob_sizes = {e["sha256"]: e["size"] for e in self.index.values()}
+        total = sum(blob_sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            digest = entry["sha256"]
+            if not any(e["sha256"] == digest for e in self.index.values()):
+                self._blob_path(digest).unlink(missing_ok=True)
+                total -= blob_sizes[digest]
+            logger.info(f"Evicted {url} from raw cache")
+
+    def total_bytes(self) -> int:
+        """Size of all unique blobs referenced by the index"""
+        with self._lock:
+            return sum({e["sha256"]: e["size"] for e in self.index.values()}.values())
@@ -0,0 +1,186 @@
+"""
+Schema registry for raw FPL gameweek CSVs
+Declares, per season, which columns are read and with what dtype, so only the
+columns consumed by stg_player_gameweeks are parsed and wide text columns are
+stored as categoricals instead of Python objects
+"""
+
+import logging
+from typing import Dict, FrozenSet, List, Optional, Set
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+logger = logging.getLogger(__name__)
+
+# Columns read from every gameweek file, with their in-memory dtypes.
+# Plain numpy types parse fastest; files with missing values fall back to NULLABLE_DTYPES.
+PLAYER_GAMEWEEK_DTYPES: Dict[str, str] = {
+    # Player/team identity
+    'name': 'category',
+    'position': 'category',
+    'team': 'category',
+    'element': 'int16',
+    # Fixture context
+    'GW': 'int16',
+    'fixture': 'int16',
+    'opponent_team': 'int16',
+    'was_home': 'bool',
+    'kickoff_time': 'datetime64[ns, UTC]',
+    'team_h_score': 'int16',
+    'team_a_score': 'int16',
+    # Match stats
+    'total_points': 'int16',
+    'minutes': 'int16',
+    'goals_scored': 'int16',
+    'assists': 'int16',
+    'clean_sheets': 'int16',
+    'goals_conceded': 'int16',
+    'own_goals': 'int16',
+    'penalties_saved': 'int16',
+    'penalties_missed': 'int16',
+    'yellow_cards': 'int16',
+    'red_cards': 'int16',
+    'saves': 'int16',
+    'bonus': 'int16',
+    'bps': 'int16',
+    # ICT
+    'influence': 'float32',
+    'creativity': 'float32',
+    'threat': 'float32',
+    'ict_index': 'float32',
+    # Market
+    'value': 'int16',
+    'selected': 'int32',
+    'transfers_in': 'int32',
+    'transfers_out': 'int32',
+    'transfers_balance': 'int32',
+}
+
+# Masked equivalents used when a file has gaps in integer/bool columns
+NULLABLE_DTYPES = {'int16': 'Int16', 'int32': 'Int32', 'bool': 'boolean'}
+
+# Individual gwN.csv files carry the gameweek in the file name, not a GW column
+GAMEWEEK_FILE_OPTIONAL = frozenset({'GW'})
+
+# Per-season overrides of the base dtypes (empty while all loaded seasons share one layout)
+SEASON_DTYPE_OVERRIDES: Dict[str, Dict[str, str]] = {
+    '2020-21': {},
+    '2021-22': {},
+    '2022-23': {},
+    '2023-24': {},
+    '2024-25': {},
+}
+
+# Raw columns we know about but deliberately do not load
+IGNORED_COLUMNS = frozenset({
+    'xP', 'round', 'starts', 'modified',
+    'expected_goals', 'expected_assists', 'expected_goal_involvements', 'expected_goals_conceded',
+    'mng_win', 'mng_draw', 'mng_loss', 'mng_underdog_win', 'mng_underdog_draw',
+    'mng_clean_sheets', 'mng_goals_scored',
+})
+
+CATEGORICAL_COLUMNS = ['name', 'position', 'team', 'season']
+
+# The FPL API fixture list (api_fixtures) in DuckDB types, played and unplayed fixtures alike.
+# Declared here so an empty copy can be exported beside the lake before the API loader has run.
+FIXTURE_COLUMNS: Dict[str, str] = {
+    'season': 'VARCHAR',
+    'fixture_id': 'BIGINT',
+    'gameweek': 'SMALLINT',  # NULL while a postponed fixture is unscheduled
+    'kickoff_time': 'TIMESTAMP WITH TIME ZONE',
+    'team_h_id': 'BIGINT',
+    'team_a_id': 'BIGINT',
+    'team_h': 'VARCHAR',
+    'team_a': 'VARCHAR',
+    'team_h_difficulty': 'BIGINT',
+    'team_a_difficulty': 'BIGINT',
+    'team_h_score': 'SMALLINT',
+    'team_a_score': 'SMALLINT',
+    'finished': 'BOOLEAN',
+}
+
+
+def get_season_dtypes(season: str) -> Dict[str, str]:
+    """Return the declared column dtypes for a season"""
+    if season not in SEASON_DTYPE_OVERRIDES:
+        logger.warning(f"No schema registered for {season}, using the base player_gameweeks schema")
+    return {**PLAYER_GAMEWEEK_DTYPES, **SEASON_DTYPE_OVERRIDES.get(season, {})}
+
+
+def read_gameweek_csv(source, season: str, gameweek: Optional[int] = None,
+                      optional: FrozenSet[str] = frozenset()) -> pd.DataFrame:
+    """Read a merged_gw.csv or gwN.csv with declared dtypes, pruning undeclared columns
+
+    Missing declared columns are reported and filled with nulls so every frame
+    shares one schema; undeclared columns present in the file are reported too.
+    """
+    dtypes = get_season_dtypes(season)
+    datetime_columns = [column for column, dtype in dtypes.items() if dtype.startswith('datetime64')]
+    read_dtypes = {column: dtype for column, dtype in dtypes.items() if column not in datetime_columns}
+    header: List[str] = []
+
+    def keep_column(column: str) -> bool:
+        header.append(column)
+        return column in dtypes
+
+    try:
+        df = pd.read_csv(source, usecols=keep_column, dtype=read_dtypes, on_bad_lines='skip')
+    except (ValueError, TypeError) as e:
+        # Gaps in int/bool columns cannot be held by numpy dtypes, so switch to masked ones
+        logger.info(f"Re-reading {season} with nullable dtypes: {e}")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        header.clear()
+        read_dtypes = {column: NULLABLE_DTYPES.get(dtype, dtype) for column, dtype in read_dtypes.items()}
+        df = pd.read_csv(source, usecols=keep_column, dtype=read_dtypes, on_bad_lines='skip')
+    for column in datetime_columns:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], utc=True, errors='coerce', format='ISO8601')
+
+    label = f"{season} GW{gameweek}" if gameweek is not None else season
+    report_schema_drift(label, dtypes, header, optional)
+
+    if gameweek is not None:
+        df['GW'] = pd.array([gameweek] * len(df), dtype=dtypes['GW'])
+    return conform_frame(df, season)
+
+
+def conform_frame(df: pd.DataFrame, season: str) -> pd.DataFrame:
+    """Cast a frame to the season's registered schema, adding missing columns as nulls"""
+    dtypes = get_season_dtypes(season)
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            df[column] = pd.Series(index=df.index, dtype=NULLABLE_DTYPES.get(dtype, dtype))
+        elif str(df[column].dtype) != dtype:
+            if dtype.startswith('datetime64'):
+                df[column] = pd.to_datetime(df[column], utc=True, errors='coerce', format='ISO8601')
+            elif df[column].isna().any():
+                df[column] = df[column].astype(NULLABLE_DTYPES.get(dtype, dtype))
+            else:
+                df[column] = df[column].astype(dtype)
+    df['season'] = pd.Categorical.from_codes([0] * len(df), categories=[season])
+
+    return df[list(dtypes) + ['season']]
+
+
+def report_schema_drift(label: str, dtypes: Dict[str, str], header: List[str],
+                        optional: FrozenSet[str] = frozenset()):
+    """Log declared columns missing from a file and file columns the registry has never seen"""
+    present: Set[str] = set(header)
+    missing = sorted(set(dtypes) - present - optional)
+    unexpected = sorted(present - set(dtypes) - IGNORED_COLUMNS)
+
+    if missing:
+        logger.warning(f"⚠️  Schema drift in {label}: missing {missing}, filled with nulls")
+    if unexpected:
+        logger.info(f"Schema drift in {label}: new unregistered columns {unexpected} not loaded")
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate registry-conformed frames, keeping categoricals categorical"""
+    for column in CATEGORICAL_COLUMNS:
+        categories = union_categoricals([df[column] for df in frames], ignore_order=True).categories
+        for df in frames:
+            df[column] = df[column].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
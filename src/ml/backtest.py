@@ -0,0 +1,196 @@
+"""
+Walk-Forward Backtesting for FPL Points Prediction
+Expanding-window folds per gameweek or per season, trained in parallel over a shared feature snapshot
+"""
+
+import argparse
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from src.ml.evaluation import compute_fpl_metrics
+from src.ml.features import TARGET_GAMEWEEK_COLUMN, FeatureMatrix, FeatureStore, MedianImputer
+from src.ml.models import BASELINE_RF_PARAMS
+from src.ml.train_baseline import DB_PATH, ML_DATASET_QUERY, MODEL_DIR, FPLPredictor
+
+# Configuration
+DEFAULT_WORKERS = os.cpu_count() or 1
+RESULTS_PATH = MODEL_DIR / "backtest_results.csv"
+# Season index * GW_SLOTS + gameweek gives one sortable time index across seasons
+GW_SLOTS = 100
+
+# Each worker maps a snapshot once and reuses it for every fold it runs
+_worker_matrices = {}
+
+
+def time_index(meta: pd.DataFrame, gameweek_column: str = 'gameweek') -> np.ndarray:
+    """Sortable (season, gameweek) position of every row, by its feature or target gameweek"""
+    seasons = sorted(meta['season'].unique())
+    season_rank = meta['season'].map({s: i for i, s in enumerate(seasons)}).to_numpy(np.int64)
+    return season_rank * GW_SLOTS + meta[gameweek_column].to_numpy(np.int64)
+
+
+def walk_forward_folds(meta: pd.DataFrame, mode: str = 'season', season: Optional[str] = None,
+                       step: int = 1, min_train_rows: int = 1000) -> List[dict]:
+    """Expanding-window folds: train on everything scored before the test block, test on the block
+
+    Rows are features at gameweek g with the points of the player's next appearance
+    as target, which can be several gameweeks after g + 1. Training rows are picked
+    by that target gameweek, so no training target comes from the test block or later.
+    """
+    seasons = sorted(meta['season'].unique())
+    target_t = time_index(meta, TARGET_GAMEWEEK_COLUMN)
+    folds = []
+
+    if mode == 'season':
+        for i, test_season in enumerate(seasons[1:], start=1):
+            start, end = i * GW_SLOTS, (i + 1) * GW_SLOTS - 1
+            folds.append({'fold': test_season, 'test_start': start, 'test_end': end})
+
+    elif mode == 'gameweek':
+        season = season or seasons[-1]
+        if season not in seasons:
+            raise ValueError(f"Season {season} is not in the dataset ({seasons[0]} to {seasons[-1]})")
+        base = seasons.index(season) * GW_SLOTS
+        gameweeks = sorted(meta.loc[meta['season'] == season, 'gameweek'].unique())
+        for block in range(0, len(gameweeks), step):
+            block_gws = gameweeks[block:block + step]
+            label = f"{season} GW{block_gws[0]}" + (f"-{block_gws[-1]}" if len(block_gws) > 1 else "")
+            folds.append({'fold': label, 'test_start': base + block_gws[0], 'test_end': base + block_gws[-1]})
+
+    else:
+        raise ValueError(f"Unknown backtest mode '{mode}' (use 'season' or 'gameweek')")
+
+    # Folds without enough history are skipped rather than trained on a handful of rows
+    return [f for f in folds if np.count_nonzero(target_t < f['test_start']) >= min_train_rows]
+
+
+def _load_snapshot(snapshot_path: str) -> FeatureMatrix:
+    """Memory-map a feature snapshot once per worker process"""
+    if snapshot_path not in _worker_matrices:
+        path = Path(snapshot_path)
+        _worker_matrices[snapshot_path] = FeatureStore(store_dir=path.parent).load(path.name)
+    return _worker_matrices[snapshot_path]
+
+
+def run_fold(snapshot_path: str, fold: dict, model_params: dict) -> dict:
+    """Train on the fold's history and score its test block"""
+    start = time.perf_counter()
+    matrix = _load_snapshot(snapshot_path)
+    t = time_index(matrix.meta)
+    train_rows = np.flatnonzero(time_index(matrix.meta, TARGET_GAMEWEEK_COLUMN) < fold['test_start'])
+    test_rows = np.flatnonzero((t >= fold['test_start']) & (t <= fold['test_end']))
+
+    # Only the fold's rows are copied out of the shared snapshot
+    X_train, y_train = matrix.to_float32(train_rows), matrix.target(train_rows)
+    X_test, y_test = matrix.to_float32(test_rows, order='C'), matrix.target(test_rows)
+
+    # Imputation is refitted per fold so the test block never informs its own fill
+    imputer = MedianImputer(matrix.feature_columns).fit(X_train)
+    imputer.transform(X_train)
+    imputer.transform(X_test)
+
+    model = RandomForestRegressor(**model_params).fit(X_train, y_train)
+    metrics = compute_fpl_metrics(y_test, model.predict(X_test))
+
+    return {
+        'fold': fold['fold'],
+        'train_rows': len(train_rows),
+        'test_rows': len(test_rows),
+        **metrics,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class WalkForwardBacktest:
+    """Runs walk-forward folds in a process pool over one memory-mapped feature snapshot"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, model_params: Optional[dict] = None):
+        self.workers = max(1, workers)
+        self.model_params = dict(BASELINE_RF_PARAMS, **(model_params or {}))
+        # The pool supplies the parallelism, so each forest trains single-threaded
+        # unless there are spare cores per worker
+        self.model_params['n_jobs'] = max(1, (os.cpu_count() or 1) // self.workers)
+
+    def prepare_snapshot(self) -> Path:
+        """Make sure a snapshot exists for the current mart and return its directory"""
+        store = FeatureStore(DB_PATH)
+        key = store.current_key(ML_DATASET_QUERY)
+        predictor = FPLPredictor()
+        store.load_or_build(ML_DATASET_QUERY, lambda: predictor.prepare_features(predictor.load_data()))
+        return store.snapshot_path(key)
+
+    def run(self, mode: str = 'season', season: Optional[str] = None, step: int = 1) -> pd.DataFrame:
+        """Run every fold and return one metrics row per fold"""
+        snapshot_path = self.prepare_snapshot()
+        meta = FeatureStore(store_dir=snapshot_path.parent).load(snapshot_path.name).meta
+        folds = walk_forward_folds(meta, mode=mode, season=season, step=step)
+
+        print(f"🔁 Walk-forward backtest: {len(folds)} {mode} folds on {self.workers} worker(s)")
+        start = time.perf_counter()
+        results = []
+        if self.workers == 1:
+            for fold in folds:
+                results.append(run_fold(str(snapshot_path), fold, self.model_params))
+                self._print_fold(results[-1])
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(run_fold, str(snapshot_path), fold, self.model_params)
+                           for fold in folds]
+                # Collected in fold order so the printout reads chronologically
+                for future in futures:
+                    results.append(future.result())
+                    self._print_fold(results[-1])
+
+        results = pd.DataFrame(results)
+        print(f"✅ Backtest finished in {time.perf_counter() - start:.1f}s")
+        self.print_summary(results)
+        return results
+
+    def _print_fold(self, result: dict):
+        """One line per finished fold"""
+        print(f"   {result['fold']:<16} train {result['train_rows']:>6,} test {result['test_rows']:>5,}  "
+              f"MAE {result['test_mae']:.3f}  dir {result['directional_accuracy']:.1%}  "
+              f"haul recall {result['big_haul_recall']:.1%}  ({result['seconds']:.1f}s)")
+
+    def print_summary(self, results: pd.DataFrame):
+        """Row-weighted averages across folds"""
+        if results.empty:
+            print("⚠️ No folds had enough training history")
+            return
+        weights = results['test_rows']
+        print(f"\n📈 Across {len(results)} folds ({weights.sum():,} scored rows):")
+        print(f"   MAE: {np.average(results['test_mae'], weights=weights):.3f} points")
+        print(f"   Directional accuracy: {np.average(results['directional_accuracy'], weights=weights):.1%}")
+        print(f"   Big haul recall: {results['big_hauls_captured'].sum()}/{results['big_hauls'].sum()}")
+
+
+def main():
+    """Run a walk-forward backtest from the command line"""
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the baseline model")
+    parser.add_argument("--mode", choices=['season', 'gameweek'], default='season')
+    parser.add_argument("--season", help="Season to walk through in gameweek mode (default: latest)")
+    parser.add_argument("--step", type=int, default=1, help="Gameweeks per fold in gameweek mode")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--n-estimators", type=int, help="Override the forest size for quicker runs")
+    parser.add_argument("--output", default=str(RESULTS_PATH))
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    model_params = {'n_estimators': args.n_estimators} if args.n_estimators else None
+    backtest = WalkForwardBacktest(workers=args.workers, model_params=model_params)
+    results = backtest.run(mode=args.mode, season=args.season, step=args.step)
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(args.output, index=False)
+    print(f"💾 Fold results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Model backend benchmark
+Trains each backend on the time-based splits and compares train time, predict
+latency, on-disk model size and accuracy
+
+Usage: python -m src.ml.benchmark_models [--backends random_forest hist_gradient_boosting] [--per-position]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.ml.evaluation import PairedBootstrap, compute_fpl_metrics, gameweek_codes, print_bootstrap
+from src.ml.features import FeatureStore, MedianImputer
+from src.ml.models import BACKENDS, create_backend
+from src.ml.train_baseline import DB_PATH, ML_DATASET_QUERY, FPLPredictor, load_model_params
+
+SCORING_BATCH = 700  # roughly one gameweek's active players
+LATENCY_REPEATS = 7
+
+
+def median_seconds(fn, repeats: int = LATENCY_REPEATS) -> float:
+    """Median wall time of repeated calls"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def load_splits():
+    """Imputed train/val/test float32 matrices from the feature snapshot, plus test gameweek codes"""
+    predictor = FPLPredictor()
+    matrix = FeatureStore(DB_PATH).load_or_build(
+        ML_DATASET_QUERY, lambda: predictor.prepare_features(predictor.load_data())
+    )
+    train_mask, val_mask, test_mask = predictor.create_time_based_splits(matrix.meta)
+    splits = {
+        'train': (matrix.to_float32(train_mask), matrix.target(train_mask)),
+        'val': (matrix.to_float32(val_mask, order='C'), matrix.target(val_mask)),
+        'test': (matrix.to_float32(test_mask, order='C'), matrix.target(test_mask)),
+    }
+    imputer = MedianImputer(matrix.feature_columns).fit(splits['train'][0])
+    for X, _ in splits.values():
+        imputer.transform(X)
+    return matrix.feature_columns, splits, gameweek_codes(matrix.meta[test_mask])
+
+
+def benchmark_backend(name: str, feature_columns, splits, per_position: bool = False) -> dict:
+    """Fit, time and size one backend"""
+    X_train, y_train = splits['train']
+    X_val, y_val = splits['val']
+    X_test, y_test = splits['test']
+    params = load_model_params(name)
+
+    start = time.perf_counter()
+    backend = create_backend(name, params, feature_columns, per_position).fit(X_train, y_train, X_val, y_val)
+    train_seconds = time.perf_counter() - start
+
+    # Retrain with whatever the first fit left reusable (the HGB bin edges)
+    retrain = create_backend(name, params, feature_columns, per_position)
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.save(Path(tmp))
+        model_bytes = sum(f.stat().st_size for f in Path(tmp).rglob('*') if f.is_file())
+        retrain.load_reusable(Path(tmp))
+        start = time.perf_counter()
+        retrain.fit(X_train, y_train, X_val, y_val)
+        retrain_seconds = time.perf_counter() - start
+
+    batch = X_test[:SCORING_BATCH]
+    test_predictions = backend.predict(X_test)
+    metrics = compute_fpl_metrics(y_test, test_predictions)
+    return {
+        'backend': name + (" x4" if per_position else ""),
+        'train_s': train_seconds,
+        'retrain_s': retrain_seconds,
+        'predict_batch_ms': median_seconds(lambda: backend.predict(batch)) * 1000,
+        'predict_test_ms': median_seconds(lambda: backend.predict(X_test)) * 1000,
+        'model_mb': model_bytes / 1024 ** 2,
+        'val_mae': float(np.mean(np.abs(backend.predict(X_val) - y_val))),
+        'test_mae': metrics['test_mae'],
+        'directional_accuracy': metrics['directional_accuracy'],
+        'rounds': rounds(backend),
+        'test_predictions': test_predictions,
+    }
+
+
+def rounds(backend) -> str:
+    """Boosting rounds or trees; one figure per position for routed models"""
+    models = backend.models.values() if hasattr(backend, 'models') else [backend]
+    return "/".join(str(getattr(m.model, 'n_iter_', getattr(m.model, 'n_estimators', '?'))) for m in models)
+
+
+def main():
+    """Benchmark each requested backend on the same splits"""
+    parser = argparse.ArgumentParser(description="Compare model backends on the time-based splits")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--per-position", action="store_true",
+                        help="Also benchmark one model per position for each backend")
+    args = parser.parse_args()
+
+    print("📏 Model Backend Benchmark")
+    print("=" * 50)
+    feature_columns, splits, test_gameweeks = load_splits()
+
+    results = []
+    for name in args.backends:
+        for per_position in ([False, True] if args.per_position else [False]):
+            print(f"\n⏱️ {name}{' per position' if per_position else ''}...")
+            results.append(benchmark_backend(name, feature_columns, splits, per_position))
+
+    print(f"\n{'backend':<27} {'train':>8} {'retrain':>8} {f'pred {SCORING_BATCH}':>9} {'pred test':>10} "
+          f"{'size':>8} {'val MAE':>8} {'test MAE':>9} {'dir acc':>8} {'rounds':>11}")
+    for r in results:
+        print(f"{r['backend']:<27} {r['train_s']:>7.2f}s {r['retrain_s']:>7.2f}s {r['predict_batch_ms']:>7.1f}ms "
+              f"{r['predict_test_ms']:>8.1f}ms {r['model_mb']:>6.2f}MB {r['val_mae']:>8.3f} {r['test_mae']:>9.3f} "
+              f"{r['directional_accuracy']:>8.1%} {r['rounds']:>11}")
+
+    # Paired bootstrap on the test season: is the gap to the first backend more than noise?
+    bootstrap = PairedBootstrap()
+    comparison = bootstrap.run(splits['test'][1], {r['backend']: r['test_predictions'] for r in results},
+                               test_gameweeks)
+    print_bootstrap(comparison)
+    print(f"\n   {bootstrap.n_draws} paired draws in {bootstrap.seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
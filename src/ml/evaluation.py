@@ -0,0 +1,262 @@
+"""
+Evaluation Metrics for FPL Points Prediction
+Vectorized point metrics, per-group breakdowns, captain hit rates and paired bootstrap intervals
+"""
+
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+BIG_HAUL_POINTS = 10
+HAUL_PERCENTILE = 95  # predictions in the top 5% count as calling a haul
+CAPTAIN_KS = (1, 3, 5)
+DEFAULT_DRAWS = 2000
+BOOTSTRAP_BATCH = 200  # draws per index matrix; bounds memory at batch x rows
+CONFIDENCE = 0.95
+
+# Lower is better for these; everything else is higher-is-better
+LOWER_IS_BETTER = {'mae', 'rmse'}
+
+
+def batched_metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, np.ndarray]:
+    """Regression and FPL metrics for each row of (draws x players) arrays"""
+    y_true = np.atleast_2d(y_true).astype(np.float64, copy=False)
+    y_pred = np.atleast_2d(y_pred).astype(np.float64, copy=False)
+    errors = y_pred - y_true
+    sse = np.einsum('ij,ij->i', errors, errors)
+    centered = y_true - y_true.mean(axis=1, keepdims=True)
+    sst = np.einsum('ij,ij->i', centered, centered)
+
+    # Directional accuracy: above/below the median, on each side separately
+    actual_positive = y_true > np.median(y_true, axis=1, keepdims=True)
+    pred_positive = y_pred > np.median(y_pred, axis=1, keepdims=True)
+
+    # Big haul recall: how many hauls land in the top 5% of predictions
+    big_hauls = y_true >= BIG_HAUL_POINTS
+    haul_threshold = np.percentile(y_pred, HAUL_PERCENTILE, axis=1, keepdims=True)
+    haul_count = big_hauls.sum(axis=1)
+    captured = (big_hauls & (y_pred >= haul_threshold)).sum(axis=1)
+
+    n = y_true.shape[1]
+    return {
+        'mae': np.abs(errors).mean(axis=1),
+        'rmse': np.sqrt(sse / n),
+        'r2': 1 - sse / np.where(sst > 0, sst, np.nan),
+        'directional_accuracy': (actual_positive == pred_positive).mean(axis=1),
+        'big_hauls': haul_count,
+        'big_hauls_captured': captured,
+        'big_haul_recall': captured / np.maximum(haul_count, 1),
+    }
+
+
+def compute_fpl_metrics(y_true, y_pred) -> dict:
+    """Regression and FPL-specific metrics for one set of predictions"""
+    metrics = {name: values[0].item() for name, values in batched_metrics(y_true, y_pred).items()}
+    return {
+        'test_mae': metrics['mae'],
+        'test_rmse': metrics['rmse'],
+        'test_r2': metrics['r2'],
+        'directional_accuracy': metrics['directional_accuracy'],
+        'big_hauls': int(metrics['big_hauls']),
+        'big_hauls_captured': int(metrics['big_hauls_captured']),
+        'big_haul_recall': metrics['big_haul_recall'],
+    }
+
+
+def group_metrics(y_true: np.ndarray, y_pred: np.ndarray, groups) -> pd.DataFrame:
+    """Per-group metrics from one pass of bincount sums
+
+    Direction and haul calls use the whole set's medians and top-5% threshold, so a
+    group's figures say how the overall ranking treats that group.
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    labels, codes = np.unique(np.asarray(groups), return_inverse=True)
+    size = len(labels)
+
+    def total(weights=None):
+        return np.bincount(codes, weights=weights, minlength=size)
+
+    rows = total()
+    errors = y_pred - y_true
+    sse = total(errors ** 2)
+    # Per-group SST from sums: sum(y^2) - (sum y)^2 / n
+    sst = total(y_true ** 2) - total(y_true) ** 2 / rows
+    correct_side = (y_true > np.median(y_true)) == (y_pred > np.median(y_pred))
+    big_hauls = y_true >= BIG_HAUL_POINTS
+    captured = big_hauls & (y_pred >= np.percentile(y_pred, HAUL_PERCENTILE))
+    haul_count = total(big_hauls)
+
+    return pd.DataFrame({
+        'group': labels,
+        'rows': rows.astype(int),
+        'mae': total(np.abs(errors)) / rows,
+        'rmse': np.sqrt(sse / rows),
+        'r2': 1 - sse / np.where(sst > 0, sst, np.nan),
+        'bias': total(errors) / rows,
+        'directional_accuracy': total(correct_side) / rows,
+        'big_hauls': haul_count.astype(int),
+        'big_haul_recall': total(captured) / np.maximum(haul_count, 1),
+    })
+
+
+def gameweek_codes(meta: pd.DataFrame) -> np.ndarray:
+    """One integer per (season, gameweek), in time order"""
+    return meta.groupby(['season', 'gameweek'], observed=True, sort=True).ngroup().to_numpy()
+
+
+def gameweek_labels(meta: pd.DataFrame) -> List[str]:
+    """'season GWn' for each gameweek_codes() value"""
+    keys = meta.groupby(['season', 'gameweek'], observed=True, sort=True).size().index
+    return [f"{season} GW{gameweek}" for season, gameweek in keys]
+
+
+def captain_metrics(y_true: np.ndarray, y_pred: np.ndarray, gameweeks: np.ndarray,
+                    ks: Sequence[int] = CAPTAIN_KS) -> pd.DataFrame:
+    """Per-gameweek captaincy outcomes of picking by predicted points
+
+    hit@k: the gameweek's top actual scorer is among the k highest predictions.
+    captain_points: what the single highest prediction actually scored.
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    gameweeks = np.asarray(gameweeks)
+
+    # Sort by gameweek, then by prediction descending; each gameweek becomes one run
+    order = np.lexsort((-y_pred, gameweeks))
+    sorted_gws = gameweeks[order]
+    sorted_true = y_true[order]
+    starts = np.flatnonzero(np.r_[True, sorted_gws[1:] != sorted_gws[:-1]])
+    run = np.cumsum(np.r_[False, sorted_gws[1:] != sorted_gws[:-1]])
+    rank = np.arange(len(order)) - starts[run]
+
+    best = np.maximum.reduceat(sorted_true, starts)
+    is_best = sorted_true == best[run]
+    result = pd.DataFrame({
+        'gameweek': sorted_gws[starts],
+        'players': np.diff(np.r_[starts, len(order)]),
+        'captain_points': sorted_true[starts],
+        'best_points': best,
+    })
+    for k in ks:
+        result[f'hit@{k}'] = np.logical_or.reduceat(is_best & (rank < k), starts)
+    return result
+
+
+def summarize_captaincy(per_gameweek: pd.DataFrame) -> dict:
+    """Season-level captaincy figures from captain_metrics()"""
+    summary = {'captain_points': per_gameweek['captain_points'].mean(),
+               'captain_share_of_best': per_gameweek['captain_points'].sum() / per_gameweek['best_points'].sum()}
+    for column in [c for c in per_gameweek.columns if c.startswith('hit@')]:
+        summary[column] = per_gameweek[column].mean()
+    return summary
+
+
+def interval(draws: np.ndarray, confidence: float = CONFIDENCE):
+    """Percentile interval of bootstrap draws"""
+    tail = (1 - confidence) / 2 * 100
+    return np.nanpercentile(draws, [tail, 100 - tail])
+
+
+class PairedBootstrap:
+    """Bootstrap intervals for several model variants scored on the same rows
+
+    Every variant is evaluated on the same resampling-index matrices, so the
+    differences between variants are paired and tighter than separate intervals.
+    Row metrics resample players; captaincy metrics resample whole gameweeks.
+    """
+
+    def __init__(self, n_draws: int = DEFAULT_DRAWS, batch_size: int = BOOTSTRAP_BATCH,
+                 confidence: float = CONFIDENCE, seed: int = 42):
+        self.n_draws = n_draws
+        self.batch_size = batch_size
+        self.confidence = confidence
+        self.seed = seed
+        self.seconds = None
+
+    def draw_row_metrics(self, y_true: np.ndarray, predictions: Dict[str, np.ndarray]) -> Dict[str, dict]:
+        """Metric draws per variant, each (n_draws,)"""
+        rng = np.random.default_rng(self.seed)
+        n = len(y_true)
+        draws = {name: {} for name in predictions}
+        for start in range(0, self.n_draws, self.batch_size):
+            batch = min(self.batch_size, self.n_draws - start)
+            index = rng.integers(0, n, size=(batch, n))
+            resampled_true = y_true[index]
+            for name, y_pred in predictions.items():
+                for metric, values in batched_metrics(resampled_true, y_pred[index]).items():
+                    draws[name].setdefault(metric, []).append(values)
+        return {name: {metric: np.concatenate(parts) for metric, parts in metrics.items()}
+                for name, metrics in draws.items()}
+
+    def draw_captain_metrics(self, per_gameweek: Dict[str, pd.DataFrame]) -> Dict[str, dict]:
+        """Captaincy draws per variant from resampled gameweeks"""
+        rng = np.random.default_rng(self.seed + 1)
+        n_gameweeks = len(next(iter(per_gameweek.values())))
+        index = rng.integers(0, n_gameweeks, size=(self.n_draws, n_gameweeks))
+        draws = {}
+        for name, frame in per_gameweek.items():
+            columns = ['captain_points'] + [c for c in frame.columns if c.startswith('hit@')]
+            draws[name] = {c: frame[c].to_numpy(np.float64)[index].mean(axis=1) for c in columns}
+        return draws
+
+    def run(self, y_true, predictions: Dict[str, np.ndarray],
+            gameweeks: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Point estimates, intervals, and paired differences against the first variant"""
+        start = time.perf_counter()
+        y_true = np.asarray(y_true, dtype=np.float64)
+        predictions = {name: np.asarray(p, dtype=np.float64) for name, p in predictions.items()}
+
+        estimates = {name: {m: v[0] for m, v in batched_metrics(y_true, p).items()}
+                     for name, p in predictions.items()}
+        draws = self.draw_row_metrics(y_true, predictions)
+        if gameweeks is not None:
+            per_gameweek = {name: captain_metrics(y_true, p, gameweeks) for name, p in predictions.items()}
+            for name, frame in per_gameweek.items():
+                estimates[name].update(summarize_captaincy(frame))
+            for name, metrics in self.draw_captain_metrics(per_gameweek).items():
+                draws[name].update(metrics)
+
+        baseline = next(iter(predictions))
+        rows = []
+        for name in predictions:
+            for metric, values in draws[name].items():
+                if metric in ('big_hauls', 'big_hauls_captured'):
+                    continue
+                low, high = interval(values, self.confidence)
+                row = {'model': name, 'metric': metric, 'estimate': float(estimates[name][metric]),
+                       'low': low, 'high': high}
+                if name != baseline:
+                    diff = values - draws[baseline][metric]
+                    better = diff < 0 if metric in LOWER_IS_BETTER else diff > 0
+                    row['diff'] = float(estimates[name][metric] - estimates[baseline][metric])
+                    row['diff_low'], row['diff_high'] = interval(diff, self.confidence)
+                    row['p_better'] = float(np.mean(better))
+                rows.append(row)
+        self.seconds = time.perf_counter() - start
+        return pd.DataFrame(rows)
+
+
+def print_group_metrics(frame: pd.DataFrame, title: str):
+    """One line per group"""
+    print(f"\n{title}")
+    print(f"   {'group':<10} {'rows':>6} {'MAE':>6} {'RMSE':>6} {'bias':>6} {'dir acc':>8} {'haul recall':>12}")
+    for _, row in frame.iterrows():
+        print(f"   {str(row['group']):<10} {row['rows']:>6,} {row['mae']:>6.3f} {row['rmse']:>6.3f} "
+              f"{row['bias']:>+6.2f} {row['directional_accuracy']:>8.1%} {row['big_haul_recall']:>12.1%}")
+
+
+def print_bootstrap(results: pd.DataFrame, confidence: float = CONFIDENCE):
+    """Estimates with intervals, and paired differences where there is more than one model"""
+    pct = f"{confidence:.0%}"
+    for model, frame in results.groupby('model', sort=False):
+        print(f"\n📐 {model} ({pct} bootstrap intervals):")
+        for _, row in frame.iterrows():
+            line = f"   {row['metric']:<22} {row['estimate']:>7.3f}  [{row['low']:.3f}, {row['high']:.3f}]"
+            if 'diff' in row and not pd.isna(row.get('diff')):
+                line += (f"   diff {row['diff']:+.3f} [{row['diff_low']:+.3f}, {row['diff_high']:+.3f}]"
+                         f"  better in {row['p_better']:.0%} of draws")
+            print(line)
@@ -0,0 +1,347 @@
+"""
+Feature Store for FPL Points Prediction
+Builds compact float32/uint8 feature matrices from DuckDB and caches them as memory-mapped snapshots
+"""
+
+import duckdb
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import hashlib
+import json
+import os
+import resource
+import shutil
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# Configuration
+DB_PATH = "data/fpl_complete.db"
+FEATURE_STORE_DIR = Path("data/feature_store")
+MART_TABLE = "mart_ml_features"
+KEEP_SNAPSHOTS = 5
+SNAPSHOT_VERSION = 4  # bump when the snapshot layout or preparation changes
+TARGET_COLUMN = "next_gw_points"
+# The player's next appearance, where the target is scored; not always gameweek + 1
+TARGET_GAMEWEEK_COLUMN = "next_appearance_gameweek"
+META_COLUMNS = ['player_name', 'season', 'gameweek', TARGET_GAMEWEEK_COLUMN]
+# 0/1 flags and small integer codes are kept as uint8 and must be non-NULL; everything else is float32.
+# next_is_home is NULL when the next fixture is unknown, so it stays float32 and gets imputed.
+FLAG_COLUMNS = [
+    'is_home', 'improving_form', 'consistent_performer',
+    'above_position_threshold', 'was_benched', 'played_full_game'
+]
+CATEGORICAL_COLUMNS = ['position_encoded']
+
+
+def fetch_arrow(conn: duckdb.DuckDBPyConnection, query: str, params: Optional[list] = None) -> pa.Table:
+    """Run a query straight into an Arrow table, skipping pandas"""
+    result = conn.execute(query, params).arrow()
+    # duckdb >= 1.4 returns a RecordBatchReader here, 1.3 a Table
+    return result.read_all() if isinstance(result, pa.RecordBatchReader) else result
+
+
+def nbytes(obj) -> int:
+    """Bytes held by an array, frame, Arrow table or FeatureMatrix"""
+    if obj is None:
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=False, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=False, deep=True))
+    return int(obj.nbytes)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes"""
+    # ru_maxrss is kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryReport:
+    """Per-stage record of the bytes a stage holds and the process RSS"""
+
+    def __init__(self):
+        self.stages = []
+
+    def record(self, stage: str, *objects):
+        """Record one stage; objects are the arrays/frames the stage produced"""
+        held = sum(nbytes(obj) for obj in objects)
+        self.stages.append((stage, held, current_rss(), peak_rss()))
+
+    def print_report(self):
+        """Print the stage table"""
+        mb = 1024 * 1024
+        print("\n🧠 Memory by stage:")
+        print(f"   {'stage':<28} {'held':>10} {'rss':>10} {'peak rss':>10}")
+        for stage, held, rss, peak in self.stages:
+            print(f"   {stage:<28} {held / mb:>8.1f}MB {rss / mb:>8.1f}MB {peak / mb:>8.1f}MB")
+
+
+class FeatureMatrix:
+    """Training matrix split into a float32 numeric block and a uint8 flag block"""
+
+    def __init__(self, numeric: np.ndarray, flags: np.ndarray, y: np.ndarray,
+                 meta: pd.DataFrame, numeric_columns: List[str], flag_columns: List[str],
+                 snapshot_key: Optional[str] = None):
+        self.numeric = numeric
+        self.flags = flags
+        self.y = y
+        self.meta = meta
+        self.numeric_columns = list(numeric_columns)
+        self.flag_columns = list(flag_columns)
+        self.snapshot_key = snapshot_key  # set when the matrix came from the feature store
+
+    @property
+    def feature_columns(self) -> List[str]:
+        """Column order of the matrices returned by to_float32()"""
+        return self.numeric_columns + self.flag_columns
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the blocks, target and metadata"""
+        return self.numeric.nbytes + self.flags.nbytes + self.y.nbytes + nbytes(self.meta)
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def to_float32(self, rows=None, order: str = 'F') -> np.ndarray:
+        """Assemble one float32 estimator matrix, optionally for a row mask/index only
+
+        sklearn trees validate X to float32, so handing them float32 avoids a copy.
+        Fortran order keeps each feature contiguous for split search at fit time;
+        use order='C' for row-at-a-time scoring.
+        """
+        numeric = self.numeric if rows is None else self.numeric[rows]
+        flags = self.flags if rows is None else self.flags[rows]
+        X = np.empty((len(numeric), len(self.feature_columns)), dtype=np.float32, order=order)
+        X[:, :numeric.shape[1]] = numeric
+        X[:, numeric.shape[1]:] = flags
+        return X
+
+    def target(self, rows=None) -> np.ndarray:
+        """Target vector, optionally for a row mask/index only"""
+        return self.y if rows is None else self.y[rows]
+
+
+class MedianImputer:
+    """Per-feature medians fitted on the training split and applied in bulk"""
+
+    def __init__(self, feature_columns: List[str], medians: Optional[np.ndarray] = None,
+                 fitted_rows: int = 0):
+        self.feature_columns = list(feature_columns)
+        self.medians = medians
+        self.fitted_rows = fitted_rows
+
+    def fit(self, X: np.ndarray) -> 'MedianImputer':
+        """Compute every column's median in one pass, ignoring NaN"""
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN columns
+            medians = np.nanmedian(X, axis=0)
+        # A column with no training values falls back to 0 rather than staying NaN
+        self.medians = np.nan_to_num(medians, nan=0.0).astype(np.float32)
+        self.fitted_rows = len(X)
+        return self
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Fill NaNs in place with the fitted medians and return X"""
+        if self.medians is None:
+            raise ValueError("MedianImputer must be fitted or loaded before transform")
+        if X.shape[1] != len(self.medians):
+            raise ValueError(f"Expected {len(self.medians)} features, got {X.shape[1]}")
+        np.copyto(X, self.medians, where=np.isnan(X))
+        return X
+
+    def missing_counts(self, X: np.ndarray) -> dict:
+        """NaN count per feature, for the columns that have any"""
+        counts = np.isnan(X).sum(axis=0)
+        return {col: int(n) for col, n in zip(self.feature_columns, counts) if n}
+
+    def save(self, path: Path):
+        """Persist the statistics as JSON next to the model artifacts"""
+        Path(path).write_text(json.dumps({
+            'feature_columns': self.feature_columns,
+            'medians': [float(m) for m in self.medians],
+            'fitted_rows': self.fitted_rows,
+        }, indent=2))
+
+    @classmethod
+    def load(cls, path: Path) -> 'MedianImputer':
+        """Load statistics written by save()"""
+        stats = json.loads(Path(path).read_text())
+        return cls(stats['feature_columns'],
+                   np.array(stats['medians'], dtype=np.float32),
+                   stats['fitted_rows'])
+
+
+def build_feature_matrix(conn: duckdb.DuckDBPyConnection, query: str,
+                         params: Optional[list] = None) -> FeatureMatrix:
+    """Run the dataset query (with bound `params`) and cast features to float32/uint8 inside DuckDB"""
+    columns = [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM ({query}\n)", params).fetchall()]
+    features = [c for c in columns if c not in META_COLUMNS and c != TARGET_COLUMN]
+
+    # Fixed layout (numeric block, then flags) so training and scoring line up
+    flag_columns = [c for c in features if c in FLAG_COLUMNS + CATEGORICAL_COLUMNS]
+    numeric_columns = [c for c in features if c not in flag_columns]
+
+    cast_query = "SELECT " + ",\n".join(
+        [f"{c}" for c in META_COLUMNS]
+        + [f"CAST({TARGET_COLUMN} AS FLOAT) AS {TARGET_COLUMN}"]
+        + [f"CAST({c} AS FLOAT) AS {c}" for c in numeric_columns]
+        + [f"CAST({c} AS UTINYINT) AS {c}" for c in flag_columns]
+    ) + f"\nFROM ({query}\n)"
+    table = fetch_arrow(conn, cast_query, params)
+
+    # Fill the blocks column by column; Fortran order makes each write contiguous
+    numeric = np.empty((table.num_rows, len(numeric_columns)), dtype=np.float32, order='F')
+    for i, column in enumerate(numeric_columns):
+        numeric[:, i] = table.column(column).to_numpy()
+    flags = np.empty((table.num_rows, len(flag_columns)), dtype=np.uint8, order='F')
+    for i, column in enumerate(flag_columns):
+        if table.column(column).null_count:
+            raise ValueError(f"Flag column {column} has NULLs and cannot be stored as uint8")
+        flags[:, i] = table.column(column).to_numpy()
+    y = table.column(TARGET_COLUMN).to_numpy()
+
+    # Repeated names/seasons become dictionary codes (pandas categoricals)
+    meta = pa.table({
+        column: pc.dictionary_encode(table.column(column))
+        if pa.types.is_string(table.column(column).type) else table.column(column)
+        for column in META_COLUMNS
+    }).to_pandas()
+
+    return FeatureMatrix(numeric, flags, y, meta, numeric_columns, flag_columns)
+
+
+class FeatureStore:
+    """Versioned on-disk snapshots of prepared feature matrices"""
+
+    def __init__(self, db_path: str = DB_PATH, store_dir: Path = FEATURE_STORE_DIR):
+        self.db_path = db_path
+        self.store_dir = Path(store_dir)
+
+    def mart_fingerprint(self, conn: duckdb.DuckDBPyConnection) -> str:
+        """Hash the mart's contents so any dbt rebuild that changes a row changes the key"""
+        # Row hashes are summed, not concatenated, so the scan is one cheap aggregate
+        row_count, row_hash_sum = conn.execute(
+            f"SELECT COUNT(*), SUM(HASH(m)) FROM {MART_TABLE} m"
+        ).fetchone()
+        return f"{row_count}:{row_hash_sum}"
+
+    def query_columns(self, conn: duckdb.DuckDBPyConnection, query: str) -> List[str]:
+        """Column list a query would return, without running it"""
+        conn.execute(f"SELECT * FROM ({query}\n) LIMIT 0")
+        return [column[0] for column in conn.description]
+
+    def snapshot_key(self, conn: duckdb.DuckDBPyConnection, query: str) -> str:
+        """Snapshot key from the mart fingerprint, the feature list and the query text"""
+        payload = json.dumps({
+            'version': SNAPSHOT_VERSION,
+            'mart': self.mart_fingerprint(conn),
+            'columns': self.query_columns(conn, query),
+            'query': " ".join(query.split()),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def snapshot_path(self, key: str) -> Path:
+        """Directory holding one snapshot"""
+        return self.store_dir / key
+
+    def current_key(self, query: str) -> str:
+        """Key the snapshot for `query` would have against the mart as it is now"""
+        conn = duckdb.connect(self.db_path, read_only=True)
+        try:
+            return self.snapshot_key(conn, query)
+        finally:
+            conn.close()
+
+    def load(self, key: str) -> Optional[FeatureMatrix]:
+        """Memory-map a snapshot; returns None if it does not exist"""
+        path = self.snapshot_path(key)
+        manifest_path = path / "manifest.json"
+        if not manifest_path.exists():
+            return None
+
+        manifest = json.loads(manifest_path.read_text())
+
+        # mmap_mode='r' maps the arrays into memory; pages are read on first touch
+        return FeatureMatrix(
+            numeric=np.load(path / "numeric.npy", mmap_mode='r'),
+            flags=np.load(path / "flags.npy", mmap_mode='r'),
+            y=np.load(path / "y.npy", mmap_mode='r'),
+            meta=feather.read_table(path / "meta.feather", memory_map=True).to_pandas(),
+            numeric_columns=manifest['numeric_columns'],
+            flag_columns=manifest['flag_columns'],
+            snapshot_key=key
+        )
+
+    def save(self, key: str, matrix: FeatureMatrix) -> Path:
+        """Write a snapshot atomically and prune old ones"""
+        path = self.snapshot_path(key)
+        tmp_path = self.store_dir / f".{key}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / "numeric.npy", matrix.numeric)
+        np.save(tmp_path / "flags.npy", matrix.flags)
+        np.save(tmp_path / "y.npy", matrix.y)
+        feather.write_feather(
+            pa.Table.from_pandas(matrix.meta.reset_index(drop=True), preserve_index=False),
+            tmp_path / "meta.feather",
+            compression='uncompressed'  # compressed feather cannot be memory-mapped
+        )
+        (tmp_path / "manifest.json").write_text(json.dumps({
+            'key': key,
+            'numeric_columns': matrix.numeric_columns,
+            'flag_columns': matrix.flag_columns,
+            'rows': len(matrix),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }, indent=2))
+
+        # A rename is atomic, so readers never see a half-written snapshot
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        self.prune()
+        return path
+
+    def prune(self, keep: int = KEEP_SNAPSHOTS):
+        """Delete all but the most recently used snapshots"""
+        snapshots = sorted(
+            (p for p in self.store_dir.iterdir() if p.is_dir() and not p.name.startswith('.')),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        for stale in snapshots[keep:]:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    def load_or_build(self, query: str, build: Callable[[], FeatureMatrix],
+                      refresh: bool = False) -> FeatureMatrix:
+        """Return the snapshot for the current mart, building and saving it on a miss"""
+        start = time.perf_counter()
+        key = self.current_key(query)
+
+        if not refresh:
+            cached = self.load(key)
+            if cached is not None:
+                os.utime(self.snapshot_path(key))  # keeps it ahead of prune()
+                print(f"⚡ Feature snapshot {key} loaded in {(time.perf_counter() - start) * 1000:.0f}ms")
+                return cached
+
+        print(f"🔨 Building feature snapshot {key}...")
+        self.save(key, build())
+        print(f"💾 Feature snapshot saved to {self.snapshot_path(key)}")
+        # Hand back the mapped copy so cached and fresh runs see the same arrays
+        return self.load(key)
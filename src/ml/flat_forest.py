@@ -0,0 +1,208 @@
+"""
+Flat-Array Forest Inference for FPL Points Prediction
+Exports a fitted RandomForestRegressor as contiguous node arrays and scores it without sklearn
+
+Usage: python -m src.ml.flat_forest [--model-dir models]
+"""
+
+import argparse
+import struct
+import time
+import zipfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+# Configuration
+FOREST_FILE = "baseline_rf_forest.npz"
+FORMAT_VERSION = 1
+# Rows scored per traversal pass; bounds the (rows x trees) node-index work arrays
+PREDICT_CHUNK = 1024
+
+
+def load_npz_mmap(path: Path) -> dict:
+    """Memory-map every array of an uncompressed .npz
+
+    np.load cannot map zip members, but savez stores them uncompressed, so each
+    member is a plain .npy at a fixed offset. Processes that map the same file
+    share its pages in the OS cache.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} member {info.filename} is compressed and cannot be memory-mapped")
+            # Local header: 30 fixed bytes, then the name and extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')]
+            if shape == () or 0 in shape:
+                # Scalars and empty arrays are read outright; np.memmap cannot map zero bytes
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+class FlatForest:
+    """A regression forest as flat node arrays plus each tree's root offset
+
+    Node i of the forest tests X[:, feature[i]] <= threshold[i] and moves to
+    children[i, 0] (left) or children[i, 1] (right). Leaves point at themselves, so
+    a fixed number of steps (the deepest tree's depth) lands every row on a leaf
+    without checking which ones are done.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 value: np.ndarray, missing_left: np.ndarray, roots: np.ndarray,
+                 max_depth: int, n_features: int):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'FlatForest':
+        """Flatten a fitted single-output RandomForestRegressor"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests can be flattened")
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+
+        feature, threshold, children, value, missing_left = [], [], [], [], []
+        for tree, root in zip(trees, roots):
+            nodes = np.arange(tree.node_count, dtype=np.intp) + root
+            is_leaf = tree.children_left == -1
+            # Leaves loop back to themselves and test feature 0 against an ignored threshold
+            feature.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            threshold.append(tree.threshold.astype(np.float64))
+            children.append(np.column_stack([
+                np.where(is_leaf, nodes, tree.children_left + root),
+                np.where(is_leaf, nodes, tree.children_right + root),
+            ]).astype(np.intp))
+            value.append(tree.value[:, 0, 0].astype(np.float64))
+            missing_left.append(np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)),
+                                           dtype=bool))
+
+        return cls(np.concatenate(feature), np.concatenate(threshold), np.concatenate(children),
+                   np.concatenate(value), np.concatenate(missing_left), roots,
+                   max(tree.max_depth for tree in trees), model.n_features_in_)
+
+    def predict(self, X) -> np.ndarray:
+        """Mean leaf value across trees, computed the way sklearn does so results match exactly
+
+        The match is with sklearn's n_jobs=1 predict; with more threads sklearn sums
+        the trees in completion order, and its own results can differ in the last bit.
+        """
+        # sklearn compares float32 inputs with float64 thresholds; widening once up front is exact
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        has_missing = bool(np.isnan(X).any())
+
+        predictions = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), PREDICT_CHUNK):
+            chunk = X[start:start + PREDICT_CHUNK]
+            predictions[start:start + len(chunk)] = self._predict_chunk(chunk, has_missing)
+        return predictions
+
+    def _predict_chunk(self, X: np.ndarray, has_missing: bool) -> np.ndarray:
+        # One row of node indices per tree: every tree moves a level per step, for all rows at once
+        flat_X = X.ravel()
+        row_offsets = np.arange(len(X), dtype=np.intp) * X.shape[1]
+        flat_children = self.children.reshape(-1)
+        nodes = np.repeat(self.roots[:, np.newaxis], len(X), axis=1)
+        for _ in range(self.max_depth):
+            x = np.take(flat_X, row_offsets + np.take(self.feature, nodes))
+            go_right = ~(x <= np.take(self.threshold, nodes))
+            if has_missing:
+                go_right &= ~(np.isnan(x) & np.take(self.missing_left, nodes))
+            nodes = np.take(flat_children, 2 * nodes + go_right)
+
+        # sklearn adds the trees' outputs one after another and divides once;
+        # a pairwise np.sum would round differently
+        total = np.zeros(len(X), dtype=np.float64)
+        for tree_values in np.take(self.value, nodes):
+            total += tree_values
+        total /= self.n_trees
+        return total
+
+    def save(self, path: Path):
+        """Write an uncompressed .npz so load() can memory-map it"""
+        np.savez(
+            path, feature=self.feature, threshold=self.threshold, children=self.children,
+            value=self.value, missing_left=self.missing_left, roots=self.roots,
+            max_depth=np.int64(self.max_depth), n_features=np.int64(self.n_features),
+            format_version=np.int64(FORMAT_VERSION)
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> 'FlatForest':
+        """Memory-map a forest written by save()"""
+        arrays = load_npz_mmap(Path(path))
+        if int(arrays['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"{path} has forest format {int(arrays['format_version'])}, expected {FORMAT_VERSION}")
+        return cls(arrays['feature'], arrays['threshold'], arrays['children'], arrays['value'],
+                   arrays['missing_left'], arrays['roots'], arrays['max_depth'], arrays['n_features'])
+
+
+def main():
+    """Export the saved forest and check it against sklearn"""
+    from src.ml.models import RandomForestBackend
+
+    parser = argparse.ArgumentParser(description="Export the trained forest as flat arrays")
+    parser.add_argument("--model-dir", default="models")
+    args = parser.parse_args()
+    model_dir = Path(args.model_dir)
+
+    print("🌲 Flat Forest Export")
+    print("=" * 50)
+    start = time.perf_counter()
+    model = joblib.load(model_dir / RandomForestBackend.model_file)
+    unpickle_seconds = time.perf_counter() - start
+
+    forest = FlatForest.from_sklearn(model)
+    path = model_dir / FOREST_FILE
+    forest.save(path)
+    start = time.perf_counter()
+    forest = FlatForest.load(path)
+    load_seconds = time.perf_counter() - start
+
+    # Spot-check on random inputs spread over each feature's split thresholds
+    rng = np.random.default_rng(42)
+    X = rng.choice(np.unique(forest.threshold), size=(2000, forest.n_features)).astype(np.float32)
+    X += rng.normal(scale=1e-3, size=X.shape).astype(np.float32)
+    mismatches = int(np.count_nonzero(forest.predict(X) != model.predict(X)))
+
+    print(f"✅ {forest.n_trees} trees, {forest.n_nodes:,} nodes, depth {forest.max_depth}")
+    print(f"   Pickle: {(model_dir / RandomForestBackend.model_file).stat().st_size / 1024 ** 2:.2f}MB, "
+          f"unpickled in {unpickle_seconds * 1000:.0f}ms")
+    print(f"   Flat:   {path.stat().st_size / 1024 ** 2:.2f}MB, mapped in {load_seconds * 1000:.1f}ms")
+    print(f"   Mismatched predictions vs sklearn: {mismatches}/{len(X)}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
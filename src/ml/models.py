@@ -0,0 +1,458 @@
+"""
+Model Backends for FPL Points Prediction
+Pluggable estimators behind one fit/predict/save interface: RandomForest and histogram gradient boosting
+"""
+
+import joblib
+import json
+import os
+import numpy as np
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.inspection import permutation_importance
+from threadpoolctl import threadpool_limits
+from src.ml.flat_forest import FOREST_FILE, FlatForest
+
+# Configuration
+DEFAULT_BACKEND = "random_forest"
+# Value bins plus one missing-value bin must stay within HGB's own 255-bin limit
+MAX_BINS = 254
+BIN_SUBSAMPLE = 200_000
+# position_encoded values from mart_ml_features
+POSITION_CODES = {1: 'GK', 2: 'DEF', 3: 'MID', 4: 'FWD'}
+POSITION_FEATURE = 'position_encoded'
+# Per-position routers fit one extra model on every row only when some position has too few
+# rows for a model of its own (the mart encodes an unmapped position as 0)
+POOLED_CODE = 0
+ROUTED_MODELS = {POOLED_CODE: 'ALL', **POSITION_CODES}
+MIN_POSITION_ROWS = 500  # training rows a position needs before it gets its own model
+
+# RandomForest with reasonable hyperparameters
+BASELINE_RF_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 10,
+    'min_samples_split': 20,
+    'min_samples_leaf': 10,
+    'random_state': 42,
+    'n_jobs': -1
+}
+
+# Early stopping watches the validation season, so max_iter is only a ceiling
+BASELINE_HGB_PARAMS = {
+    'learning_rate': 0.05,
+    'max_iter': 500,
+    'max_leaf_nodes': 31,
+    'min_samples_leaf': 20,
+    'l2_regularization': 0.0,
+    'early_stopping': True,
+    'n_iter_no_change': 20,
+    'random_state': 42
+}
+
+
+class FeatureBinner:
+    """Per-feature bin edges fitted once and reused by every retrain and by scoring"""
+
+    def __init__(self, max_bins: int = MAX_BINS, subsample: int = BIN_SUBSAMPLE,
+                 random_state: int = 42):
+        self.max_bins = max_bins
+        self.subsample = subsample
+        self.random_state = random_state
+        self.thresholds = None
+        self.feature_columns = None
+
+    @property
+    def missing_bin(self) -> int:
+        """Code for NaN; one past the last value bin"""
+        return self.max_bins
+
+    def fit(self, X: np.ndarray, feature_columns: List[str]) -> 'FeatureBinner':
+        """Quantile edges per column, or midpoints between values when a column has few"""
+        if len(X) > self.subsample:
+            rows = np.random.default_rng(self.random_state).choice(len(X), self.subsample, replace=False)
+            X = X[np.sort(rows)]
+
+        self.thresholds = []
+        for i in range(X.shape[1]):
+            values = X[:, i]
+            distinct = np.unique(values[~np.isnan(values)])
+            if len(distinct) <= self.max_bins:
+                # Midpoints keep each distinct value in its own bin
+                edges = (distinct[:-1] + distinct[1:]) / 2
+            else:
+                percentiles = np.linspace(0, 100, self.max_bins + 1)[1:-1]
+                edges = np.unique(np.percentile(values[~np.isnan(values)], percentiles, method='midpoint'))
+            self.thresholds.append(edges.astype(np.float32))
+        self.feature_columns = list(feature_columns)
+        return self
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Map float features to uint8 bin codes, NaN to the missing bin"""
+        codes = np.empty(X.shape, dtype=np.uint8, order='F')
+        for i, edges in enumerate(self.thresholds):
+            column = X[:, i]
+            codes[:, i] = np.searchsorted(edges, column, side='left')
+            codes[np.isnan(column), i] = self.missing_bin
+        return codes
+
+    def save(self, path: Path):
+        """Store the edges as one flat array plus per-feature offsets"""
+        offsets = np.cumsum([0] + [len(edges) for edges in self.thresholds])
+        np.savez(path, edges=np.concatenate(self.thresholds), offsets=offsets,
+                 feature_columns=np.array(self.feature_columns), max_bins=self.max_bins)
+
+    @classmethod
+    def load(cls, path: Path) -> 'FeatureBinner':
+        """Load edges written by save()"""
+        data = np.load(path)
+        binner = cls(max_bins=int(data['max_bins']))
+        offsets = data['offsets']
+        binner.thresholds = [data['edges'][start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        binner.feature_columns = [str(col) for col in data['feature_columns']]
+        return binner
+
+
+class ModelBackend(ABC):
+    """Interface FPLPredictor trains and scores through
+
+    fit, feature_importances and grow are abstract, so a backend missing one
+    fails when it is constructed rather than partway through a training run.
+    """
+
+    name = None
+    model_file = None
+
+    def __init__(self, params: Optional[dict] = None, feature_columns: Optional[List[str]] = None):
+        self.params = dict(params or {})
+        self.feature_columns = list(feature_columns) if feature_columns else None
+        self.model = None
+
+    @abstractmethod
+    def fit(self, X_train, y_train, X_val=None, y_val=None) -> 'ModelBackend':
+        """Train on X_train, y_train; X_val, y_val is the validation season where a backend uses one"""
+
+    def predict(self, X) -> np.ndarray:
+        return self.model.predict(X)
+
+    @abstractmethod
+    def feature_importances(self, X_val=None, y_val=None) -> np.ndarray:
+        """One importance per feature column"""
+
+    @abstractmethod
+    def grow(self, X, y, amount: int) -> 'ModelBackend':
+        """Add `amount` trees or boosting rounds fitted on X, y, keeping the existing ones"""
+
+    def load_reusable(self, model_dir: Path) -> bool:
+        """Pick up state from an earlier run that a retrain can reuse; False if none"""
+        return False
+
+    def save(self, model_dir: Path) -> Path:
+        """Write the estimator; returns the model file"""
+        path = Path(model_dir) / self.model_file
+        joblib.dump(self.model, path)
+        return path
+
+    def load(self, model_dir: Path, mmap_mode: Optional[str] = None) -> 'ModelBackend':
+        """Read the estimator written by save(), optionally memory-mapping its arrays"""
+        self.model = joblib.load(Path(model_dir) / self.model_file, mmap_mode=mmap_mode)
+        return self
+
+    def load_compiled(self, model_dir: Path) -> 'ModelBackend':
+        """Load the fastest form to score with: by default the estimator with its arrays mapped read-only"""
+        return self.load(model_dir, mmap_mode='r')
+
+
+class RandomForestBackend(ModelBackend):
+    """sklearn RandomForestRegressor on float32 features"""
+
+    name = "random_forest"
+    model_file = "baseline_rf_model.pkl"
+
+    def fit(self, X_train, y_train, X_val=None, y_val=None):
+        self.model = RandomForestRegressor(**self.params).fit(X_train, y_train)
+        return self
+
+    def feature_importances(self, X_val=None, y_val=None):
+        return self.model.feature_importances_
+
+    def grow(self, X, y, amount: int):
+        """Fit `amount` extra trees on X, y; the existing trees are kept as they are"""
+        self.model.set_params(warm_start=True, n_estimators=len(self.model.estimators_) + amount)
+        self.model.fit(X, y)
+        self.model.set_params(warm_start=False)
+        return self
+
+    def save(self, model_dir: Path) -> Path:
+        """Write the pickle plus the flat-array export scoring maps"""
+        path = super().save(model_dir)
+        FlatForest.from_sklearn(self.model).save(Path(model_dir) / FOREST_FILE)
+        return path
+
+    def load_compiled(self, model_dir: Path) -> 'ModelBackend':
+        """Memory-map the flat forest, exporting it first for models saved before it existed"""
+        path = Path(model_dir) / FOREST_FILE
+        if not path.exists():
+            FlatForest.from_sklearn(self.load(model_dir).model).save(path)
+        self.model = FlatForest.load(path)
+        return self
+
+
+class HistGradientBoostingBackend(ModelBackend):
+    """HistGradientBoostingRegressor on pre-binned uint8 features with validation-season early stopping"""
+
+    name = "hist_gradient_boosting"
+    model_file = "baseline_hgb_model.pkl"
+    bins_file = "hgb_bins.npz"
+
+    def __init__(self, params: Optional[dict] = None, feature_columns: Optional[List[str]] = None):
+        super().__init__(params, feature_columns)
+        self.binner = None
+
+    def load_reusable(self, model_dir: Path) -> bool:
+        """Reuse saved bin edges when they were fitted for the same features
+
+        Delete hgb_bins.npz to re-bin, e.g. after feature distributions shift.
+        """
+        path = Path(model_dir) / self.bins_file
+        if path.exists():
+            binner = FeatureBinner.load(path)
+            if binner.feature_columns == self.feature_columns:
+                self.binner = binner
+                return True
+        return False
+
+    def fit(self, X_train, y_train, X_val=None, y_val=None):
+        if self.binner is None:
+            columns = self.feature_columns or [str(i) for i in range(X_train.shape[1])]
+            self.binner = FeatureBinner().fit(X_train, columns)
+
+        # The codes have at most max_bins distinct values per column, so the estimator's
+        # own binning maps them one to one instead of recomputing quantiles
+        params = dict(self.params)
+        fit_kwargs = {}
+        if X_val is not None and params.get('early_stopping', True):
+            # The validation season, not a random slice of training rows, decides when to stop
+            fit_kwargs = {'X_val': self.binner.transform(X_val), 'y_val': y_val}
+        elif X_val is None and params.get('early_stopping') is True:
+            params['early_stopping'] = False
+        self.model = HistGradientBoostingRegressor(**params).fit(
+            self.binner.transform(X_train), y_train, **fit_kwargs
+        )
+        return self
+
+    def predict(self, X):
+        return self.model.predict(self.binner.transform(X))
+
+    def grow(self, X, y, amount: int):
+        """Continue boosting for `amount` rounds on X, y with the saved bins and earlier rounds"""
+        # Early stopping would hold out part of an already small window; the round count is fixed instead
+        self.model.set_params(warm_start=True, early_stopping=False, max_iter=self.model.n_iter_ + amount)
+        self.model.fit(self.binner.transform(X), y)
+        self.model.set_params(warm_start=False)
+        return self
+
+    def feature_importances(self, X_val=None, y_val=None):
+        """Permutation importance on the validation season (boosting has no impurity importances)"""
+        if X_val is None:
+            return np.full(self.model.n_features_in_, np.nan)
+        result = permutation_importance(
+            self.model, self.binner.transform(X_val), y_val,
+            scoring='neg_mean_absolute_error', n_repeats=3, random_state=42
+        )
+        return np.clip(result.importances_mean, 0, None)
+
+    def save(self, model_dir: Path) -> Path:
+        self.binner.save(Path(model_dir) / self.bins_file)
+        return super().save(model_dir)
+
+    def load(self, model_dir: Path, mmap_mode: Optional[str] = None) -> 'ModelBackend':
+        self.binner = FeatureBinner.load(Path(model_dir) / self.bins_file)
+        return super().load(model_dir, mmap_mode)
+
+
+BACKENDS = {
+    RandomForestBackend.name: RandomForestBackend,
+    HistGradientBoostingBackend.name: HistGradientBoostingBackend,
+}
+
+BASELINE_PARAMS = {
+    RandomForestBackend.name: BASELINE_RF_PARAMS,
+    HistGradientBoostingBackend.name: BASELINE_HGB_PARAMS,
+}
+
+
+def available_cores() -> int:
+    """CPUs this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class PositionRouter(ModelBackend):
+    """One model per position, trained concurrently and routed by position_encoded
+
+    A pooled model over every row is fitted only when some position has fewer
+    than min_position_rows training rows (or rows with an unknown position turn
+    up), so the usual four-position run trains four models, not five.
+    """
+
+    name = "per_position"
+    model_file = "per_position"
+
+    def __init__(self, base_backend: str = DEFAULT_BACKEND, params: Optional[dict] = None,
+                 feature_columns: Optional[List[str]] = None, min_position_rows: int = MIN_POSITION_ROWS):
+        super().__init__(params, feature_columns)
+        if not self.feature_columns or POSITION_FEATURE not in self.feature_columns:
+            raise ValueError(f"Per-position models need {POSITION_FEATURE} among the features")
+        self.base_backend = base_backend
+        self.min_position_rows = min_position_rows
+        self.position_index = self.feature_columns.index(POSITION_FEATURE)
+        self.models: Dict[int, ModelBackend] = {}
+        self.train_rows: Dict[int, int] = {}
+
+    def route(self, X) -> Dict[int, np.ndarray]:
+        """Row indices per position code, one vectorized pass; unknown positions go under POOLED_CODE"""
+        codes = np.asarray(X[:, self.position_index]).astype(np.int64)
+        codes[~np.isin(codes, list(POSITION_CODES))] = POOLED_CODE
+        order = np.argsort(codes, kind='stable')
+        boundaries = np.searchsorted(codes[order], list(ROUTED_MODELS), side='left')
+        ends = np.append(boundaries[1:], len(order))
+        return {code: order[start:end] for code, start, end in zip(ROUTED_MODELS, boundaries, ends) if end > start}
+
+    def models_to_fit(self, X) -> List[int]:
+        """Positions with enough rows for their own model, plus the pooled model if any fall short"""
+        counts = {code: len(rows) for code, rows in self.route(X).items()}
+        codes = [code for code in POSITION_CODES if counts.get(code, 0) >= self.min_position_rows]
+        if len(X) and (len(codes) < len(POSITION_CODES) or POOLED_CODE in counts):
+            codes.insert(0, POOLED_CODE)
+        return codes
+
+    def training_groups(self, X, codes) -> Dict[int, np.ndarray]:
+        """Rows each model in `codes` learns from: its position's rows, or every row for the pooled model"""
+        routed = self.route(X)
+        groups = {code: routed[code] for code in codes if code != POOLED_CODE and code in routed}
+        if POOLED_CODE in codes and len(X):
+            groups[POOLED_CODE] = np.arange(len(X))
+        return groups
+
+    def fit(self, X_train, y_train, X_val=None, y_val=None):
+        codes = self.models_to_fit(X_train)
+        if not codes:
+            raise ValueError("Per-position models need at least one training row")
+        train_groups = self.training_groups(X_train, codes)
+        val_groups = self.training_groups(X_val, codes) if X_val is not None else {}
+
+        # Split the cores across the concurrent fits instead of each claiming all of them
+        cores = available_cores()
+        workers = min(len(train_groups), cores)
+        threads_per_model = max(1, cores // workers)
+        params = dict(self.params)
+        if 'n_jobs' in params:
+            params['n_jobs'] = threads_per_model
+
+        def fit_position(code):
+            rows = train_groups[code]
+            val_rows = val_groups.get(code)
+            # A backend preloaded by load_reusable() keeps its state (e.g. bins)
+            backend = self.models.get(code) or create_backend(self.base_backend, params, self.feature_columns)
+            backend.params = dict(params)
+            backend.fit(
+                X_train[rows], y_train[rows],
+                X_val[val_rows] if val_rows is not None else None,
+                y_val[val_rows] if val_rows is not None else None
+            )
+            return code, backend
+
+        # Tree building releases the GIL, so threads train in parallel and only each
+        # position's rows are copied; the OpenMP limit keeps boosting to its share too.
+        # The pooled model, when there is one, has the most rows, so it goes first.
+        with threadpool_limits(limits=threads_per_model), ThreadPoolExecutor(max_workers=workers) as pool:
+            self.models = dict(pool.map(fit_position, sorted(train_groups)))
+        self.train_rows = {code: len(rows) for code, rows in train_groups.items()}
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        """Score each position's rows with its model in one batch, falling back to the pooled model"""
+        predictions = np.empty(len(X), dtype=np.float64)
+        for code, rows in self.route(X).items():
+            model = self.models.get(code, self.models.get(POOLED_CODE))
+            if model is None:
+                raise ValueError(f"No model was trained for {ROUTED_MODELS[code]} and there is no pooled model")
+            predictions[rows] = model.predict(X[rows])
+        return predictions
+
+    def grow(self, X, y, amount: int):
+        """Grow each position's model on that position's rows; positions absent from X are left as they are"""
+        for code, rows in self.training_groups(X, self.models).items():
+            self.models[code].grow(X[rows], y[rows], amount)
+            self.train_rows[code] = self.train_rows.get(code, 0) + len(rows)
+        return self
+
+    def feature_importances(self, X_val=None, y_val=None) -> np.ndarray:
+        """Per-position importances averaged by training rows (the pooled model's if it is the only one)"""
+        val_groups = self.training_groups(X_val, self.models) if X_val is not None else {}
+        codes = [code for code in self.models if code != POOLED_CODE] or list(self.models)
+        importances = []
+        for code in codes:
+            rows = val_groups.get(code)
+            importances.append(self.models[code].feature_importances(
+                X_val[rows] if rows is not None else None,
+                y_val[rows] if rows is not None else None
+            ))
+        weights = [self.train_rows[code] for code in codes]
+        return np.average(np.vstack(importances), axis=0, weights=weights)
+
+    def position_dir(self, model_dir: Path, code: int) -> Path:
+        """Where one position's model is saved"""
+        return Path(model_dir) / self.model_file / ROUTED_MODELS[code]
+
+    def load_reusable(self, model_dir: Path) -> bool:
+        """Reuse each position's saved state (e.g. HGB bins) from the last per-position run"""
+        reused = False
+        for code in ROUTED_MODELS:
+            backend = create_backend(self.base_backend, self.params, self.feature_columns)
+            if backend.load_reusable(self.position_dir(model_dir, code)):
+                self.models[code] = backend
+                reused = True
+        return reused
+
+    def save(self, model_dir: Path) -> Path:
+        root = Path(model_dir) / self.model_file
+        for code, model in self.models.items():
+            path = self.position_dir(model_dir, code)
+            path.mkdir(parents=True, exist_ok=True)
+            model.save(path)
+        (root / "router.json").write_text(json.dumps({
+            'base_backend': self.base_backend,
+            'feature_columns': self.feature_columns,
+            'positions': {ROUTED_MODELS[code]: rows for code, rows in self.train_rows.items()},
+        }, indent=2))
+        return root
+
+    def load(self, model_dir: Path, compiled: bool = False) -> 'ModelBackend':
+        root = Path(model_dir) / self.model_file
+        router = json.loads((root / "router.json").read_text())
+        codes = {name: code for code, name in ROUTED_MODELS.items()}
+        self.models = {}
+        for name, rows in router['positions'].items():
+            backend = create_backend(self.base_backend, self.params, self.feature_columns)
+            self.models[codes[name]] = backend.load_compiled(root / name) if compiled else backend.load(root / name)
+            self.train_rows[codes[name]] = rows
+        return self
+
+    def load_compiled(self, model_dir: Path) -> 'ModelBackend':
+        return self.load(model_dir, compiled=True)
+
+
+def create_backend(name: str = DEFAULT_BACKEND, params: Optional[dict] = None,
+                   feature_columns: Optional[List[str]] = None, per_position: bool = False) -> ModelBackend:
+    """Backend instance by name, optionally as one model per position"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if per_position:
+        return PositionRouter(name, params, feature_columns)
+    return BACKENDS[name](params, feature_columns)
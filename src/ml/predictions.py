@@ -0,0 +1,272 @@
+"""
+Batch Scoring for FPL Points Prediction
+Loads the trained model once and scores a whole gameweek in one vectorized call
+
+Usage: python -m src.ml.predictions [--season 2024-25 --gameweek 37] [--backend hist_gradient_boosting | --version latest]
+"""
+
+import argparse
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import duckdb
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.ingestion.api_loader import FIXTURES_TABLE
+from src.ml.features import MART_TABLE, TARGET_COLUMN, TARGET_GAMEWEEK_COLUMN, MedianImputer, build_feature_matrix
+from src.ml.models import DEFAULT_BACKEND, POSITION_CODES, POSITION_FEATURE, create_backend
+from src.ml.registry import LATEST, ModelRegistry, ModelVersion
+from src.ml.train_baseline import DB_PATH, IMPUTATION_STATS_FILE, MODEL_DIR
+
+# Configuration
+PREDICTIONS_TABLE = "predictions"
+FIXTURE_INDEX_TABLE = "int_fixture_index"
+FEATURE_COLUMNS_FILE = "feature_columns.pkl"
+# position_encoded -> label lookup; codes outside POSITION_CODES read as UNK
+POSITION_NAMES = np.array(['UNK'] + [POSITION_CODES[code] for code in sorted(POSITION_CODES)] + ['UNK'])
+
+PREDICTIONS_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {PREDICTIONS_TABLE} (
+        season VARCHAR,
+        gameweek INTEGER,           -- gameweek the features describe
+        target_gameweek INTEGER,    -- gameweek the points are predicted for
+        player_name VARCHAR,
+        position VARCHAR,
+        predicted_points DOUBLE,
+        model VARCHAR,
+        scored_at TIMESTAMP
+    )
+"""
+# Arrow layout of a scored gameweek, matching PREDICTIONS_DDL
+PREDICTIONS_SCHEMA = pa.schema([
+    ('season', pa.string()),
+    ('gameweek', pa.int32()),
+    ('target_gameweek', pa.int32()),
+    ('player_name', pa.string()),
+    ('position', pa.string()),
+    ('predicted_points', pa.float64()),
+    ('model', pa.string()),
+    ('scored_at', pa.timestamp('us')),
+])
+
+
+class LatencyReport:
+    """Wall time per scoring stage"""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as one stage"""
+        start = time.perf_counter()
+        yield
+        self.stages.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.stages)
+
+    def print_report(self):
+        """Print the stage table"""
+        print("\n⏱️ Latency by stage:")
+        for name, seconds in self.stages:
+            print(f"   {name:<24} {seconds * 1000:>8.1f}ms")
+        print(f"   {'total':<24} {self.total * 1000:>8.1f}ms")
+
+
+class FPLScorer:
+    """Keeps the model, feature list and imputation stats warm between scoring calls"""
+
+    def __init__(self, backend: str = DEFAULT_BACKEND, per_position: bool = False,
+                 compiled: bool = True, model_dir: Path = MODEL_DIR, db_path: str = DB_PATH,
+                 version: Optional[str] = None, registry: Optional[ModelRegistry] = None):
+        self.db_path = db_path
+        self.compiled = compiled
+        self.registry = registry or ModelRegistry(db_path=db_path)
+        self.version = None
+
+        start = time.perf_counter()
+        if version is not None:
+            self.use(version)
+        else:
+            self.model_label = backend + ("_per_position" if per_position else "")
+            self.feature_columns: List[str] = joblib.load(Path(model_dir) / FEATURE_COLUMNS_FILE)
+            self.imputer = MedianImputer.load(Path(model_dir) / IMPUTATION_STATS_FILE)
+            if self.imputer.feature_columns != self.feature_columns:
+                raise ValueError("Imputation stats and feature columns come from different training runs")
+            # Compiled models are memory-mapped: no unpickling, pages shared across processes
+            model = create_backend(backend, None, self.feature_columns, per_position)
+            self.model = model.load_compiled(model_dir) if compiled else model.load(model_dir)
+        self.load_seconds = time.perf_counter() - start
+
+        # The first predict pays for thread pool start-up; pay it here instead
+        self.model.predict(self.imputer.medians[np.newaxis, :])
+
+    def use(self, version: str = LATEST) -> ModelVersion:
+        """Switch to a registered version by id or alias
+
+        The registry keeps every version it has loaded, so switching back to one
+        is a dictionary lookup rather than a reload.
+        """
+        model_version = self.registry.get(version)
+        self.model = model_version.load_model(self.compiled)
+        self.imputer = model_version.imputer
+        self.feature_columns = model_version.feature_columns
+        self.model_label = model_version.label
+        self.version = model_version.version
+        return model_version
+
+    def scoring_query(self, season: Optional[str] = None, gameweek: Optional[int] = None,
+                      api_fixtures: bool = False) -> Tuple[str, list]:
+        """One gameweek's rows with the training feature layout (default: the latest gameweek)
+
+        Only players with a row in that gameweek are scored, i.e. those whose team
+        played in it; a team with a blank gameweek is left out until it plays again.
+        next_appearance_gameweek becomes the gameweek each prediction is for: the
+        player's next appearance once the mart has it, otherwise the team's next
+        fixture from the fixture index or, for unplayed fixtures, api_fixtures.
+        Returns the query and its bound parameters.
+        """
+        if season is not None and gameweek is not None:
+            target, params = "SELECT ? AS season, ? AS gameweek", [season, int(gameweek)]
+        else:
+            # Seasons are 'YYYY-YY' strings, so they sort chronologically
+            target, params = f"SELECT season, gameweek FROM {MART_TABLE} ORDER BY season DESC, gameweek DESC LIMIT 1", []
+        # Where the gameweek being predicted comes from, most reliable first
+        next_gameweek = [
+            f"m.{TARGET_GAMEWEEK_COLUMN}",
+            f"""(SELECT MIN(f.next_gameweek) FROM {FIXTURE_INDEX_TABLE} f
+                WHERE f.season = m.season AND f.team_name = m.team_name
+                    AND f.gameweek = m.gameweek AND f.next_gameweek > m.gameweek)""",
+        ]
+        if api_fixtures:
+            next_gameweek.append(f"""(SELECT MIN(a.gameweek) FROM {FIXTURES_TABLE} a
+                WHERE a.season = m.season AND m.team_name IN (a.team_h, a.team_a) AND a.gameweek > m.gameweek)""")
+        return f"""
+            WITH target AS ({target})
+            SELECT
+                m.player_name,
+                m.season,
+                m.gameweek,
+                m.{TARGET_COLUMN},
+                COALESCE({', '.join(next_gameweek)}) AS {TARGET_GAMEWEEK_COLUMN},
+                {', '.join(f'm.{column}' for column in self.feature_columns)}
+            FROM {MART_TABLE} m
+            SEMI JOIN target USING (season, gameweek)
+            ORDER BY m.player_name
+        """, params
+
+    def score(self, season: Optional[str] = None, gameweek: Optional[int] = None,
+              report: Optional[LatencyReport] = None) -> pa.Table:
+        """Score one gameweek and write the results to the predictions table
+
+        A gameweek with no rows in the mart returns an empty table and writes nothing.
+        """
+        report = report or LatencyReport()
+
+        with report.stage("connect"):
+            conn = duckdb.connect(self.db_path)
+        try:
+            with report.stage("query -> feature matrix"):
+                api_fixtures = conn.execute(
+                    "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [FIXTURES_TABLE]
+                ).fetchone()[0] > 0
+                matrix = build_feature_matrix(conn, *self.scoring_query(season, gameweek, api_fixtures))
+            if len(matrix) == 0:
+                return PREDICTIONS_SCHEMA.empty_table()
+            # Same columns in the same order as training, so the model sees the layout it was fitted on
+            if matrix.feature_columns != self.feature_columns:
+                raise ValueError("Scoring features do not match the trained feature layout")
+
+            with report.stage("impute"):
+                X = self.imputer.transform(matrix.to_float32(order='C'))
+
+            with report.stage("predict"):
+                predicted = self.model.predict(X)
+
+            with report.stage("write predictions"):
+                meta = matrix.meta
+                codes = matrix.flags[:, matrix.flag_columns.index(POSITION_FEATURE)]
+                scored = pa.table({
+                    'season': meta['season'].astype(str).to_numpy(),
+                    'gameweek': meta['gameweek'].to_numpy(np.int32),
+                    # NULL when neither the mart nor a fixture list knows the next game
+                    'target_gameweek': pa.array(meta[TARGET_GAMEWEEK_COLUMN], pa.int32(), from_pandas=True),
+                    'player_name': meta['player_name'].astype(str).to_numpy(),
+                    'position': POSITION_NAMES[np.minimum(codes, len(POSITION_NAMES) - 1)],
+                    'predicted_points': predicted.astype(np.float64),
+                    'model': np.full(len(matrix), self.model_label),
+                    'scored_at': pa.array([datetime.now()] * len(matrix), pa.timestamp('us')),
+                }, schema=PREDICTIONS_SCHEMA)
+                self.write(conn, scored)
+        finally:
+            conn.close()
+        return scored
+
+    def write(self, conn: duckdb.DuckDBPyConnection, scored: pa.Table):
+        """Replace this model's predictions for the scored gameweek(s) in one transaction"""
+        conn.execute(PREDICTIONS_DDL)
+        conn.register("scored", scored)
+        conn.execute("BEGIN TRANSACTION")
+        conn.execute(f"""
+            DELETE FROM {PREDICTIONS_TABLE}
+            WHERE model = ?
+                AND (season, gameweek) IN (SELECT DISTINCT season, gameweek FROM scored)
+        """, [self.model_label])
+        conn.execute(f"INSERT INTO {PREDICTIONS_TABLE} SELECT * FROM scored")
+        conn.execute("COMMIT")
+        conn.unregister("scored")
+
+
+def print_top_picks(scored: pa.Table, n: int = 10):
+    """Highest predicted scorers for the gameweek"""
+    top = scored.to_pandas().nlargest(n, 'predicted_points')
+    print(f"\n🔮 Top {n} predicted after GW{top['gameweek'].iloc[0]}:")
+    for _, row in top.iterrows():
+        target = "GW?" if pd.isna(row['target_gameweek']) else f"GW{int(row['target_gameweek'])}"
+        print(f"   {row['player_name']:<28} {row['position']:<4} {target:<5} {row['predicted_points']:.2f}")
+
+
+def main():
+    """Score the latest (or a given) gameweek from the command line"""
+    parser = argparse.ArgumentParser(description="Score a gameweek with the trained model")
+    parser.add_argument("--season", help="Season to score (with --gameweek; default: latest in the mart)")
+    parser.add_argument("--gameweek", type=int, help="Gameweek whose features to score")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND)
+    parser.add_argument("--per-position", action="store_true")
+    parser.add_argument("--version", help="Score with a registered model version or alias (e.g. latest)")
+    parser.add_argument("--sklearn", action="store_true",
+                        help="Score with the unpickled sklearn estimator instead of the flat-array export")
+    args = parser.parse_args()
+    if (args.season is None) != (args.gameweek is None):
+        parser.error("--season and --gameweek go together")
+
+    print("🔮 FPL Gameweek Scoring")
+    print("=" * 50)
+    scorer = FPLScorer(backend=args.backend, per_position=args.per_position, compiled=not args.sklearn,
+                       version=args.version)
+    print(f"📦 Loaded {scorer.model_label} model and {len(scorer.feature_columns)} features "
+          f"in {scorer.load_seconds * 1000:.0f}ms")
+
+    report = LatencyReport()
+    scored = scorer.score(args.season, args.gameweek, report)
+    if scored.num_rows == 0:
+        target = f"{args.season} GW{args.gameweek}" if args.season else "the latest gameweek"
+        print(f"⚠️ No rows in {MART_TABLE} for {target}, nothing scored")
+        return
+    season, gameweek = scored['season'][0].as_py(), scored['gameweek'][0].as_py()
+    print(f"✅ Scored {scored.num_rows} players from {season} GW{gameweek}")
+    print(f"💾 Written to {PREDICTIONS_TABLE} in {DB_PATH}")
+    print_top_picks(scored)
+    report.print_report()
+
+
+if __name__ == "__main__":
+    main()
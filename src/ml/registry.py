@@ -0,0 +1,231 @@
+"""
+Model Registry for FPL Points Prediction
+Versioned model artifacts with manifests, loaded lazily and memory-mapped for scoring
+
+Usage: python -m src.ml.registry [list | show VERSION | promote VERSION [--alias production]]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb
+import pandas as pd
+
+from src.ml.features import DB_PATH, FeatureStore, MedianImputer
+from src.ml.models import ModelBackend, PositionRouter, create_backend
+
+# Configuration
+REGISTRY_DIR = Path("models/registry")
+INDEX_FILE = "registry.json"  # alias -> version
+MANIFEST_FILE = "manifest.json"
+IMPUTER_FILE = "imputation_stats.json"
+IMPORTANCE_FILE = "feature_importance.csv"
+LATEST = "latest"
+KEEP_VERSIONS = 10  # versions an alias points at are kept on top of these
+
+
+def feature_hash(feature_columns: List[str]) -> str:
+    """Order-sensitive hash of a feature list; a model only accepts the layout it was fitted on"""
+    return hashlib.sha256(json.dumps(list(feature_columns)).encode()).hexdigest()[:12]
+
+
+class ModelVersion:
+    """One registered model: the manifest is read up front, the artifacts on first use"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / MANIFEST_FILE).read_text())
+        self.models: Dict[bool, ModelBackend] = {}
+        self._imputer = None
+
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+
+    @property
+    def feature_columns(self) -> List[str]:
+        return self.manifest['feature_columns']
+
+    @property
+    def label(self) -> str:
+        """Model name stored with this version's predictions"""
+        per_position = "_per_position" if self.manifest['per_position'] else ""
+        return f"{self.manifest['backend']}{per_position}@{self.version}"
+
+    @property
+    def imputer(self) -> MedianImputer:
+        if self._imputer is None:
+            imputer = MedianImputer.load(self.path / IMPUTER_FILE)
+            if imputer.feature_columns != self.feature_columns:
+                raise ValueError(f"Version {self.version} has imputation stats for a different feature list")
+            self._imputer = imputer
+        return self._imputer
+
+    def load_model(self, compiled: bool = True) -> ModelBackend:
+        """The estimator, memory-mapped when compiled; loaded once per version"""
+        if compiled not in self.models:
+            model = create_backend(self.manifest['backend'], self.manifest['params'], self.feature_columns,
+                                   self.manifest['per_position'])
+            self.models[compiled] = model.load_compiled(self.path) if compiled else model.load(self.path)
+        return self.models[compiled]
+
+
+class ModelRegistry:
+    """Versioned model directories with aliases such as 'latest' pointing into them"""
+
+    def __init__(self, root: Path = REGISTRY_DIR, db_path: str = DB_PATH):
+        self.root = Path(root)
+        self.db_path = db_path
+        self.index_path = self.root / INDEX_FILE
+        # Versions handed out by get(); their mapped artifacts stay warm for switching back
+        self.loaded: Dict[str, ModelVersion] = {}
+
+    def version_path(self, version: str) -> Path:
+        """Directory holding one version"""
+        return self.root / version
+
+    def versions(self) -> List[str]:
+        """Registered versions, oldest first (ids start with their creation time)"""
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / MANIFEST_FILE).exists())
+
+    def aliases(self) -> Dict[str, str]:
+        return json.loads(self.index_path.read_text()) if self.index_path.exists() else {}
+
+    def set_alias(self, alias: str, version: str):
+        """Point an alias at a registered version, atomically"""
+        version = self.resolve(version)
+        aliases = self.aliases()
+        aliases[alias] = version
+        tmp_path = self.index_path.with_name(INDEX_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(aliases, indent=2, sort_keys=True))
+        os.replace(tmp_path, self.index_path)
+
+    def resolve(self, ref: str = LATEST) -> str:
+        """Version id for an alias or id"""
+        version = self.aliases().get(ref, ref)
+        if not (self.version_path(version) / MANIFEST_FILE).exists():
+            raise ValueError(f"No registered model version or alias '{ref}' in {self.root}")
+        return version
+
+    def get(self, ref: str = LATEST) -> ModelVersion:
+        """A version by alias or id; nothing beyond the manifest is read until it is used"""
+        version = self.resolve(ref)
+        if version not in self.loaded:
+            self.loaded[version] = ModelVersion(self.version_path(version))
+        return self.loaded[version]
+
+    def mart_state(self) -> dict:
+        """Row count and content fingerprint of the mart as it is now"""
+        conn = duckdb.connect(self.db_path, read_only=True)
+        try:
+            fingerprint = FeatureStore(self.db_path).mart_fingerprint(conn)
+        finally:
+            conn.close()
+        return {'mart_rows': int(fingerprint.split(':')[0]), 'mart_fingerprint': fingerprint}
+
+    def register(self, model: ModelBackend, imputer: MedianImputer, metrics: dict, training: dict,
+                 snapshot_key: Optional[str] = None, feature_importance: Optional[pd.DataFrame] = None,
+                 alias: str = LATEST) -> ModelVersion:
+        """Write a trained model as a new version and point `alias` at it"""
+        feature_columns = imputer.feature_columns
+        if model.feature_columns != feature_columns:
+            raise ValueError("Model and imputation stats were fitted on different feature lists")
+        features = feature_hash(feature_columns)
+        version = f"{datetime.now():%Y%m%d-%H%M%S}-{features[:6]}"
+        while self.version_path(version).exists():
+            version += "b"
+
+        tmp_path = self.root / f".{version}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+        # Estimators go through joblib uncompressed, so their arrays can be memory-mapped on load
+        model.save(tmp_path)
+        imputer.save(tmp_path / IMPUTER_FILE)
+        if feature_importance is not None:
+            feature_importance.to_csv(tmp_path / IMPORTANCE_FILE, index=False)
+
+        per_position = isinstance(model, PositionRouter)
+        manifest = {
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'backend': model.base_backend if per_position else model.name,
+            'per_position': per_position,
+            'params': model.params,
+            'feature_columns': feature_columns,
+            'feature_hash': features,
+            'snapshot_key': snapshot_key,
+            **self.mart_state(),
+            'training': training,
+            'metrics': metrics,
+            'files': {str(p.relative_to(tmp_path)): p.stat().st_size
+                      for p in sorted(tmp_path.rglob('*')) if p.is_file()},
+        }
+        # default=float covers numpy scalars in the metrics
+        (tmp_path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2, default=float))
+
+        # A rename is atomic, so readers never see a half-written version
+        os.replace(tmp_path, self.version_path(version))
+        self.set_alias(alias, version)
+        self.prune()
+        return self.get(version)
+
+    def prune(self, keep: int = KEEP_VERSIONS):
+        """Delete all but the newest versions, sparing any an alias points at"""
+        pinned = set(self.aliases().values())
+        for version in self.versions()[:-keep]:
+            if version not in pinned:
+                # Processes that mapped its files keep reading them until they let go
+                shutil.rmtree(self.version_path(version), ignore_errors=True)
+                self.loaded.pop(version, None)
+
+
+def print_versions(registry: ModelRegistry):
+    """One line per version, newest first"""
+    aliases = {}
+    for alias, version in registry.aliases().items():
+        aliases.setdefault(version, []).append(alias)
+    print(f"{'version':<24} {'model':<32} {'test MAE':>9} {'mart rows':>10}  aliases")
+    for version in reversed(registry.versions()):
+        model_version = registry.get(version)
+        manifest = model_version.manifest
+        mae = manifest['metrics'].get('test_mae')
+        print(f"{version:<24} {model_version.label.split('@')[0]:<32} "
+              f"{'-' if mae is None else f'{mae:.3f}':>9} {manifest['mart_rows']:>10,}  "
+              f"{', '.join(sorted(aliases.get(version, [])))}")
+
+
+def main():
+    """List, inspect or promote registered versions"""
+    parser = argparse.ArgumentParser(description="Inspect the model registry")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("list", help="Registered versions, newest first")
+    show = subparsers.add_parser("show", help="Print a version's manifest")
+    show.add_argument("version", nargs="?", default=LATEST)
+    promote = subparsers.add_parser("promote", help="Point an alias at a version")
+    promote.add_argument("version")
+    promote.add_argument("--alias", default="production")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == "show":
+        print(json.dumps(registry.get(args.version).manifest, indent=2))
+    elif args.command == "promote":
+        registry.set_alias(args.alias, args.version)
+        print(f"🏷️ {args.alias} -> {registry.resolve(args.alias)}")
+    else:
+        print("🗂️ FPL Model Registry")
+        print("=" * 50)
+        print_versions(registry)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Weekly Retraining for FPL Points Prediction
+Grows the saved model on recent gameweeks, with full retrains on a schedule or when drift is detected
+
+Usage: python -m src.ml.retrain [--backend hist_gradient_boosting] [--full] [--through 2024-25:12]
+"""
+
+import argparse
+import json
+import os
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from src.ml.backtest import GW_SLOTS, time_index
+from src.ml.features import TARGET_GAMEWEEK_COLUMN, FeatureMatrix, MedianImputer
+from src.ml.models import DEFAULT_BACKEND, create_backend
+from src.ml.registry import ModelRegistry
+from src.ml.train_baseline import IMPUTATION_STATS_FILE, MODEL_DIR, FPLPredictor, load_model_params
+
+# Configuration
+STATE_FILE = "retrain_state.json"
+RECENT_GAMEWEEKS = 12     # window the added trees/rounds are fitted on
+HOLDOUT_GAMEWEEKS = 4     # kept out of a full retrain for early stopping and the reference MAE
+FULL_RETRAIN_EVERY = 8    # incremental updates between scheduled full retrains
+GROWTH = {'random_forest': 20, 'hist_gradient_boosting': 5}  # trees / rounds added per update
+
+# Drift: population stability index per feature, and error on the new rows vs the reference
+PSI_BINS = 10
+PSI_THRESHOLD = 0.25
+MAE_DRIFT_RATIO = 1.25
+MIN_DRIFT_ROWS = 200
+# One value per team or position each gameweek, or a count of season progress: a single
+# gameweek never matches their history, so PSI would flag every week. Player features only.
+PSI_SKIP = [
+    'games_played_to_date', 'season_avg_points', 'position_percentile', 'avg_position_points',
+    'team_form', 'team_attack', 'team_defense_weakness',
+    'fixture_difficulty_next', 'next_opponent_attack', 'next_opponent_defence_weakness',
+]
+
+
+def psi_reference(X: np.ndarray, bins: int = PSI_BINS) -> dict:
+    """Per-feature quantile edges and the share of training rows in each bin"""
+    edges, proportions = [], []
+    for column in X.T:
+        column_edges = np.unique(np.quantile(column, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(column_edges, column, side='right'), minlength=len(column_edges) + 1)
+        edges.append(column_edges.tolist())
+        proportions.append((counts / len(column)).tolist())
+    return {'edges': edges, 'proportions': proportions}
+
+
+def population_stability(X: np.ndarray, reference: dict) -> np.ndarray:
+    """PSI of each feature of X against psi_reference() bins"""
+    psi = np.zeros(X.shape[1])
+    for i, (column_edges, expected) in enumerate(zip(reference['edges'], reference['proportions'])):
+        counts = np.bincount(np.searchsorted(column_edges, X[:, i], side='right'), minlength=len(expected))
+        # Empty bins would make the log blow up; floor both sides at a small share
+        actual = np.clip(counts / len(X), 1e-4, None)
+        expected = np.clip(np.asarray(expected), 1e-4, None)
+        psi[i] = np.sum((actual - expected) * np.log(actual / expected))
+    return psi
+
+
+class WeeklyRetrainer:
+    """Incremental model updates after each gameweek, falling back to a full retrain when needed"""
+
+    def __init__(self, backend: str = DEFAULT_BACKEND, per_position: bool = False,
+                 model_dir: Path = MODEL_DIR, through: Optional[Tuple[str, int]] = None):
+        self.backend = backend
+        self.per_position = per_position
+        self.model_dir = Path(model_dir)
+        self.through = through
+        self.state_path = self.model_dir / STATE_FILE
+        self.registry = ModelRegistry()
+
+    def load_state(self) -> Optional[dict]:
+        return json.loads(self.state_path.read_text()) if self.state_path.exists() else None
+
+    def save_state(self, state: dict):
+        """Write state atomically, after the model files it describes"""
+        tmp_path = self.state_path.with_name(STATE_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(state, indent=2))
+        os.replace(tmp_path, self.state_path)
+
+    def available_rows(self, matrix: FeatureMatrix) -> Tuple[np.ndarray, np.ndarray, list]:
+        """Time index of every row's target, the rows usable so far, and the season order
+
+        A row lands once its target is known, i.e. when the player's next appearance
+        has been played, which can be several gameweeks after its features.
+        """
+        seasons = sorted(matrix.meta['season'].unique())
+        t = time_index(matrix.meta, TARGET_GAMEWEEK_COLUMN)
+        if self.through is None:
+            return t, np.ones(len(t), dtype=bool), seasons
+        season, gameweek = self.through
+        return t, t <= seasons.index(season) * GW_SLOTS + gameweek, seasons
+
+    def last_gameweeks(self, t: np.ndarray, rows: np.ndarray, n: int) -> np.ndarray:
+        """Mask of the rows in the last n gameweeks among `rows`"""
+        cutoff = np.unique(t[rows])[-n:][0]
+        return rows & (t >= cutoff)
+
+    def full_retrain_reason(self, state: Optional[dict], latest_season: str,
+                            feature_columns: list) -> Optional[str]:
+        """Why this run must retrain from scratch, or None if an incremental update will do"""
+        if state is None:
+            return "no previous model"
+        if (state['backend'], state['per_position']) != (self.backend, self.per_position):
+            return f"model changed from {state['backend']}"
+        if state['feature_columns'] != feature_columns:
+            return "feature set changed"
+        if state.get('version') not in self.registry.versions():
+            return "previous model version is no longer registered"
+        if latest_season != state['last_full_retrain']['season']:
+            return f"new season {latest_season}"
+        if state['updates_since_full'] >= FULL_RETRAIN_EVERY:
+            return f"scheduled after {state['updates_since_full']} updates"
+        return None
+
+    def run(self, force_full: bool = False) -> dict:
+        """Update or retrain the model with every gameweek that has landed since the last run"""
+        start = time.perf_counter()
+        predictor = FPLPredictor(backend=self.backend, per_position=self.per_position)
+        matrix = predictor.load_features()
+        t, available, seasons = self.available_rows(matrix)
+        latest = int(t[available].max())
+        latest_season, latest_gameweek = seasons[latest // GW_SLOTS], latest % GW_SLOTS
+        print(f"🗓️ Data through {latest_season} GW{latest_gameweek}")
+
+        state = self.load_state()
+        reason = "requested" if force_full else self.full_retrain_reason(state, latest_season,
+                                                                          matrix.feature_columns)
+        if reason is None:
+            trained_through = (seasons.index(state['trained_through']['season']) * GW_SLOTS
+                               + state['trained_through']['gameweek'])
+            new_rows = available & (t > trained_through)
+            if not new_rows.any():
+                print("✅ Model is already up to date")
+                return state
+            reason, result = self.incremental_update(matrix, state, t, available, new_rows)
+            if reason is None:
+                result['seconds'] = time.perf_counter() - start
+                return self.finish(state, result, latest_season, latest_gameweek)
+
+        print(f"🔁 Full retrain: {reason}")
+        history = state['history'] if state else []
+        state, result = self.full_retrain(matrix, t, available)
+        state['history'] = history
+        result.update({'reason': reason, 'seconds': time.perf_counter() - start})
+        state['last_full_retrain'] = {'season': latest_season, 'gameweek': latest_gameweek,
+                                      'at': datetime.now().isoformat(timespec='seconds')}
+        return self.finish(state, result, latest_season, latest_gameweek)
+
+    def save_current(self, model, imputer: MedianImputer, feature_columns: List[str]):
+        """Write the model with the imputer and column order it must be scored with to models/"""
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        model.save(self.model_dir)
+        joblib.dump(feature_columns, self.model_dir / "feature_columns.pkl")
+        imputer.save(self.model_dir / IMPUTATION_STATS_FILE)
+
+    def full_retrain(self, matrix: FeatureMatrix, t: np.ndarray, available: np.ndarray) -> Tuple[dict, dict]:
+        """Train on all history, holding out the last few gameweeks for early stopping and reference error"""
+        holdout = self.last_gameweeks(t, available, HOLDOUT_GAMEWEEKS)
+        train = available & ~holdout
+        X_train, y_train = matrix.to_float32(train), matrix.target(train)
+        X_val, y_val = matrix.to_float32(holdout, order='C'), matrix.target(holdout)
+        imputer = MedianImputer(matrix.feature_columns).fit(X_train)
+        imputer.transform(X_train)
+        imputer.transform(X_val)
+
+        params = load_model_params(self.backend)
+        model = create_backend(self.backend, params, matrix.feature_columns, self.per_position)
+        model.load_reusable(self.model_dir)
+        model.fit(X_train, y_train, X_val, y_val)
+        reference_mae = float(np.mean(np.abs(model.predict(X_val) - y_val)))
+
+        self.save_current(model, imputer, matrix.feature_columns)
+        version = self.registry.register(model, imputer, {'holdout_mae': reference_mae},
+                                         {'rows': int(train.sum()), 'mode': 'full'}, matrix.snapshot_key)
+
+        state = {
+            'backend': self.backend,
+            'per_position': self.per_position,
+            'version': version.version,
+            'feature_columns': matrix.feature_columns,
+            'updates_since_full': 0,
+            'reference_mae': reference_mae,
+            'psi_reference': psi_reference(X_train),
+        }
+        return state, {'mode': 'full', 'rows_fitted': int(train.sum()), 'holdout_mae': reference_mae,
+                       'version': version.version}
+
+    def incremental_update(self, matrix: FeatureMatrix, state: dict, t: np.ndarray,
+                           available: np.ndarray, new_rows: np.ndarray) -> Tuple[Optional[str], dict]:
+        """Check the new rows for drift, then grow the model on the recent window
+
+        Returns a full-retrain reason instead when drift is found.
+        """
+        # The version this state describes; models/ may since have been overwritten by another training run
+        previous = self.registry.get(state['version'])
+        model = create_backend(self.backend, None, matrix.feature_columns, self.per_position)
+        model.load(previous.path)
+        imputer = previous.imputer
+
+        # Score the new rows with the model as it stands: the error it would have made live
+        X_new = imputer.transform(matrix.to_float32(new_rows, order='C'))
+        y_new = matrix.target(new_rows)
+        new_mae = float(np.mean(np.abs(model.predict(X_new) - y_new)))
+        psi = population_stability(X_new, state['psi_reference'])
+        psi[[i for i, c in enumerate(matrix.feature_columns) if c in PSI_SKIP]] = 0.0
+        worst = int(np.argmax(psi))
+        print(f"🔎 {len(y_new):,} new rows: MAE {new_mae:.3f} (reference {state['reference_mae']:.3f}), "
+              f"max PSI {psi[worst]:.3f} ({matrix.feature_columns[worst]})")
+
+        if new_mae > state['reference_mae'] * MAE_DRIFT_RATIO:
+            return f"error drift (MAE {new_mae:.3f} vs {state['reference_mae']:.3f})", {}
+        if len(y_new) >= MIN_DRIFT_ROWS and psi[worst] > PSI_THRESHOLD:
+            return f"feature drift in {matrix.feature_columns[worst]} (PSI {psi[worst]:.2f})", {}
+
+        # Imputation medians stay as fitted at the last full retrain, so old and new trees see the same fills
+        window = self.last_gameweeks(t, available, RECENT_GAMEWEEKS)
+        X_window = imputer.transform(matrix.to_float32(window))
+        amount = GROWTH[self.backend]
+        print(f"🌱 Growing {self.backend} by {amount} on the last {RECENT_GAMEWEEKS} gameweeks "
+              f"({int(window.sum()):,} rows)")
+        model.grow(X_window, matrix.target(window), amount)
+        self.save_current(model, imputer, matrix.feature_columns)
+        version = self.registry.register(model, imputer, {'new_rows_mae': new_mae, 'max_psi': float(psi[worst])},
+                                         {'rows': int(window.sum()), 'mode': 'incremental'}, matrix.snapshot_key)
+
+        state['updates_since_full'] += 1
+        state['version'] = version.version
+        return None, {'mode': 'incremental', 'rows_fitted': int(window.sum()), 'new_rows': int(len(y_new)),
+                      'new_rows_mae': new_mae, 'max_psi': float(psi[worst]), 'version': version.version}
+
+    def finish(self, state: dict, result: dict, season: str, gameweek: int) -> dict:
+        """Record the run and print a summary"""
+        state['trained_through'] = {'season': season, 'gameweek': int(gameweek)}
+        state['history'].append({'through': f"{season} GW{gameweek}", **result})
+        self.save_state(state)
+        print(f"✅ {result['mode'].title()} {'retrain' if result['mode'] == 'full' else 'update'} "
+              f"through {season} GW{gameweek}: {result['rows_fitted']:,} rows fitted in {result['seconds']:.1f}s")
+        return state
+
+
+def parse_through(value: str) -> Tuple[str, int]:
+    """'2024-25:12' -> ('2024-25', 12)"""
+    season, _, gameweek = value.partition(':')
+    if not gameweek:
+        raise argparse.ArgumentTypeError("use SEASON:GAMEWEEK, e.g. 2024-25:12")
+    return season, int(gameweek)
+
+
+def main():
+    """Run the weekly retrain from the command line"""
+    parser = argparse.ArgumentParser(description="Weekly incremental retrain of the points model")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND)
+    parser.add_argument("--per-position", action="store_true")
+    parser.add_argument("--full", action="store_true", help="Retrain from scratch regardless of schedule")
+    parser.add_argument("--through", type=parse_through,
+                        help="Only use gameweeks up to SEASON:GAMEWEEK (replays past weeks)")
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    print("🔄 FPL Weekly Retrain")
+    print("=" * 50)
+    retrainer = WeeklyRetrainer(backend=args.backend, per_position=args.per_position, through=args.through)
+    retrainer.run(force_full=args.full)
+
+
+if __name__ == "__main__":
+    main()
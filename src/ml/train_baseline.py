@@ -3,119 +3,165 @@ Baseline ML Model for FPL Points Prediction (Fixed)
 Time-series aware training with proper validation
 """
 
+import argparse
 import duckdb
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import joblib
+import json
 from pathlib import Path
+from src.ml.evaluation import (BIG_HAUL_POINTS, PairedBootstrap, captain_metrics, compute_fpl_metrics,
+                               gameweek_codes, gameweek_labels, group_metrics, print_bootstrap,
+                               print_group_metrics, summarize_captaincy)
+from src.ml.features import FeatureStore, MedianImputer, MemoryReport, build_feature_matrix
+from src.ml.models import BACKENDS, BASELINE_PARAMS, DEFAULT_BACKEND, POSITION_CODES, POSITION_FEATURE, create_backend
+from src.ml.registry import ModelRegistry
 import warnings
-warnings.filterwarnings('ignore')
 
 # Configuration
 DB_PATH = "data/fpl_complete.db"
 MODEL_DIR = Path("models")
-MODEL_DIR.mkdir(exist_ok=True)
+IMPUTATION_STATS_FILE = "imputation_stats.json"
+TUNED_PARAMS_PATH = MODEL_DIR / "tuned_params.json"  # written by src/ml/tuning.py
+
+ML_DATASET_QUERY = """
+    SELECT 
+        player_name,
+        season,
+        gameweek,
+        position_encoded,
+        
+        -- Target variable and the gameweek it is scored in
+        next_gw_points,
+        next_appearance_gameweek,
+        
+        -- Core features
+        avg_points_5gw,
+        avg_points_3gw,
+        season_avg_points,
+        consistency_score,
+        blank_rate,
+        big_haul_rate,
+        points_per_90,
+        games_played_to_date,
+        
+        -- Team features  
+        team_form,
+        team_attack,
+        team_defense_weakness,
+        
+        -- Fixture features
+        fixture_difficulty_next,
+        next_opponent_attack,
+        next_opponent_defence_weakness,
+        next_is_home,
+        
+        -- Position features
+        position_percentile,
+        avg_position_points,
+        
+        -- Financial features
+        player_value,
+        ownership_pct,
+        
+        -- Binary features
+        is_home,
+        improving_form,
+        consistent_performer,
+        above_position_threshold,
+        was_benched,
+        played_full_game
+        
+    FROM mart_ml_features
+    WHERE 
+        next_gw_points IS NOT NULL
+        AND avg_points_5gw IS NOT NULL
+        AND games_played_to_date >= 5  -- Ensure good data quality
+    ORDER BY season, gameweek, player_name
+"""
+
+def load_model_params(estimator=DEFAULT_BACKEND):
+    """Baseline params for a backend, overlaid with the last tuning result if there is one"""
+    params = dict(BASELINE_PARAMS[estimator])
+    if TUNED_PARAMS_PATH.exists():
+        tuned = json.loads(TUNED_PARAMS_PATH.read_text())
+        if tuned.get('estimator') == estimator:
+            params.update(tuned['params'])
+            print(f"🎛️ Using tuned params from search {tuned['search_id']} (val MAE {tuned['val_mae']:.3f})")
+    return params
 
 class FPLPredictor:
     """Fantasy Premier League points prediction model"""
     
-    def __init__(self):
+    def __init__(self, model_params=None, backend=DEFAULT_BACKEND, per_position=False):
         self.model = None
+        self.backend = backend
+        self.per_position = per_position
+        self.model_params = model_params
         self.feature_columns = None
         self.feature_importance = None
+        self.imputer = None
+        self.snapshot_key = None
+        self.memory_report = MemoryReport()
         
     def load_data(self):
-        """Load and prepare ML dataset with proper time ordering"""
+        """Load ML dataset with proper time ordering as a compact float32/uint8 matrix"""
         print("📊 Loading ML dataset...")
         
-        conn = duckdb.connect(DB_PATH)
-        
-        # Load with proper time ordering
-        query = """
-        SELECT 
-            player_name,
-            season,
-            gameweek,
-            position_encoded,
-            
-            -- Target variable
-            next_gw_points,
-            
-            -- Core features
-            avg_points_5gw,
-            avg_points_3gw,
-            season_avg_points,
-            consistency_score,
-            blank_rate,
-            big_haul_rate,
-            points_per_90,
-            games_played_to_date,
-            
-            -- Team features  
-            team_form,
-            team_attack,
-            team_defense_weakness,
-            
-            -- Position features
-            position_percentile,
-            avg_position_points,
-            
-            -- Financial features
-            player_value,
-            ownership_pct,
-            
-            -- Binary features
-            is_home,
-            improving_form,
-            consistent_performer,
-            above_position_threshold,
-            was_benched,
-            played_full_game
-            
-        FROM mart_ml_features
-        WHERE 
-            next_gw_points IS NOT NULL
-            AND avg_points_5gw IS NOT NULL
-            AND games_played_to_date >= 5  -- Ensure good data quality
-        ORDER BY season, gameweek, player_name
-        """
-        
-        df = conn.execute(query).df()
+        conn = duckdb.connect(DB_PATH, read_only=True)
+        
+        # Load with proper time ordering; casts happen in DuckDB, rows arrive via Arrow
+        matrix = build_feature_matrix(conn, ML_DATASET_QUERY)
         conn.close()
+        self.memory_report.record("query -> feature matrix", matrix)
         
-        print(f"✅ Loaded {len(df):,} records")
-        print(f"   Players: {df['player_name'].nunique():,}")
-        print(f"   Date range: {df['season'].min()} to {df['season'].max()}")
-        print(f"   Gameweeks: {df['gameweek'].min()} to {df['gameweek'].max()}")
+        meta = matrix.meta
+        seasons = sorted(meta['season'].unique())
+        print(f"✅ Loaded {len(matrix):,} records")
+        print(f"   Players: {meta['player_name'].nunique():,}")
+        print(f"   Date range: {seasons[0]} to {seasons[-1]}")
+        print(f"   Gameweeks: {meta['gameweek'].min()} to {meta['gameweek'].max()}")
         
-        return df
+        return matrix
     
-    def prepare_features(self, df):
+    def load_features(self, use_cache=True):
+        """Load the prepared feature matrix from the feature store, rebuilding only when the mart changed"""
+        store = FeatureStore(DB_PATH)
+        matrix = store.load_or_build(
+            ML_DATASET_QUERY,
+            lambda: self.prepare_features(self.load_data()),
+            refresh=not use_cache
+        )
+        self.feature_columns = matrix.feature_columns
+        self.snapshot_key = matrix.snapshot_key
+        self.memory_report.record("feature snapshot (mmap)", matrix)
+        return matrix
+    
+    def prepare_features(self, matrix):
         """Prepare features for model training"""
         print("🔧 Preparing features...")
         
-        # Define feature columns (exclude identifiers and target)
-        exclude_cols = ['player_name', 'season', 'gameweek', 'next_gw_points']
-        self.feature_columns = [col for col in df.columns if col not in exclude_cols]
+        self.feature_columns = matrix.feature_columns
         
-        # Handle any remaining missing values
-        X = df[self.feature_columns].copy()
-        y = df['next_gw_points'].copy()
+        # Missing values stay NaN here; fit_imputer() fills them from the training split only
+        missing = int(np.isnan(matrix.numeric).sum())
+        if missing:
+            print(f"   {missing:,} missing values left for the imputer")
         
-        # Fill missing values with median (using pandas methods)
-        for col in self.feature_columns:
-            if X[col].dtype in ['float64', 'int64'] and X[col].isnull().any():
-                median_val = X[col].median()
-                X[col] = X[col].fillna(median_val)
-                print(f"   Filled {X[col].isnull().sum()} missing values in {col}")
-        
-        print(f"✅ Features prepared: {len(self.feature_columns)} features")
+        print(f"✅ Features prepared: {len(self.feature_columns)} features "
+              f"({len(matrix.numeric_columns)} float32, {len(matrix.flag_columns)} uint8)")
         print(f"   Feature list: {self.feature_columns[:5]}..." + 
               (f" and {len(self.feature_columns)-5} more" if len(self.feature_columns) > 5 else ""))
         
-        return X, y, df[['player_name', 'season', 'gameweek']].copy()
+        return matrix
+    
+    def fit_imputer(self, X_train):
+        """Fit median imputation on the training split only"""
+        self.imputer = MedianImputer(self.feature_columns).fit(X_train)
+        for col, count in self.imputer.missing_counts(X_train).items():
+            print(f"   Filled {count} missing values in {col}")
+        return self.imputer.transform(X_train)
     
     def create_time_based_splits(self, df):
         """Create time-based train/validation/test splits"""
@@ -126,9 +172,9 @@ class FPLPredictor:
         val_season = ['2023-24']                           # 1 season for validation  
         test_season = ['2024-25']                          # 1 season for testing
         
-        train_mask = df['season'].isin(train_seasons)
-        val_mask = df['season'].isin(val_season)  
-        test_mask = df['season'].isin(test_season)
+        train_mask = df['season'].isin(train_seasons).to_numpy()
+        val_mask = df['season'].isin(val_season).to_numpy()
+        test_mask = df['season'].isin(test_season).to_numpy()
         
         print(f"   Train: {train_mask.sum():,} records ({train_seasons})")
         print(f"   Validation: {val_mask.sum():,} records ({val_season})")
@@ -137,26 +183,22 @@ class FPLPredictor:
         return train_mask, val_mask, test_mask
     
     def train_baseline_model(self, X_train, y_train, X_val, y_val):
-        """Train RandomForest baseline model"""
-        print("🌳 Training RandomForest model...")
-        
-        # RandomForest with reasonable hyperparameters
-        self.model = RandomForestRegressor(
-            n_estimators=200,
-            max_depth=10,
-            min_samples_split=20,
-            min_samples_leaf=10,
-            random_state=42,
-            n_jobs=-1
-        )
+        """Train the baseline model with the configured backend"""
+        mode = " (one per position: GK/DEF/MID/FWD, plus a pooled fallback)" if self.per_position else ""
+        print(f"🌳 Training {self.backend} model{mode}...")
+        
+        params = self.model_params or load_model_params(self.backend)
+        self.model = create_backend(self.backend, params, self.feature_columns, per_position=self.per_position)
+        if self.model.load_reusable(MODEL_DIR):
+            print("   Reusing feature bins from the previous run")
         
-        # Train the model
-        self.model.fit(X_train, y_train)
+        # Train the model (backends that support it stop early on the validation season)
+        self.model.fit(X_train, y_train, X_val, y_val)
         
         # Get feature importance
         self.feature_importance = pd.DataFrame({
             'feature': self.feature_columns,
-            'importance': self.model.feature_importances_
+            'importance': self.model.feature_importances(X_val, y_val)
         }).sort_values('importance', ascending=False)
         
         # Validation predictions
@@ -184,16 +226,12 @@ class FPLPredictor:
         # Convert to numpy arrays to avoid pandas issues
         y_test_np = np.array(y_test)
         y_pred_np = np.array(y_test_pred)
-        
-        # Basic metrics
-        test_mae = mean_absolute_error(y_test_np, y_pred_np)
-        test_rmse = np.sqrt(mean_squared_error(y_test_np, y_pred_np))
-        test_r2 = r2_score(y_test_np, y_pred_np)
+        metrics = compute_fpl_metrics(y_test_np, y_pred_np)
         
         print(f"\n📈 Test Set Performance:")
-        print(f"   MAE: {test_mae:.3f} points")
-        print(f"   RMSE: {test_rmse:.3f} points")
-        print(f"   R²: {test_r2:.3f}")
+        print(f"   MAE: {metrics['test_mae']:.3f} points")
+        print(f"   RMSE: {metrics['test_rmse']:.3f} points")
+        print(f"   R²: {metrics['test_r2']:.3f}")
         
         # FPL-specific metrics
         print(f"\n⚽ FPL-Specific Analysis:")
@@ -201,69 +239,86 @@ class FPLPredictor:
         # Prediction vs actual distribution
         print(f"   Actual avg: {y_test_np.mean():.2f} ± {y_test_np.std():.2f}")
         print(f"   Predicted avg: {y_pred_np.mean():.2f} ± {y_pred_np.std():.2f}")
-        
-        # Directional accuracy (predicting above/below median performance)
-        actual_median = np.median(y_test_np)
-        pred_median = np.median(y_pred_np)
-        actual_positive = (y_test_np > actual_median).astype(int)
-        pred_positive = (y_pred_np > pred_median).astype(int)
-        directional_acc = np.mean(actual_positive == pred_positive)
-        print(f"   Directional accuracy: {directional_acc:.1%}")
-        
-        # Big haul prediction (10+ points)
-        big_hauls_actual = np.sum(y_test_np >= 10)
-        big_haul_threshold = np.percentile(y_pred_np, 95)
-        big_hauls_pred_top = np.sum(y_pred_np >= big_haul_threshold)
-        big_haul_overlap = np.sum((y_test_np >= 10) & (y_pred_np >= big_haul_threshold))
-        
-        print(f"   Big hauls (10+ pts): {big_hauls_actual} actual")
-        print(f"   Top 5% predictions captured: {big_haul_overlap}/{big_hauls_actual} " + 
-              f"({big_haul_overlap/max(big_hauls_actual,1):.1%})")
+        print(f"   Directional accuracy: {metrics['directional_accuracy']:.1%}")
+        print(f"   Big hauls ({BIG_HAUL_POINTS}+ pts): {metrics['big_hauls']} actual")
+        print(f"   Top 5% predictions captured: {metrics['big_hauls_captured']}/{metrics['big_hauls']} " + 
+              f"({metrics['big_haul_recall']:.1%})")
+        
+        # Breakdowns: by position, by gameweek, and picking the captain by prediction
+        positions = X_test[:, self.feature_columns.index(POSITION_FEATURE)].astype(int)
+        by_position = group_metrics(y_test_np, y_pred_np, positions)
+        by_position['group'] = by_position['group'].map(POSITION_CODES)
+        print_group_metrics(by_position, "👥 By position:")
+        
+        gameweeks = gameweek_codes(meta_test)
+        by_gameweek = group_metrics(y_test_np, y_pred_np, gameweeks)
+        labels = gameweek_labels(meta_test)
+        best, worst = by_gameweek['mae'].idxmin(), by_gameweek['mae'].idxmax()
+        print(f"\n📅 By gameweek: MAE {by_gameweek['mae'][best]:.3f} ({labels[best]}) "
+              f"to {by_gameweek['mae'][worst]:.3f} ({labels[worst]}), "
+              f"median {by_gameweek['mae'].median():.3f}")
+        
+        captaincy = summarize_captaincy(captain_metrics(y_test_np, y_pred_np, gameweeks))
+        print(f"\n©️ Captain by top prediction: {captaincy['captain_points']:.2f} pts/GW "
+              f"({captaincy['captain_share_of_best']:.0%} of the best pick), "
+              f"top scorer in top 1/3/5: {captaincy['hit@1']:.0%}/{captaincy['hit@3']:.0%}/{captaincy['hit@5']:.0%}")
+        
+        bootstrap = PairedBootstrap()
+        print_bootstrap(bootstrap.run(y_test_np, {self.backend: y_pred_np}, gameweeks))
+        metrics.update(captaincy)
         
         # Feature importance
         print(f"\n🎯 Top 10 Most Important Features:")
         for _, row in self.feature_importance.head(10).iterrows():
             print(f"   {row['feature']}: {row['importance']:.3f}")
         
-        return {
-            'test_mae': test_mae,
-            'test_rmse': test_rmse, 
-            'test_r2': test_r2,
-            'directional_accuracy': directional_acc,
-            'big_haul_recall': big_haul_overlap/max(big_hauls_actual,1)
-        }
+        return metrics
     
-    def save_model(self):
-        """Save trained model and metadata"""
-        model_path = MODEL_DIR / "baseline_rf_model.pkl"
+    def save_model(self, metrics=None, training=None):
+        """Save trained model and metadata, and register it as a new version"""
         features_path = MODEL_DIR / "feature_columns.pkl"
         importance_path = MODEL_DIR / "feature_importance.csv"
+        imputer_path = MODEL_DIR / IMPUTATION_STATS_FILE
         
-        joblib.dump(self.model, model_path)
+        model_path = self.model.save(MODEL_DIR)
         joblib.dump(self.feature_columns, features_path) 
         self.feature_importance.to_csv(importance_path, index=False)
+        self.imputer.save(imputer_path)
         
         print(f"💾 Model saved to {model_path}")
+        
+        version = ModelRegistry().register(
+            self.model, self.imputer, metrics or {}, training or {},
+            snapshot_key=self.snapshot_key, feature_importance=self.feature_importance
+        )
+        print(f"🗂️ Registered as version {version.version}")
+        return version
 
-def main():
-    """Main training pipeline"""
-    print("🚀 FPL Baseline Model Training")
-    print("=" * 50)
+def run_training(backend=DEFAULT_BACKEND, per_position=False):
+    """Load features, train, evaluate, save and register; returns test metrics and the registered version"""
+    warnings.filterwarnings('ignore')
+    MODEL_DIR.mkdir(exist_ok=True)
     
     # Initialize predictor
-    predictor = FPLPredictor()
+    predictor = FPLPredictor(backend=backend, per_position=per_position)
     
-    # Load and prepare data
-    df = predictor.load_data()
-    X, y, meta = predictor.prepare_features(df)
+    # Load prepared data (cached until dbt rebuilds the mart)
+    matrix = predictor.load_features()
     
     # Create time-based splits
-    train_mask, val_mask, test_mask = predictor.create_time_based_splits(df)
+    train_mask, val_mask, test_mask = predictor.create_time_based_splits(matrix.meta)
+    
+    # float32 straight into sklearn: Fortran order for fitting, C order for scoring
+    X_train, y_train = matrix.to_float32(train_mask), matrix.target(train_mask)
+    X_val, y_val = matrix.to_float32(val_mask, order='C'), matrix.target(val_mask)
+    X_test, y_test = matrix.to_float32(test_mask, order='C'), matrix.target(test_mask)
+    meta_test = matrix.meta[test_mask]
     
-    X_train, y_train = X[train_mask], y[train_mask]
-    X_val, y_val = X[val_mask], y[val_mask]
-    X_test, y_test = X[test_mask], y[test_mask]
-    meta_test = meta[test_mask]
+    # Medians come from the training seasons only, then fill val/test the same way scoring will
+    X_train = predictor.fit_imputer(X_train)
+    X_val = predictor.imputer.transform(X_val)
+    X_test = predictor.imputer.transform(X_test)
+    predictor.memory_report.record("train/val/test matrices", X_train, y_train, X_val, y_val, X_test, y_test)
     
     # Train model
     val_metrics = predictor.train_baseline_model(X_train, y_train, X_val, y_val)
@@ -271,8 +326,30 @@ def main():
     # Evaluate model
     test_metrics = predictor.evaluate_model(X_test, y_test, meta_test)
     
+    predictor.memory_report.record("after training")
+    
     # Save model
-    predictor.save_model()
+    training = {
+        'rows': int(len(y_train)),
+        'validation_rows': int(len(y_val)),
+        'seasons': sorted(matrix.meta['season'][train_mask].unique()),
+    }
+    version = predictor.save_model({'val_mae': val_metrics[0], **test_metrics}, training)
+    predictor.memory_report.print_report()
+    return test_metrics, version
+
+def main():
+    """Main training pipeline"""
+    parser = argparse.ArgumentParser(description="Train the FPL points baseline model")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--per-position", action="store_true",
+                        help="Train one model per position and route rows by position_encoded")
+    args = parser.parse_args()
+    
+    print("🚀 FPL Baseline Model Training")
+    print("=" * 50)
+    
+    test_metrics, _ = run_training(args.backend, args.per_position)
     
     print("\n" + "=" * 50)
     print("✅ Baseline Model Training Complete!")
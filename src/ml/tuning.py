@@ -0,0 +1,286 @@
+"""
+Budgeted Hyperparameter Search for FPL Points Prediction
+Successive halving on the time-based splits, with a wall-clock budget and on-disk resume
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import joblib
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import ParameterSampler
+
+from src.ml.features import FeatureStore, MedianImputer
+from src.ml.models import create_backend
+from src.ml.train_baseline import DB_PATH, ML_DATASET_QUERY, MODEL_DIR, TUNED_PARAMS_PATH, FPLPredictor
+
+# Configuration
+TUNING_DIR = MODEL_DIR / "tuning"
+DEFAULT_BUDGET_SECONDS = 600
+DEFAULT_CANDIDATES = 27
+DEFAULT_ETA = 3
+
+# Each backend's search space, and the parameter successive halving grows as its resource.
+# Candidates are built with create_backend, so they see the same inputs training does
+# (the boosting backend's uint8 bin codes, not raw floats).
+SEARCH_SPACES = {
+    'random_forest': {
+        'fixed': {'random_state': 42, 'n_jobs': -1},
+        'resource': 'n_estimators',
+        'min_resource': 25,
+        'max_resource': 300,
+        'space': {
+            'max_depth': [6, 8, 10, 12, 16, None],
+            'min_samples_split': [2, 10, 20, 50],
+            'min_samples_leaf': [1, 5, 10, 20, 40],
+            'max_features': [1.0, 0.5, 0.33, 'sqrt'],
+        },
+    },
+    # Boosting rounds are the resource, so early stopping is off and warm_start adds rounds
+    'hist_gradient_boosting': {
+        'fixed': {'random_state': 42, 'early_stopping': False},
+        'resource': 'max_iter',
+        'min_resource': 20,
+        'max_resource': 540,
+        'space': {
+            'learning_rate': [0.02, 0.05, 0.1, 0.2],
+            'max_leaf_nodes': [15, 31, 63],
+            'min_samples_leaf': [20, 50, 100, 200],
+            'l2_regularization': [0.0, 0.1, 1.0],
+        },
+    },
+}
+
+
+def candidate_id(params: dict) -> str:
+    """Stable short id for a parameter set"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:10]
+
+
+class SuccessiveHalvingSearch:
+    """Successive halving whose rungs, fitted models and scores survive restarts"""
+
+    def __init__(self, estimator: str = 'random_forest', n_candidates: int = DEFAULT_CANDIDATES,
+                 eta: int = DEFAULT_ETA, budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+                 seed: int = 42):
+        if estimator not in SEARCH_SPACES:
+            raise ValueError(f"Unknown estimator '{estimator}' (choose from {', '.join(SEARCH_SPACES)})")
+        self.estimator = estimator
+        self.spec = SEARCH_SPACES[estimator]
+        self.n_candidates = n_candidates
+        self.eta = eta
+        self.budget_seconds = budget_seconds
+        self.seed = seed
+        self.state = None
+        self.search_dir = None
+
+    def rung_resources(self):
+        """Resource per rung: min_resource * eta^k, capped at max_resource"""
+        resources = []
+        resource = self.spec['min_resource']
+        survivors = self.n_candidates
+        while survivors >= 1:
+            resources.append(min(resource, self.spec['max_resource']))
+            if survivors == 1 or resource >= self.spec['max_resource']:
+                break
+            survivors = math.ceil(survivors / self.eta)
+            resource *= self.eta
+        return resources
+
+    def load_splits(self):
+        """Training and validation seasons from the cached feature snapshot"""
+        store = FeatureStore(DB_PATH)
+        key = store.current_key(ML_DATASET_QUERY)
+        predictor = FPLPredictor()
+        matrix = store.load_or_build(ML_DATASET_QUERY, lambda: predictor.prepare_features(predictor.load_data()))
+        train_mask, val_mask, _ = predictor.create_time_based_splits(matrix.meta)
+
+        X_train, y_train = matrix.to_float32(train_mask), matrix.target(train_mask)
+        X_val, y_val = matrix.to_float32(val_mask, order='C'), matrix.target(val_mask)
+        imputer = MedianImputer(matrix.feature_columns).fit(X_train)
+        imputer.transform(X_train)
+        imputer.transform(X_val)
+        return key, matrix.feature_columns, X_train, np.asarray(y_train), X_val, np.asarray(y_val)
+
+    def open_search(self, snapshot_key: str):
+        """Resume the search for this space and data snapshot, or start a new one"""
+        # The id covers everything that changes results, so a rebuilt mart starts afresh
+        search_id = candidate_id({
+            'estimator': self.estimator, 'space': self.spec['space'], 'n': self.n_candidates,
+            'eta': self.eta, 'seed': self.seed, 'data': snapshot_key,
+            'resources': [self.spec['min_resource'], self.spec['max_resource']],
+            'fitted_as': 'backend',
+        })
+        self.search_dir = TUNING_DIR / search_id
+        state_path = self.search_dir / "state.json"
+        if state_path.exists():
+            self.state = json.loads(state_path.read_text())
+            print(f"♻️ Resuming search {search_id}: {len(self.state['results'])} evaluations cached")
+            return
+
+        sampler = ParameterSampler(self.spec['space'], n_iter=self.n_candidates, random_state=self.seed)
+        candidates = {}
+        for params in sampler:
+            candidates.setdefault(candidate_id(params), params)
+        self.state = {
+            'search_id': search_id,
+            'estimator': self.estimator,
+            'snapshot_key': snapshot_key,
+            'candidates': candidates,
+            'results': [],
+            'elapsed_seconds': 0.0,
+            'status': 'running',
+        }
+        (self.search_dir / "models").mkdir(parents=True, exist_ok=True)
+        self.save_state()
+        print(f"🆕 Started search {search_id} with {len(candidates)} candidates")
+
+    def save_state(self):
+        """Write state atomically so a kill mid-write cannot corrupt it"""
+        tmp_path = self.search_dir / "state.json.tmp"
+        tmp_path.write_text(json.dumps(self.state, indent=2, default=str))
+        os.replace(tmp_path, self.search_dir / "state.json")
+
+    def model_path(self, cid: str) -> Path:
+        """Latest fitted model for a candidate; grown in place rung by rung"""
+        return self.search_dir / "models" / f"{cid}.joblib"
+
+    def result_for(self, cid: str, resource: int) -> Optional[dict]:
+        """Cached evaluation of a candidate at a resource level"""
+        for result in self.state['results']:
+            if result['candidate'] == cid and result['resource'] == resource:
+                return result
+        return None
+
+    def fit_candidate(self, cid: str, resource: int, feature_columns, X_train, y_train):
+        """Fit a candidate's backend up to `resource`, growing its previous rung when cached"""
+        path = self.model_path(cid)
+        if path.exists():
+            backend = joblib.load(path)
+            # grow adds only the missing trees or rounds; earlier ones are reused as-is
+            fitted = backend.model.get_params()[self.spec['resource']]
+            backend.grow(X_train, y_train, amount=resource - fitted)
+        else:
+            params = dict(self.state['candidates'][cid], **self.spec['fixed'])
+            params[self.spec['resource']] = resource
+            backend = create_backend(self.estimator, params, feature_columns).fit(X_train, y_train)
+        joblib.dump(backend, path)
+        return backend
+
+    def run(self) -> Optional[dict]:
+        """Run (or resume) the search until it finishes or the budget runs out"""
+        snapshot_key, feature_columns, X_train, y_train, X_val, y_val = self.load_splits()
+        self.open_search(snapshot_key)
+
+        resources = self.rung_resources()
+        print(f"🎯 Successive halving: rungs at {self.spec['resource']}={resources}, "
+              f"budget {self.budget_seconds:.0f}s")
+
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        survivors = list(self.state['candidates'])
+        seconds_per_unit = None  # fit cost per unit of resource, learned as we go
+
+        for rung, resource in enumerate(resources):
+            print(f"\n🪜 Rung {rung}: {len(survivors)} candidate(s) at {self.spec['resource']}={resource}")
+            for cid in survivors:
+                if self.result_for(cid, resource):
+                    continue
+
+                previous = self.result_for(cid, resources[rung - 1]) if rung else None
+                added = resource - (previous['resource'] if previous else 0)
+                projected = seconds_per_unit * added if seconds_per_unit else 0.0
+                if time.perf_counter() - start + projected > self.budget_seconds:
+                    return self.finish('budget_exhausted', start, cpu_start)
+
+                fit_start = time.perf_counter()
+                backend = self.fit_candidate(cid, resource, feature_columns, X_train, y_train)
+                fit_seconds = time.perf_counter() - fit_start
+                val_mae = mean_absolute_error(y_val, backend.predict(X_val))
+                seconds_per_unit = fit_seconds / max(added, 1)
+
+                self.state['results'].append({
+                    'candidate': cid, 'rung': rung, 'resource': resource,
+                    'val_mae': float(val_mae), 'fit_seconds': fit_seconds,
+                })
+                self.save_state()
+                print(f"   {cid} {self.state['candidates'][cid]} -> MAE {val_mae:.4f} ({fit_seconds:.1f}s)")
+
+            # Keep the best 1/eta; drop the eliminated candidates' cached models
+            ranked = sorted(survivors, key=lambda c: self.result_for(c, resource)['val_mae'])
+            keep = max(1, math.ceil(len(ranked) / self.eta))
+            for cid in ranked[keep:]:
+                self.model_path(cid).unlink(missing_ok=True)
+            survivors = ranked[:keep] if rung < len(resources) - 1 else ranked[:1]
+
+        return self.finish('complete', start, cpu_start)
+
+    def best(self) -> Optional[dict]:
+        """Best candidate at the highest rung reached
+
+        The resource it was scored at is reported beside its params, not in them:
+        it is the search's budget knob, and training keeps its own setting.
+        """
+        if not self.state['results']:
+            return None
+        top_rung = max(r['rung'] for r in self.state['results'])
+        best = min((r for r in self.state['results'] if r['rung'] == top_rung), key=lambda r: r['val_mae'])
+        return {'estimator': self.estimator, 'params': dict(self.state['candidates'][best['candidate']]),
+                'val_mae': best['val_mae'], 'rung': best['rung'],
+                'resource': {self.spec['resource']: best['resource']}, 'search_id': self.state['search_id']}
+
+    def finish(self, status: str, start: float, cpu_start: float) -> Optional[dict]:
+        """Record run time and status; a completed search saves its winner's parameters"""
+        wall = time.perf_counter() - start
+        self.state['elapsed_seconds'] += wall
+        self.state['status'] = status
+        self.save_state()
+
+        best = self.best()
+        print(f"\n⏱️ {status.replace('_', ' ')}: {wall:.1f}s wall, {time.process_time() - cpu_start:.1f}s CPU "
+              f"this run, {self.state['elapsed_seconds']:.1f}s in total")
+        if best is None:
+            print("⚠️ Budget too small to evaluate any candidate")
+            return None
+
+        print(f"🏆 Best (rung {best['rung']}, {best['resource']}): MAE {best['val_mae']:.4f} with {best['params']}")
+        if status != 'complete':
+            # A low rung's leader is not a search result, so training keeps its current params
+            print("   Not saved until the search completes; run again to resume where it stopped")
+            return best
+
+        # The winner's cached forest is no longer needed once its params are saved
+        shutil.rmtree(self.search_dir / "models", ignore_errors=True)
+        TUNED_PARAMS_PATH.write_text(json.dumps(best, indent=2))
+        print(f"💾 Saved to {TUNED_PARAMS_PATH}")
+        return best
+
+
+def main():
+    """Run or resume a budgeted search from the command line"""
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search")
+    parser.add_argument("--estimator", choices=list(SEARCH_SPACES), default='random_forest')
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Wall-clock seconds for this run")
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument("--eta", type=int, default=DEFAULT_ETA)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    search = SuccessiveHalvingSearch(estimator=args.estimator, n_candidates=args.candidates,
+                                     eta=args.eta, budget_seconds=args.budget, seed=args.seed)
+    search.run()
+
+
+if __name__ == "__main__":
+    main()
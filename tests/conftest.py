@@ -0,0 +1,80 @@
+"""
+Shared fixtures: a local HTTP stand-in for the remote data sources
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Tuple
+
+import pytest
+
+# respond(path, headers) -> (status, response headers, body)
+Responder = Callable[[str, dict], Tuple[int, dict, bytes]]
+
+
+class LocalServer:
+    """Threaded HTTP/1.1 server on a free port, answering from a responder function"""
+
+    def __init__(self, respond: Responder):
+        self.respond = respond
+        self.requests: List[dict] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+            def _handle(self, send_body: bool):
+                headers = dict(self.headers.items())
+                with server._lock:
+                    server.requests.append({'method': self.command, 'path': self.path,
+                                            'headers': headers, 'client': self.client_address})
+                status, response_headers, body = server.respond(self.path, headers)
+                self.send_response(status)
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._handle(send_body=True)
+
+            def do_HEAD(self):
+                self._handle(send_body=False)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def paths(self, method: str = "GET") -> List[str]:
+        """Paths requested with `method`, in arrival order"""
+        return [r['path'] for r in self.requests if r['method'] == method]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def local_server():
+    """Start a LocalServer for a responder; stopped when the test ends"""
+    servers = []
+
+    def start(respond: Responder) -> LocalServer:
+        server = LocalServer(respond).__enter__()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
@@ -0,0 +1,142 @@
+"""
+FPLAPILoader against recorded FPL API responses served from a local HTTP stand-in
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pytest
+
+from src.ingestion.api_loader import CHECKPOINT_MAX_AGE, FPLAPILoader
+from src.ingestion.data_exploration import FPLDataLoader
+from src.ingestion.parquet_lake import fixtures_path
+from src.ingestion.schemas import conform_frame
+
+RECORDED = Path(__file__).parent / "data" / "fpl_api"
+# Recorded mid-gameweek: GW1-2 are finished (only GW1 signed off), GW3 is being played
+SEASON = "2024-25"
+
+EXPECTED_ROWS = [
+    ('Bukayo Saka', 'MID', 'Arsenal', 1, 2, 4, True, 10, 85, pytest.approx(48.2)),
+    ('David Raya Martin', 'GK', 'Arsenal', 1, 2, 4, True, 6, 90, pytest.approx(22.4)),
+    ('Ollie Watkins', 'FWD', 'Aston Villa', 1, 7, 3, False, 7, 90, pytest.approx(35.6)),
+    ('Bukayo Saka', 'MID', 'Arsenal', 2, 12, 2, False, 3, 90, pytest.approx(12.6)),
+    ('David Raya Martin', 'GK', 'Arsenal', 2, 12, 2, False, 7, 90, pytest.approx(31.0)),
+    ('Ollie Watkins', 'FWD', 'Aston Villa', 2, 12, 1, True, 1, 67, pytest.approx(3.4)),
+]
+
+
+def recorded_api(failing: set):
+    """Responder serving the recorded endpoints; element ids in `failing` answer 404"""
+    def respond(path, headers):
+        endpoint, *rest = path.strip("/").split("/")
+        if endpoint == "element-summary":
+            if int(rest[0]) in failing:
+                return 404, {}, b"not found"
+            file = RECORDED / endpoint / f"{rest[0]}.json"
+        else:
+            file = RECORDED / f"{endpoint}.json"
+        if not file.exists():
+            return 404, {}, b"not found"
+        return 200, {"Content-Type": "application/json"}, file.read_bytes()
+    return respond
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A table-storage warehouse holding an earlier season, as the historical loader leaves it"""
+    path = str(tmp_path / "fpl.db")
+    row = json.loads((RECORDED / "element-summary" / "2.json").read_text())['history'][0]
+    earlier = conform_frame(pa.Table.from_pylist([row]).to_pandas().assign(
+        name="Bukayo Saka", position="MID", team="Arsenal", GW=38), "2023-24")
+    FPLDataLoader(database_path=path, cache_dir=None, storage="table").stream_to_database(
+        iter([pa.Table.from_pandas(earlier, preserve_index=False)]))
+    return path
+
+
+def lake_dir(database: str) -> str:
+    """Lake beside the test warehouse, where the fixture list is exported"""
+    return str(Path(database).parent / "lake" / "player_gameweeks")
+
+
+def run_refresh(server, database: str, checkpoint_dir: Path) -> int:
+    loader = FPLAPILoader(base_url=server.url, database_path=database, checkpoint_dir=str(checkpoint_dir),
+                          max_concurrency=2, requests_per_second=1000, storage="table",
+                          lake_dir=lake_dir(database))
+    try:
+        return loader.run_gameweek_refresh()
+    finally:
+        loader.close()
+
+
+def loaded_rows(database: str) -> list:
+    conn = duckdb.connect(database, read_only=True)
+    try:
+        return conn.execute("""
+        SELECT name, position, team, GW, fixture, opponent_team, was_home, total_points, minutes, influence
+        FROM player_gameweeks
+        WHERE season = ?
+        ORDER BY GW, name
+        """, [SEASON]).fetchall()
+    finally:
+        conn.close()
+
+
+def test_refresh_loads_finished_gameweeks(local_server, database, tmp_path):
+    server = local_server(recorded_api(failing=set()))
+
+    assert run_refresh(server, database, tmp_path / "checkpoints") == len(EXPECTED_ROWS)
+    # The element summaries also hold live GW3 scores, which must not be stored
+    assert loaded_rows(database) == EXPECTED_ROWS
+
+    conn = duckdb.connect(database, read_only=True)
+    try:
+        assert conn.execute("SELECT COUNT(*), COUNT(gameweek) FROM api_fixtures").fetchone() == (7, 6)
+        # dbt reads upcoming fixtures from the copy exported beside the lake
+        exported = f"read_parquet('{fixtures_path(lake_dir(database)).as_posix()}')"
+        assert conn.execute(f"SELECT COUNT(*), COUNT(*) FILTER (NOT finished) FROM {exported}").fetchone() == (7, 3)
+    finally:
+        conn.close()
+
+
+def test_interrupted_refresh_resumes_from_checkpoints(local_server, database, tmp_path):
+    failing = {3}
+    server = local_server(recorded_api(failing))
+    checkpoints = tmp_path / "checkpoints"
+
+    with pytest.raises(RuntimeError, match="1 of 3 element-summary requests failed"):
+        run_refresh(server, database, checkpoints)
+    assert sorted(p.name for p in (checkpoints / SEASON / "gw2").iterdir()) == ["element_1.json", "element_2.json"]
+    assert loaded_rows(database) == []
+
+    failing.clear()
+    first_run = len(server.requests)
+    assert run_refresh(server, database, checkpoints) == len(EXPECTED_ROWS)
+    summaries = [p for p in server.paths()[first_run:] if p.startswith("/element-summary")]
+    assert summaries == ["/element-summary/3/"]
+    assert loaded_rows(database) == EXPECTED_ROWS
+
+
+def test_stale_checkpoints_are_refetched_until_the_gameweek_is_final(local_server, database, tmp_path):
+    server = local_server(recorded_api(failing=set()))
+    checkpoints = tmp_path / "checkpoints"
+    superseded = checkpoints / "2023-24" / "gw38"
+    superseded.mkdir(parents=True)
+    (superseded / "element_1.json").write_text("{}")
+
+    run_refresh(server, database, checkpoints)
+    assert not (checkpoints / "2023-24").exists()
+
+    # GW2 is not signed off yet, so its checkpoints expire and corrections get fetched
+    stale = time.time() - CHECKPOINT_MAX_AGE - 60
+    for path in (checkpoints / SEASON / "gw2").iterdir():
+        os.utime(path, (stale, stale))
+    first_run = len(server.requests)
+    run_refresh(server, database, checkpoints)
+    summaries = [p for p in server.paths()[first_run:] if p.startswith("/element-summary")]
+    assert sorted(summaries) == ["/element-summary/1/", "/element-summary/2/", "/element-summary/3/"]
+    assert loaded_rows(database) == EXPECTED_ROWS
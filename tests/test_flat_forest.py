@@ -0,0 +1,93 @@
+"""
+FlatForest and compiled-backend scoring against sklearn, on synthetic rows with NaNs
+and, where the warehouse exists, on the real feature matrix
+"""
+
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from src.ml.features import MedianImputer, build_feature_matrix
+from src.ml.flat_forest import FlatForest
+from src.ml.models import BASELINE_HGB_PARAMS, BASELINE_RF_PARAMS, create_backend
+from src.ml.train_baseline import DB_PATH, ML_DATASET_QUERY
+
+# Small versions of the baselines; n_jobs=1 because only sklearn's single-threaded sum
+# is reproducible to the last bit
+BACKEND_PARAMS = {
+    'random_forest': dict(BASELINE_RF_PARAMS, n_estimators=25, n_jobs=1),
+    'hist_gradient_boosting': dict(BASELINE_HGB_PARAMS, max_iter=30, early_stopping=False),
+}
+
+
+def make_rows(n: int = 2000, n_features: int = 6, seed: int = 0):
+    """Float32 features with about 15% NaNs, and a target that depends on whether a value is missing"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features)).astype(np.float32)
+    X[rng.random(X.shape) < 0.15] = np.nan
+    y = np.where(np.isnan(X[:, 0]), 3.0, X[:, 0]) + np.nan_to_num(X[:, 1]) + rng.normal(scale=0.1, size=n)
+    return X, y
+
+
+def test_predictions_with_missing_values_match_sklearn_exactly(tmp_path):
+    X, y = make_rows()
+    model = RandomForestRegressor(**BACKEND_PARAMS['random_forest']).fit(X, y)
+
+    FlatForest.from_sklearn(model).save(tmp_path / "forest.npz")
+    forest = FlatForest.load(tmp_path / "forest.npz")
+    # Splits learned on NaNs send them both ways, so both sides of the missing_left test are used
+    assert forest.missing_left.any() and not forest.missing_left.all()
+
+    X_test, _ = make_rows(500, seed=1)
+    np.testing.assert_array_equal(forest.predict(X_test), model.predict(X_test))
+
+
+@pytest.mark.parametrize('backend_name', list(BACKEND_PARAMS))
+def test_compiled_backend_matches_fitted_model(backend_name, tmp_path):
+    X, y = make_rows()
+    backend = create_backend(backend_name, BACKEND_PARAMS[backend_name], [f'f{i}' for i in range(X.shape[1])])
+    backend.fit(X, y)
+    backend.save(tmp_path)
+
+    compiled = create_backend(backend_name, BACKEND_PARAMS[backend_name]).load_compiled(tmp_path)
+    X_test, _ = make_rows(500, seed=1)
+    np.testing.assert_array_equal(compiled.predict(X_test), backend.predict(X_test))
+
+
+@pytest.fixture(scope="module")
+def features():
+    """Imputed float32 matrix and target, as the trainer and scorer see them
+
+    Skips unless a readable warehouse is present. It is built locally and not tracked,
+    and its views read lake paths that only exist where it was built.
+    """
+    if not Path(DB_PATH).exists():
+        pytest.skip(f"needs the warehouse at {DB_PATH}")
+    conn = duckdb.connect(DB_PATH, read_only=True)
+    try:
+        matrix = build_feature_matrix(conn, ML_DATASET_QUERY)
+    except duckdb.Error as e:
+        pytest.skip(f"warehouse at {DB_PATH} cannot be read here: {e}")
+    finally:
+        conn.close()
+    if len(matrix) == 0:
+        pytest.skip(f"warehouse at {DB_PATH} has no training rows")
+    X = matrix.to_float32(order='C')
+    MedianImputer(matrix.feature_columns).fit(X).transform(X)
+    return X, np.asarray(matrix.target())
+
+
+def test_predictions_match_sklearn_exactly(features, tmp_path):
+    X, y = features
+    model = RandomForestRegressor(**dict(BASELINE_RF_PARAMS, n_estimators=25)).fit(X, y)
+    # With n_jobs > 1 sklearn adds the trees' outputs in whatever order its threads finish,
+    # so only its single-threaded sum is reproducible to the last bit
+    expected = model.set_params(n_jobs=1).predict(X)
+
+    FlatForest.from_sklearn(model).save(tmp_path / "forest.npz")
+    forest = FlatForest.load(tmp_path / "forest.npz")
+
+    np.testing.assert_array_equal(forest.predict(X), expected)
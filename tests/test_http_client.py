@@ -0,0 +1,113 @@
+"""
+ConcurrentFetcher and RawFileCache against a local HTTP stand-in
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from src.ingestion.http_client import ConcurrentFetcher
+from src.ingestion.raw_cache import RawFileCache
+
+
+def test_retries_5xx_until_success(local_server):
+    attempts = {'count': 0}
+
+    def respond(path, headers):
+        attempts['count'] += 1
+        if attempts['count'] <= 2:
+            return 503, {}, b"busy"
+        return 200, {}, b"season data"
+
+    server = local_server(respond)
+    fetcher = ConcurrentFetcher(max_workers=1, retries=3, backoff_factor=0)
+
+    assert fetcher.get_bytes(f"{server.url}/merged_gw.csv") == b"season data"
+    assert attempts['count'] == 3
+
+
+def test_gives_up_after_retries(local_server):
+    server = local_server(lambda path, headers: (500, {}, b"down"))
+    fetcher = ConcurrentFetcher(max_workers=1, retries=2, backoff_factor=0)
+
+    with pytest.raises(requests.HTTPError):
+        fetcher.get_bytes(f"{server.url}/merged_gw.csv")
+    assert len(server.paths()) == 3  # first try plus two retries
+
+
+def test_conditional_get_reuses_cached_copy(local_server, tmp_path):
+    body, etag = b"name,GW\nSalah,1\n", '"v1"'
+
+    def respond(path, headers):
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag}, body
+
+    server = local_server(respond)
+    cache = RawFileCache(str(tmp_path / "cache"))
+    fetcher = ConcurrentFetcher(max_workers=1, cache=cache)
+    url = f"{server.url}/2024-25/gws/gw1.csv"
+
+    assert fetcher.get_bytes(url) == body
+    assert fetcher.get_bytes(url) == body
+    assert fetcher.stats['downloads'] == 1
+    assert fetcher.stats['revalidated'] == 1
+    assert server.requests[1]['headers'].get("If-None-Match") == etag
+
+
+def test_immutable_files_skip_the_network(local_server, tmp_path):
+    server = local_server(lambda path, headers: (200, {}, b"closed season"))
+    fetcher = ConcurrentFetcher(max_workers=1, cache=RawFileCache(str(tmp_path / "cache")))
+    url = f"{server.url}/2020-21/gws/merged_gw.csv"
+
+    fetcher.get_bytes(url, immutable=True)
+    assert fetcher.get_bytes(url, immutable=True) == b"closed season"
+    assert len(server.paths()) == 1
+    assert fetcher.stats['cache_hits'] == 1
+
+
+def test_cache_hits_do_not_rewrite_the_index(tmp_path):
+    cache = RawFileCache(str(tmp_path / "cache"))
+    cache.store("http://example/a.csv", b"a")
+    written = cache.index_path.stat().st_mtime_ns
+    before = cache.index["http://example/a.csv"]["last_access"]
+
+    time.sleep(0.01)
+    for _ in range(5):
+        assert cache.read("http://example/a.csv") == b"a"
+    assert cache.index_path.stat().st_mtime_ns == written
+
+    # Access times reach disk on flush, so LRU order survives a restart
+    cache.flush()
+    assert RawFileCache(str(tmp_path / "cache")).index["http://example/a.csv"]["last_access"] > before
+
+
+def test_requests_run_concurrently_over_pooled_connections(local_server):
+    delay, workers, n_files = 0.2, 4, 12
+    in_flight = {'now': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    def respond(path, headers):
+        with lock:
+            in_flight['now'] += 1
+            in_flight['peak'] = max(in_flight['peak'], in_flight['now'])
+        time.sleep(delay)
+        with lock:
+            in_flight['now'] -= 1
+        return 200, {}, path.encode()
+
+    server = local_server(respond)
+    fetcher = ConcurrentFetcher(max_workers=workers)
+    urls = [f"{server.url}/gw{gw}.csv" for gw in range(1, n_files + 1)]
+
+    start = time.perf_counter()
+    results = fetcher.map(fetcher.get_bytes, urls)
+    elapsed = time.perf_counter() - start
+
+    assert [results[url] for url in urls] == [f"/gw{gw}.csv".encode() for gw in range(1, n_files + 1)]
+    assert in_flight['peak'] == workers
+    assert elapsed < n_files * delay / 2
+    # Keep-alive: the pool opens at most one connection per worker and reuses them
+    assert len({r['client'] for r in server.requests}) <= workers
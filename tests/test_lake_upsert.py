@@ -0,0 +1,76 @@
+"""
+Incremental upserts into the partitioned Parquet lake
+"""
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.ingestion import data_exploration
+from src.ingestion.data_exploration import FPLDataLoader
+from src.ingestion.parquet_lake import fixtures_path, watermark_path
+from src.ingestion.schemas import FIXTURE_COLUMNS
+
+
+def gameweek_frame(points: dict) -> pd.DataFrame:
+    """Two players per gameweek, scoring `points[gw]` each"""
+    rows = [{'season': '2024-25', 'GW': gw, 'name': name, 'team': 'Arsenal', 'position': 'MID',
+             'total_points': value}
+            for gw, value in points.items() for name in ('Saka', 'Odegaard')]
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def loader(tmp_path):
+    loader = FPLDataLoader(database_path=str(tmp_path / "fpl.db"), cache_dir=None, storage="lake",
+                           lake_dir=str(tmp_path / "lake"))
+    loader.write_to_lake(iter([pa.Table.from_pandas(gameweek_frame({1: 2, 2: 3}), preserve_index=False)]))
+    return loader
+
+
+def stored(loader) -> dict:
+    """Points per gameweek as read through the view, plus the watermarked gameweeks"""
+    conn = duckdb.connect(loader.database_path, read_only=True)
+    try:
+        points = dict(conn.execute("SELECT GW, MAX(total_points) FROM player_gameweeks GROUP BY GW").fetchall())
+        marked = {gw for (gw,) in conn.execute("SELECT GW FROM load_watermarks").fetchall()}
+        # dbt reads the copy exported beside the lake, which must match the table
+        exported = {gw for (gw,) in conn.execute(
+            f"SELECT GW FROM read_parquet('{watermark_path(loader.lake_dir).as_posix()}')").fetchall()}
+    finally:
+        conn.close()
+    assert exported == marked
+    return {'points': points, 'watermarks': marked}
+
+
+def test_upsert_rewrites_only_changed_partitions(loader):
+    assert loader.upsert_changed_partitions(gameweek_frame({1: 2, 2: 9, 3: 4})) == 4
+    assert stored(loader) == {'points': {1: 2, 2: 9, 3: 4}, 'watermarks': {1, 2, 3}}
+    assert loader.upsert_changed_partitions(gameweek_frame({1: 2, 2: 9, 3: 4})) == 0
+
+
+def test_failed_swap_keeps_old_partitions_and_watermarks(loader, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(data_exploration, "replace_partitions", fail)
+    with pytest.raises(OSError):
+        loader.upsert_changed_partitions(gameweek_frame({1: 2, 2: 9}))
+
+    assert stored(loader) == {'points': {1: 2, 2: 3}, 'watermarks': {1, 2}}
+    # The next run still sees GW2 as changed and retries it
+    monkeypatch.undo()
+    assert loader.upsert_changed_partitions(gameweek_frame({1: 2, 2: 9})) == 2
+    assert stored(loader)['points'] == {1: 2, 2: 9}
+
+
+def test_lake_load_exports_an_empty_fixture_list(loader):
+    # dbt's api_fixtures source must resolve before the API loader has ever run
+    exported = f"read_parquet('{fixtures_path(loader.lake_dir).as_posix()}')"
+    conn = duckdb.connect()
+    try:
+        assert [row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {exported}").fetchall()] == list(FIXTURE_COLUMNS)
+        assert conn.execute(f"SELECT COUNT(*) FROM {exported}").fetchone() == (0,)
+    finally:
+        conn.close()
@@ -0,0 +1,69 @@
+"""
+PositionRouter routing, the on-demand pooled fallback and incremental growth
+"""
+
+import numpy as np
+import pytest
+
+from src.ml.models import POOLED_CODE, POSITION_FEATURE, PositionRouter
+
+FEATURES = ['avg_points_5gw', POSITION_FEATURE]
+PARAMS = {'n_estimators': 5, 'max_depth': 3, 'random_state': 0, 'n_jobs': 1}
+
+
+def make_rows(positions, n_per_position: int = 50, seed: int = 0):
+    """Rows whose target is the position code plus noise, so each model learns its own level"""
+    rng = np.random.default_rng(seed)
+    codes = np.repeat(positions, n_per_position).astype(np.float32)
+    X = np.column_stack([rng.random(len(codes), dtype=np.float32), codes])
+    return X, codes + rng.normal(0, 0.1, len(codes))
+
+
+def make_router() -> PositionRouter:
+    return PositionRouter('random_forest', PARAMS, FEATURES, min_position_rows=20)
+
+
+def test_no_pooled_model_when_every_position_has_enough_rows():
+    router = make_router().fit(*make_rows([1, 2, 3, 4]))
+    # Only the four position models are trained; the pooled one would double the cost
+    assert sorted(router.models) == [1, 2, 3, 4]
+    assert router.train_rows == {1: 50, 2: 50, 3: 50, 4: 50}
+
+    X, _ = make_rows([0], n_per_position=2)
+    with pytest.raises(ValueError, match="no pooled model"):
+        router.predict(X)
+
+
+def test_small_and_unknown_positions_use_the_pooled_model():
+    X, y = make_rows([1, 2, 3])
+    X_small, y_small = make_rows([4], n_per_position=5, seed=1)
+    router = make_router().fit(np.vstack([X, X_small]), np.concatenate([y, y_small]))
+    assert sorted(router.models) == [POOLED_CODE, 1, 2, 3]
+    assert router.train_rows[POOLED_CODE] == 155
+
+    X, _ = make_rows([0, 4, 3], n_per_position=2)
+    predicted = router.predict(X)
+    np.testing.assert_array_equal(predicted[:4], router.models[POOLED_CODE].predict(X[:4]))
+    np.testing.assert_array_equal(predicted[4:], router.models[3].predict(X[4:]))
+
+
+def test_positions_missing_from_training_fall_back_to_the_pooled_model():
+    router = make_router().fit(*make_rows([1, 2, 3]))
+    assert sorted(router.models) == [POOLED_CODE, 1, 2, 3]
+    X, _ = make_rows([4], n_per_position=3)
+    np.testing.assert_array_equal(router.predict(X), router.models[POOLED_CODE].predict(X))
+
+
+def test_grow_skips_positions_missing_from_the_new_rows():
+    router = make_router().fit(*make_rows([1, 2, 3]))
+    router.grow(*make_rows([2, 3, 4], n_per_position=10, seed=1), amount=2)
+
+    trees = {code: len(model.model.estimators_) for code, model in router.models.items()}
+    assert trees == {POOLED_CODE: 7, 1: 5, 2: 7, 3: 7}
+    assert router.train_rows == {POOLED_CODE: 180, 1: 50, 2: 60, 3: 60}
+
+
+def test_fit_without_rows_raises():
+    X, y = make_rows([1])
+    with pytest.raises(ValueError, match="at least one training row"):
+        make_router().fit(X[:0], y[:0])